@@ -12,6 +12,7 @@ from . import cycle_transforms
 from . import driver_functions
 from . import transfer_to_scene
 from . import project_version
+from . import timeline_overlays
 from . import update_images
 from . import vertex_locations
 from . import viewport_shading
@@ -80,161 +81,31 @@ class ProductionKitPreferences(bpy.types.AddonPreferences):
 		name="File Reload",
 		description="Reloads all image files",
 		default=True)
+	enable_file_reload_changed: bpy.props.BoolProperty(
+		name="Changed Files Only",
+		description="Only reload images whose files changed on disk since they were last loaded, checked in parallel against a cached manifest of modification times and sizes",
+		default=True)
 	enable_file_format: bpy.props.BoolProperty(
 		name="File Format",
-		description="Formats all image files using the specified filters",
+		description="Formats all image files using the formatting rules",
 		default=False)
 	
-	# Filter sets (this should really use a dynamic list, not static presets)
-	filter1_name: bpy.props.StringProperty(
-		name="Filter Name",
-		description="String to match in the image name",
-		default="-color",
-		maxlen=4096)
-	filter1_colorspace: bpy.props.EnumProperty(
-		name='Color Space',
-		description='Set matching files to this color space',
-		items=[
-			('Filmic Log', 'Filmic Log', 'Filmic Log color space'),
-			('Linear', 'Linear', 'Linear color space'),
-			('Linear ACES', 'Linear ACES', 'Linear ACES color space'),
-			('Linear ACEScg', 'Linear ACEScg', 'Linear ACEScg color space'),
-			('Non-Color', 'Non-Color', 'Non-Color color space'),
-			('Raw', 'Raw', 'Raw color space'),
-			('sRGB', 'sRGB', 'sRGB color space'),
-			('XYZ', 'XYZ', 'XYZ color space')
-			],
-		default='sRGB')
-	filter1_alphamode: bpy.props.EnumProperty(
-		name='Alpha Mode',
-		description='Set matching files to this alpha mode',
-		items=[
-			('STRAIGHT', 'Straight', 'RGB channels are stored without association, but the alpha still operates as a mask'),
-			('PREMUL', 'Premultiplied', 'RGB channels have been multiplied by the alpha'),
-			('CHANNEL_PACKED', 'Channel Packed', 'Treat alpha as a fourth color channel without masking'),
-			('NONE', 'None', 'Ignore alpha channel')
-			],
-		default='STRAIGHT')
-
-	filter2_name: bpy.props.StringProperty(
-		name="Filter Name",
-		description="String to match in the image name",
-		default="-orm",
-		maxlen=4096)
-	filter2_colorspace: bpy.props.EnumProperty(
-		name='Color Space',
-		description='Set matching files to this color space',
-		items=[
-			('Filmic Log', 'Filmic Log', 'Filmic Log color space'),
-			('Linear', 'Linear', 'Linear color space'),
-			('Linear ACES', 'Linear ACES', 'Linear ACES color space'),
-			('Linear ACEScg', 'Linear ACEScg', 'Linear ACEScg color space'),
-			('Non-Color', 'Non-Color', 'Non-Color color space (typically used for normal maps)'),
-			('Raw', 'Raw', 'Raw color space'),
-			('sRGB', 'sRGB', 'sRGB color space'),
-			('XYZ', 'XYZ', 'XYZ color space')
-			],
-		default='Non-Color')
-	filter2_alphamode: bpy.props.EnumProperty(
-		name='Alpha Mode',
-		description='Set matching files to this alpha mode',
-		items=[
-			('STRAIGHT', 'Straight', 'RGB channels are stored without association, but the alpha channel still operates as a mask'),
-			('PREMUL', 'Premultiplied', 'RGB channels have been multiplied by the alpha channel as an embedded mask'),
-			('CHANNEL_PACKED', 'Channel Packed', 'Treat the alpha as a fourth color channel without masking'),
-			('NONE', 'None', 'Ignore alpha channel')
-			],
-		default='CHANNEL_PACKED')
-
-	filter3_name: bpy.props.StringProperty(
-		name="Filter Name",
-		description="String to match in the image name",
-		default="-normal",
-		maxlen=4096)
-	filter3_colorspace: bpy.props.EnumProperty(
-		name='Color Space',
-		description='Set matching files to this color space',
-		items=[
-			('Filmic Log', 'Filmic Log', 'Filmic Log color space'),
-			('Linear', 'Linear', 'Linear color space'),
-			('Linear ACES', 'Linear ACES', 'Linear ACES color space'),
-			('Linear ACEScg', 'Linear ACEScg', 'Linear ACEScg color space'),
-			('Non-Color', 'Non-Color', 'Non-Color color space (typically used for normal maps)'),
-			('Raw', 'Raw', 'Raw color space'),
-			('sRGB', 'sRGB', 'sRGB color space'),
-			('XYZ', 'XYZ', 'XYZ color space')
-			],
-		default='Non-Color')
-	filter3_alphamode: bpy.props.EnumProperty(
-		name='Alpha Mode',
-		description='Set matching files to this alpha mode',
-		items=[
-			('STRAIGHT', 'Straight', 'RGB channels are stored without association, but the alpha channel still operates as a mask'),
-			('PREMUL', 'Premultiplied', 'RGB channels have been multiplied by the alpha channel as an embedded mask'),
-			('CHANNEL_PACKED', 'Channel Packed', 'Treat the alpha as a fourth color channel without masking'),
-			('NONE', 'None', 'Ignore alpha channel')
-			],
-		default='CHANNEL_PACKED')
-
-	filter4_name: bpy.props.StringProperty(
-		name="Filter Name",
-		description="String to match in the image name",
-		default="",
-		maxlen=4096)
-	filter4_colorspace: bpy.props.EnumProperty(
-		name='Color Space',
-		description='Set matching files to this color space',
-		items=[
-			('Filmic Log', 'Filmic Log', 'Filmic Log color space'),
-			('Linear', 'Linear', 'Linear color space'),
-			('Linear ACES', 'Linear ACES', 'Linear ACES color space'),
-			('Linear ACEScg', 'Linear ACEScg', 'Linear ACEScg color space'),
-			('Non-Color', 'Non-Color', 'Non-Color color space (typically used for normal maps)'),
-			('Raw', 'Raw', 'Raw color space'),
-			('sRGB', 'sRGB', 'sRGB color space'),
-			('XYZ', 'XYZ', 'XYZ color space')
-			],
-		default='sRGB')
-	filter4_alphamode: bpy.props.EnumProperty(
-		name='Alpha Mode',
-		description='Set matching files to this alpha mode',
-		items=[
-			('STRAIGHT', 'Straight', 'RGB channels are stored without association, but the alpha channel still operates as a mask'),
-			('PREMUL', 'Premultiplied', 'RGB channels have been multiplied by the alpha channel as an embedded mask'),
-			('CHANNEL_PACKED', 'Channel Packed', 'Treat the alpha as a fourth color channel without masking'),
-			('NONE', 'None', 'Ignore alpha channel')
-			],
-		default='STRAIGHT')
-
-	filter5_name: bpy.props.StringProperty(
-		name="Filter Name",
-		description="String to match in the image name",
-		default="",
-		maxlen=4096)
-	filter5_colorspace: bpy.props.EnumProperty(
-		name='Color Space',
-		description='Set matching files to this color space',
-		items=[
-			('Filmic Log', 'Filmic Log', 'Filmic Log color space'),
-			('Linear', 'Linear', 'Linear color space'),
-			('Linear ACES', 'Linear ACES', 'Linear ACES color space'),
-			('Linear ACEScg', 'Linear ACEScg', 'Linear ACEScg color space'),
-			('Non-Color', 'Non-Color', 'Non-Color color space (typically used for normal maps)'),
-			('Raw', 'Raw', 'Raw color space'),
-			('sRGB', 'sRGB', 'sRGB color space'),
-			('XYZ', 'XYZ', 'XYZ color space')
-			],
-		default='sRGB')
-	filter5_alphamode: bpy.props.EnumProperty(
-		name='Alpha Mode',
-		description='Set matching files to this alpha mode',
-		items=[
-			('STRAIGHT', 'Straight', 'RGB channels are stored without association, but the alpha channel still operates as a mask'),
-			('PREMUL', 'Premultiplied', 'RGB channels have been multiplied by the alpha channel as an embedded mask'),
-			('CHANNEL_PACKED', 'Channel Packed', 'Treat the alpha as a fourth color channel without masking'),
-			('NONE', 'None', 'Ignore alpha channel')
-			],
-		default='STRAIGHT')
+	# Downscaled proxies
+	proxy_cache_location: bpy.props.StringProperty(
+		name="Proxy Folder",
+		description="Folder where 1/2 and 1/4 resolution image proxies are stored (// is relative to the project file)",
+		default="//proxies/",
+		maxlen=4096,
+		subtype="DIR_PATH")
+	proxy_full_render: bpy.props.BoolProperty(
+		name="Full Resolution Renders",
+		description="Switch proxy images back to full resolution while rendering with the full resolution render buttons in the Render menu and Update Images panel",
+		default=True)
+	
+	# Formatting rules, matched in order with the first match applied
+	format_rules: bpy.props.CollectionProperty(type=update_images.ImageFormatRule)
+	format_rules_index: bpy.props.IntProperty(default=0, min=0)
+	format_rules_migrated: bpy.props.BoolProperty(default=False)
 	
 	
 	
@@ -256,6 +127,35 @@ class ProductionKitPreferences(bpy.types.AddonPreferences):
 		soft_max=256,
 		min=16,
 		max=1024)
+	waveform_split_channels: bpy.props.BoolProperty(
+		name="Split Channels",
+		description="Display each audio channel as a separate waveform instead of a mono down-mix",
+		default=False,
+		update=lambda self, context: audio_waveforms.generate_waveform_overlay_data() if context.scene.production_kit_settings.waveform_show else None)
+	waveform_cache_location: bpy.props.StringProperty(
+		name="Waveform Cache",
+		description="Shared folder for waveform images, so images prewarmed on render farm nodes or by other users are found here (leave empty for a cache in your user folder)",
+		default="",
+		maxlen=4096,
+		subtype="DIR_PATH",
+		update=lambda self, context: audio_waveforms.generate_waveform_overlay_data() if context.scene.production_kit_settings.waveform_show else None)
+	
+	########## Timeline Overlays ##########
+	
+	overlay_time_budget: bpy.props.FloatProperty(
+		name="Draw Budget",
+		description="Milliseconds the timeline overlays may take per redraw on average before they switch to reduced detail (0 disables)",
+		default=0.0,
+		soft_min=0.0,
+		soft_max=10.0,
+		min=0.0,
+		max=100.0,
+		precision=2,
+		subtype='NONE')
+	overlay_debug_hud: bpy.props.BoolProperty(
+		name="Timing HUD",
+		description="Show timeline overlay draw times (rolling average and 95th percentile) in the corner of each Timeline",
+		default=False)
 	
 	ffmpeg_processing: bpy.props.BoolProperty(
 		name='Enable Waveform Display',
@@ -321,6 +221,12 @@ class ProductionKitPreferences(bpy.types.AddonPreferences):
 		description = "Name of the plain text library file",
 		default = "ProductionKit-Palette.txt",
 		maxlen = 1024)
+	palette_library_location: bpy.props.StringProperty(
+		name = "Palette Library",
+		description = "Shared folder of palette files that can be searched and switched between in the Color Palette panel, files are watched for changes made by other artists (leave empty to disable)",
+		default = "",
+		maxlen = 4096,
+		subtype = "DIR_PATH")
 	
 	
 	
@@ -433,48 +339,30 @@ class ProductionKitPreferences(bpy.types.AddonPreferences):
 		layout.separator(factor = 2.0)
 		layout.label(text="Update Image Files", icon="IMAGE") # IMAGE IMAGE_DATA FILE_IMAGE NODE_TEXTURE
 		
-		grid1 = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=False, align=False)
+		grid1 = layout.grid_flow(row_major=True, columns=3, even_columns=True, even_rows=False, align=False)
 		grid1.prop(self, "enable_file_reload")
+		row = grid1.row()
+		row.active = self.enable_file_reload
+		row.prop(self, "enable_file_reload_changed")
 		grid1.prop(self, "enable_file_format")
 		
-		grid = layout.grid_flow(row_major=True, columns=2, even_columns=False, even_rows=False, align=False)
-		if not self.enable_file_format:
-			grid.enabled = False
-		
-		grid.prop(self, "filter1_name", text='')
-		row1 = grid.row(align=False)
-		if not self.filter1_name:
-			row1.enabled = False
-		row1.prop(self, "filter1_colorspace", text='')
-		row1.prop(self, "filter1_alphamode", text='')
-		
-		grid.prop(self, "filter2_name", text='')
-		row2 = grid.row(align=False)
-		if not self.filter2_name:
-			row2.enabled = False
-		row2.prop(self, "filter2_colorspace", text='')
-		row2.prop(self, "filter2_alphamode", text='')
-		
-		grid.prop(self, "filter3_name", text='')
-		row3 = grid.row(align=False)
-		if not self.filter3_name:
-			row3.enabled = False
-		row3.prop(self, "filter3_colorspace", text='')
-		row3.prop(self, "filter3_alphamode", text='')
-		
-		grid.prop(self, "filter4_name", text='')
-		row4 = grid.row(align=False)
-		if not self.filter4_name:
-			row4.enabled = False
-		row4.prop(self, "filter4_colorspace", text='')
-		row4.prop(self, "filter4_alphamode", text='')
+		grid1 = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=False, align=False)
+		grid1.prop(self, "proxy_cache_location", text="")
+		grid1.prop(self, "proxy_full_render")
 		
-		grid.prop(self, "filter5_name", text='')
-		row5 = grid.row(align=False)
-		if not self.filter5_name:
-			row5.enabled = False
-		row5.prop(self, "filter5_colorspace", text='')
-		row5.prop(self, "filter5_alphamode", text='')
+		row = layout.row()
+		if not self.enable_file_format:
+			row.enabled = False
+		row.template_list("PRODUCTIONKIT_UL_format_rules", "", self, "format_rules", self, "format_rules_index", rows=5)
+		col = row.column(align=True)
+		col.operator(update_images.Production_Kit_Format_Rule_Add.bl_idname, text="", icon="ADD")
+		col.operator(update_images.Production_Kit_Format_Rule_Remove.bl_idname, text="", icon="REMOVE")
+		col.separator()
+		col.operator(update_images.Production_Kit_Format_Rule_Move.bl_idname, text="", icon="TRIA_UP").direction = 'UP'
+		col.operator(update_images.Production_Kit_Format_Rule_Move.bl_idname, text="", icon="TRIA_DOWN").direction = 'DOWN'
+		col.separator()
+		col.operator(update_images.Production_Kit_Format_Rules_Import.bl_idname, text="", icon="IMPORT")
+		col.operator(update_images.Production_Kit_Format_Rules_Export.bl_idname, text="", icon="EXPORT")
 		
 		
 		
@@ -500,6 +388,19 @@ class ProductionKitPreferences(bpy.types.AddonPreferences):
 		if not self.ffmpeg_processing:
 			input.active = False
 			input.enabled = False
+		input.prop(self, "waveform_split_channels")
+		input.prop(self, "waveform_cache_location", text="")
+		
+		
+		
+		########## Timeline Overlays ##########
+		
+		layout.separator(factor = 2.0)
+		layout.label(text="Timeline Overlays", icon="TIME") # TIME PREVIEW_RANGE
+		
+		grid = layout.grid_flow(row_major=True, columns=2, even_columns=True, even_rows=False, align=False)
+		grid.prop(self, "overlay_time_budget")
+		grid.prop(self, "overlay_debug_hud")
 		
 		
 		
@@ -512,6 +413,7 @@ class ProductionKitPreferences(bpy.types.AddonPreferences):
 		grid3.prop(self, "palette_file_location", text='')
 		grid3.prop(self, "palette_file_name", text='')
 		grid3.prop(self, "palette_category", text='')
+		layout.prop(self, "palette_library_location")
 		
 		
 		
@@ -530,6 +432,15 @@ class ProductionKitSettings(bpy.types.PropertyGroup):
 	
 	########## Update Images ##########
 	
+	image_proxy_level: bpy.props.EnumProperty(
+		name="Image Resolution",
+		description="Resolution images are currently switched to",
+		items=[
+			('FULL', 'Full', 'Original image files'),
+			('2', '1/2', 'Half resolution proxies'),
+			('4', '1/4', 'Quarter resolution proxies'),
+			],
+		default='FULL')
 	file_extension_source: bpy.props.StringProperty(
 		name="Source File Extension",
 		description="Define the file extension you want to replace",
@@ -617,6 +528,17 @@ class ProductionKitSettings(bpy.types.PropertyGroup):
 		min=-100000,
 		max=100000,
 	)
+	bpm_use_tempo_map: bpy.props.BoolProperty(
+		name="Use Tempo Map",
+		description="Use the scene tempo map with changing tempo and meter instead of a constant BPM",
+		default=False,
+	)
+	bpm_tempo_map_index: bpy.props.IntProperty(
+		name="Tempo Segment",
+		description="Active tempo map segment",
+		default=0,
+		min=0,
+	)
 	bpm_display_offset: bpy.props.FloatProperty(
 		name="Offset",
 		description="Vertical offset in pixels — shift the marker row up (+) or down (−)",
@@ -679,6 +601,17 @@ class ProductionKitSettings(bpy.types.PropertyGroup):
 		description = "Editing status of the palette",
 		default = False
 	)
+	palette_library_active: bpy.props.StringProperty(
+		name = "Library Palette",
+		description = "File name of the library palette shown in this scene, empty for the project palette",
+		default = ""
+	)
+	palette_library_search: bpy.props.StringProperty(
+		name = "Search Palettes",
+		description = "Filter library palettes by palette or swatch name",
+		default = "",
+		options = {'TEXTEDIT_UPDATE'}
+	)
 	
 	
 	
@@ -688,6 +621,7 @@ class ProductionKitSettings(bpy.types.PropertyGroup):
 		name='Driver',
 		description='List of available driver functions',
 		items=[
+			('BEAT', 'Beat', 'Beat count or phase from the BPM overlay tempo'),
 			('CURVE', 'Curve at Time', 'Value from curve at specified time or time offset'),
 			('EASE', 'Ease', 'Calculates easing curves between 0 and 1'),
 			('HASH', 'Hash', 'Returns a number between 0 and 99999 based on a string pseudo-hash'),
@@ -757,6 +691,19 @@ class ProductionKitSettings(bpy.types.PropertyGroup):
 	
 	
 	
+	# Beat
+	driver_beat_output: bpy.props.EnumProperty(
+		name='Output',
+		description='Beat value to return',
+		items=[
+			('COUNT', 'Beat Count', 'Number of beats since the first tempo segment, with fractional progress'),
+			('BEAT', 'Beat Phase', '0-1 progress through the current beat'),
+			('MEASURE', 'Measure Phase', '0-1 progress through the current measure'),
+			],
+		default='BEAT')
+	
+	
+	
 	# Easing
 	driver_value_t: bpy.props.StringProperty(
 		name="Time",
@@ -983,12 +930,12 @@ class VIEW3D_PT_timeline_overlays(bpy.types.Panel):
 	def draw(self, context):
 		layout = self.layout
 		settings = context.scene.production_kit_settings
-		prefs = context.preferences.addons[__package__].preferences
 		
-		if prefs.ffmpeg_processing:
+		if audio_waveforms.waveforms_available(context):
+			waveform_settings = audio_waveforms.display_scene(context).production_kit_settings
 			row = layout.row()
-			row.prop(settings, "waveform_show", text="Audio Waveforms")
-			if settings.waveform_show:
+			row.prop(waveform_settings, "waveform_show", text="Audio Waveforms")
+			if waveform_settings.waveform_show:
 				audio_waveforms._draw_waveform_ui(layout, context)
 				
 		row = layout.row()
@@ -1006,6 +953,7 @@ class VIEW3D_PT_timeline_overlays(bpy.types.Panel):
 # •Unregistration function
 
 classes = (
+	update_images.ImageFormatRule,
 	ProductionKitPreferences,
 	ProductionKitSettings,
 	VIEW3D_PT_timeline_overlays
@@ -1033,6 +981,7 @@ def register():
 	cycle_transforms.register()
 	driver_functions.register()
 	project_version.register()
+	timeline_overlays.register()
 	transfer_to_scene.register()
 	update_images.register()
 	vertex_locations.register()
@@ -1048,6 +997,7 @@ def unregister():
 	cycle_transforms.unregister()
 	driver_functions.unregister()
 	project_version.unregister()
+	timeline_overlays.unregister()
 	transfer_to_scene.unregister()
 	update_images.unregister()
 	vertex_locations.unregister()
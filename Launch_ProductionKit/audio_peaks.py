@@ -0,0 +1,413 @@
+import os
+import math
+import struct
+import numpy as np
+
+###########################################################################
+# In-process PCM access for uncompressed WAV and AIFF files
+# Samples are memory-mapped and processed in chunks, so FFmpeg isn't required
+# and only the requested window of the file is ever read from disk
+
+UNCOMPRESSED_EXTENSIONS = ('.wav', '.wave', '.aif', '.aiff', '.aifc')
+
+# Frames converted to floating point at a time, bounds memory use for long files
+_CHUNK_FRAMES = 1 << 20
+
+# Parsed headers per path: (mtime, size, info or None)
+_info_cache = {}
+
+
+
+def _extended_to_float(data):
+	"""Convert an 80 bit IEEE 754 extended float (AIFF sample rate) to a Python float."""
+	exponent, mantissa = struct.unpack('>HQ', data)
+	sign = -1.0 if exponent & 0x8000 else 1.0
+	exponent &= 0x7FFF
+	if exponent == 0 and mantissa == 0:
+		return 0.0
+	return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+
+def _read_wav_header(file):
+	"""Return (format tag, channels, rate, sample bytes, bits, data offset, data size) for a RIFF WAVE file."""
+	riff, _, wave = struct.unpack('<4sI4s', file.read(12))
+	if riff != b'RIFF' or wave != b'WAVE':
+		return None
+	fmt = None
+	while True:
+		header = file.read(8)
+		if len(header) < 8:
+			return None
+		chunk_id, chunk_size = struct.unpack('<4sI', header)
+		if chunk_id == b'fmt ':
+			data = file.read(chunk_size + (chunk_size & 1))
+			tag, channels, rate, _, align, bits = struct.unpack('<HHIIHH', data[:16])
+			# WAVE_FORMAT_EXTENSIBLE stores the real format in the first two bytes of the sub-format GUID
+			if tag == 0xFFFE and len(data) >= 26:
+				tag = struct.unpack('<H', data[24:26])[0]
+			fmt = (tag, channels, rate, align // max(channels, 1), bits)
+		elif chunk_id == b'data':
+			if fmt is None:
+				return None
+			return (*fmt, file.tell(), chunk_size)
+		else:
+			file.seek(chunk_size + (chunk_size & 1), 1)
+
+
+
+def _read_aiff_header(file):
+	"""Return (compression, channels, rate, sample bytes, bits, data offset, data size) for an AIFF or AIFF-C file."""
+	form, _, kind = struct.unpack('>4sI4s', file.read(12))
+	if form != b'FORM' or kind not in (b'AIFF', b'AIFC'):
+		return None
+	comm = None
+	while True:
+		header = file.read(8)
+		if len(header) < 8:
+			return None
+		chunk_id, chunk_size = struct.unpack('>4sI', header)
+		if chunk_id == b'COMM':
+			data = file.read(chunk_size + (chunk_size & 1))
+			channels, _, bits = struct.unpack('>hIh', data[:8])
+			rate = _extended_to_float(data[8:18])
+			compression = data[18:22] if kind == b'AIFC' and len(data) >= 22 else b'NONE'
+			comm = (compression, channels, int(rate), math.ceil(bits / 8), bits)
+		elif chunk_id == b'SSND':
+			if comm is None:
+				return None
+			offset, _ = struct.unpack('>II', file.read(8))
+			return (*comm, file.tell() + offset, chunk_size - 8 - offset)
+		else:
+			file.seek(chunk_size + (chunk_size & 1), 1)
+
+
+
+# (little endian, float, sample bytes): numpy dtype string
+_DTYPES = {
+	(True, False, 1): 'u1',
+	(True, False, 2): '<i2',
+	(True, False, 4): '<i4',
+	(True, True, 4): '<f4',
+	(True, True, 8): '<f8',
+	(False, False, 1): 'i1',
+	(False, False, 2): '>i2',
+	(False, False, 4): '>i4',
+	(False, True, 4): '>f4',
+	(False, True, 8): '>f8',
+}
+
+
+
+def read_pcm_info(path):
+	"""Parse the header of an uncompressed WAV or AIFF file.
+	Returns a dictionary describing the sample layout, or None if the file isn't supported.
+	"""
+	if not path.lower().endswith(UNCOMPRESSED_EXTENSIONS):
+		return None
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+	cached = _info_cache.get(path)
+	if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+		return cached[2]
+
+	info = None
+	try:
+		with open(path, 'rb') as file:
+			magic = file.read(4)
+			file.seek(0)
+			if magic == b'RIFF':
+				header = _read_wav_header(file)
+				if header and header[0] in (1, 3):
+					little, is_float = True, header[0] == 3
+				else:
+					header = None
+			elif magic == b'FORM':
+				header = _read_aiff_header(file)
+				if header and header[0] in (b'NONE', b'twos', b'sowt', b'fl32', b'FL32', b'fl64', b'FL64'):
+					little, is_float = header[0] == b'sowt', header[0].lower() in (b'fl32', b'fl64')
+				else:
+					header = None
+			else:
+				header = None
+	except (OSError, struct.error):
+		header = None
+
+	if header:
+		_, channels, rate, sample_bytes, bits, offset, size = header
+		if channels > 0 and rate > 0 and (sample_bytes == 3 or (little, is_float, sample_bytes) in _DTYPES):
+			# Streamed files may report a larger data chunk than was actually written
+			size = min(size, stat.st_size - offset)
+			info = {
+				"channels": channels,
+				"rate": rate,
+				"bits": bits,
+				"sample_bytes": sample_bytes,
+				"little": little,
+				"float": is_float,
+				"offset": offset,
+				"frames": size // (sample_bytes * channels),
+			}
+	_info_cache[path] = (stat.st_mtime, stat.st_size, info)
+	return info
+
+
+
+def is_supported(path):
+	"""True if the file can be decoded in-process."""
+	return read_pcm_info(path) is not None
+
+
+
+def read_frames(path, info, first, last):
+	"""Return frames [first, last) as a float32 (frames, channels) array in the -1 to 1 range."""
+	channels = info["channels"]
+	sample_bytes = info["sample_bytes"]
+	count = last - first
+	if count <= 0:
+		return np.zeros((0, channels), dtype=np.float32)
+	offset = info["offset"] + first * channels * sample_bytes
+
+	if sample_bytes == 3:
+		# 24 bit samples have no numpy dtype, assemble them from bytes into int32
+		raw = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(count * channels, 3))
+		if not info["little"]:
+			raw = raw[:, ::-1]
+		values = raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16)
+		values = (values << 8) >> 8 # Sign extend
+		return (values.astype(np.float32) / float(1 << 23)).reshape(count, channels)
+
+	dtype = _DTYPES[(info["little"], info["float"], sample_bytes)]
+	raw = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count, channels))
+	if info["float"]:
+		return raw.astype(np.float32)
+	if sample_bytes == 1 and info["little"]:
+		# 8 bit WAV is unsigned
+		return (raw.astype(np.float32) - 128.0) / 128.0
+	return raw.astype(np.float32) / float(1 << (sample_bytes * 8 - 1))
+
+
+
+def _window_frames(info, start, duration):
+	"""Clamp a (start, duration) window in seconds to a (first, last) frame range."""
+	first = min(max(int(start * info["rate"]), 0), info["frames"])
+	if duration is None:
+		return first, info["frames"]
+	return first, min(first + int(duration * info["rate"]), info["frames"])
+
+
+
+def read_peaks(path, columns, start=0.0, duration=None):
+	"""Minimum and maximum sample values per column for a window of an uncompressed audio file.
+	Returns (mins, maxs) float32 arrays shaped (columns, channels), or None if the file isn't supported.
+	"""
+	info = read_pcm_info(path)
+	if info is None or columns < 1:
+		return None
+	first, last = _window_frames(info, start, duration)
+	if last <= first:
+		return None
+
+	channels = info["channels"]
+	bounds = first + (np.arange(columns + 1, dtype=np.int64) * (last - first)) // columns
+	mins = np.zeros((columns, channels), dtype=np.float32)
+	maxs = np.zeros((columns, channels), dtype=np.float32)
+
+	# Process whole columns in chunks of roughly _CHUNK_FRAMES
+	step = max(1, (_CHUNK_FRAMES * columns) // (last - first))
+	for c0 in range(0, columns, step):
+		c1 = min(c0 + step, columns)
+		a = int(bounds[c0])
+		b = max(int(bounds[c1]), a + 1)
+		samples = read_frames(path, info, a, min(b, last))
+		if len(samples) == 0:
+			continue
+		indices = np.minimum(bounds[c0:c1] - a, len(samples) - 1)
+		mins[c0:c1] = np.minimum.reduceat(samples, indices, axis=0)
+		maxs[c0:c1] = np.maximum.reduceat(samples, indices, axis=0)
+	return mins, maxs
+
+
+
+def estimate_loudness(path, blocks=64, block_seconds=0.4):
+	"""Approximate integrated loudness in LUFS from evenly spaced sample blocks.
+	Uses gated mean square power like EBU R128 (absolute -70 and relative -10 gates)
+	but without K-weighting, reading only a few seconds of audio regardless of length.
+	Returns None for silence or unsupported files.
+	"""
+	info = read_pcm_info(path)
+	if info is None or info["frames"] == 0:
+		return None
+	block_frames = max(1, int(block_seconds * info["rate"]))
+	starts = np.linspace(0, max(info["frames"] - block_frames, 0), num=blocks, dtype=np.int64)
+
+	powers = []
+	for start in np.unique(starts):
+		samples = read_frames(path, info, int(start), min(int(start) + block_frames, info["frames"]))
+		if len(samples):
+			powers.append(float(np.mean(np.square(samples), axis=0).sum()))
+	powers = np.array([power for power in powers if power > 0.0])
+	if len(powers) == 0:
+		return None
+
+	loudness = -0.691 + 10.0 * np.log10(powers)
+	powers = powers[loudness > -70.0]
+	if len(powers) == 0:
+		return None
+	relative = -0.691 + 10.0 * math.log10(powers.mean()) - 10.0
+	gated = powers[(-0.691 + 10.0 * np.log10(powers)) > relative]
+	if len(gated) == 0:
+		return None
+	return -0.691 + 10.0 * math.log10(gated.mean())
+
+
+
+def render_peaks(mins, maxs, height, split_channels=False, gain=0.0):
+	"""Draw min/max peaks into a (height, columns, 4) RGBA float32 image, white on transparent.
+	Rows are ordered bottom-up to match Blender image pixels. Gain is in dB.
+	"""
+	scale = 10.0 ** (gain / 20.0)
+	if not split_channels:
+		mins = mins.mean(axis=1, keepdims=True)
+		maxs = maxs.mean(axis=1, keepdims=True)
+	lanes = mins.shape[1]
+	lane_height = max(height // lanes, 1)
+	pixels = np.zeros((height, mins.shape[0], 4), dtype=np.float32)
+	rows = np.arange(lane_height)[:, None]
+
+	for lane in range(lanes):
+		low = np.round((np.clip(mins[:, lane] * scale, -1.0, 1.0) + 1.0) * 0.5 * (lane_height - 1))
+		high = np.round((np.clip(maxs[:, lane] * scale, -1.0, 1.0) + 1.0) * 0.5 * (lane_height - 1))
+		mask = (rows >= low[None, :]) & (rows <= high[None, :])
+		# First channel is drawn in the top lane
+		bottom = height - (lane + 1) * lane_height
+		if bottom < 0:
+			break
+		pixels[bottom:bottom + lane_height][mask] = 1.0
+	return pixels
+
+
+
+###########################################################################
+# Tempo estimation from an onset envelope
+# The envelope is the peak-to-peak amplitude at ENVELOPE_RATE samples per second,
+# small enough that autocorrelation of an entire song is a single FFT
+
+ENVELOPE_RATE = 100
+
+
+
+def read_envelope(path, rate=ENVELOPE_RATE):
+	"""Peak-to-peak amplitude envelope of an uncompressed file, channels averaged.
+	Returns a float32 array with `rate` values per second, or None if the file isn't supported.
+	"""
+	info = read_pcm_info(path)
+	if info is None:
+		return None
+	columns = int(info["frames"] / info["rate"] * rate)
+	peaks = read_peaks(path, columns) if columns > 0 else None
+	if peaks is None:
+		return None
+	return (peaks[1] - peaks[0]).mean(axis=1)
+
+
+
+def envelope_from_samples(samples, sample_rate, rate=ENVELOPE_RATE):
+	"""Peak-to-peak amplitude envelope of mono samples, matching read_envelope."""
+	hop = max(1, int(sample_rate / rate))
+	count = len(samples) // hop
+	blocks = samples[:count * hop].reshape(count, hop)
+	return blocks.max(axis=1) - blocks.min(axis=1)
+
+
+
+def onset_strength(envelope, rate=ENVELOPE_RATE):
+	"""Rises in log amplitude with the local average removed, peaking where notes and hits begin."""
+	level = np.log1p(np.asarray(envelope, dtype=np.float64) * 100.0)
+	flux = np.maximum(np.diff(level, prepend=level[:1]), 0.0)
+	width = max(1, int(rate * 0.5))
+	average = np.convolve(flux, np.ones(width) / width, mode='same')
+	return np.maximum(flux - average, 0.0)
+
+
+
+def _autocorrelation(values):
+	"""Normalised autocorrelation for all lags using a zero padded FFT."""
+	count = len(values)
+	size = 1 << int(math.ceil(math.log2(count * 2)))
+	spectrum = np.fft.rfft(values - values.mean(), size)
+	correlation = np.fft.irfft(spectrum * np.conj(spectrum), size)[:count]
+	return correlation / correlation[0] if correlation[0] > 0.0 else None
+
+
+
+def _refine_peak(values, index):
+	"""Sub-sample position of a local maximum using parabolic interpolation."""
+	if index <= 0 or index >= len(values) - 1:
+		return float(index)
+	a, b, c = values[index - 1], values[index], values[index + 1]
+	denominator = a - 2.0 * b + c
+	return index + (0.5 * (a - c) / denominator if denominator else 0.0)
+
+
+
+def estimate_tempo(onsets, rate=ENVELOPE_RATE, min_bpm=60.0, max_bpm=200.0):
+	"""Estimate a constant tempo from an onset strength curve.
+	Candidate beat periods are scored by autocorrelation with a mild preference for tempos
+	near 120 BPM, refined using the peak four beats later, and the phase is the offset whose
+	evenly spaced comb collects the most onset strength.
+	Returns (bpm, first beat in seconds, confidence from 0 to 1) or None if there's no clear pulse.
+	"""
+	onsets = np.asarray(onsets, dtype=np.float64)
+	min_lag = max(1, int(rate * 60.0 / max_bpm))
+	max_lag = int(math.ceil(rate * 60.0 / min_bpm))
+	if len(onsets) < max_lag * 4 + 2:
+		return None
+	correlation = _autocorrelation(onsets)
+	if correlation is None:
+		return None
+	
+	lags = np.arange(min_lag, max_lag + 1)
+	prior = np.exp(-0.5 * np.log2(lags / (rate * 0.5)) ** 2)
+	index = int(lags[np.argmax(correlation[lags] * prior)])
+	confidence = float(max(correlation[index], 0.0))
+	
+	# Four beats later the same peak is measured with four times the resolution
+	span = max(2, index // 4)
+	far = index * 4
+	window = correlation[far - span:far + span + 1]
+	period = (_refine_peak(window, int(np.argmax(window))) + far - span) / 4.0
+	if abs(period - index) > 1.0:
+		period = _refine_peak(correlation, index)
+	
+	phases = np.arange(int(math.ceil(period)))
+	positions = np.round(phases[:, None] + np.arange(int(len(onsets) / period))[None, :] * period).astype(np.int64)
+	strength = np.where(positions < len(onsets), onsets[np.minimum(positions, len(onsets) - 1)], 0.0).sum(axis=1)
+	phase = int(np.argmax(strength))
+	return float(60.0 * rate / period), phase / rate, confidence
+
+
+
+def estimate_tempo_segments(onsets, rate=ENVELOPE_RATE, min_bpm=60.0, max_bpm=200.0, window=30.0, tolerance=0.02):
+	"""Estimate a changing tempo by analysing overlapping windows of the onset curve.
+	Neighbouring windows within the tolerance are merged, so a steady song returns a single segment.
+	Returns a list of (start in seconds on a beat, bpm) tuples.
+	"""
+	size = int(window * rate)
+	hop = size // 2
+	if len(onsets) <= size:
+		result = estimate_tempo(onsets, rate, min_bpm, max_bpm)
+		return [(result[1], result[0])] if result else []
+	
+	segments = []
+	for start in range(0, len(onsets) - hop, hop):
+		result = estimate_tempo(onsets[start:start + size], rate, min_bpm, max_bpm)
+		if result is None:
+			continue
+		bpm, phase, _ = result
+		if segments and abs(bpm - segments[-1][1]) <= segments[-1][1] * tolerance:
+			continue
+		segments.append((start / rate + phase, float(bpm)))
+	return segments
@@ -1,170 +1,1170 @@
 import bpy
 import os
+import re
+import json
+import hashlib
+import tempfile
+import math
+import time
+import wave
+import struct
 import subprocess
 import gpu
+import numpy as np
+from bpy.app.handlers import persistent
 from gpu_extras.batch import batch_for_shader
 
-# Store waveform images for drawing the overlay
-waveform_overlays = []
-draw_handler = None
+# Local imports
+from . import audio_peaks
+from . import timeline_overlays
 
+# Clip registry: overlay data for drawing, keyed by scene name then clip key
+waveform_overlays = {}
 
+# Generation timing per scene and clip key: wall time, processing time (excluding process spawn
+# and loudness analysis), output size and cache status
+waveform_stats = {}
 
-def get_audio_clips():
-	"""Retrieve all audio clips from the Blender sequencer."""
-	# Blender 5.0: context.scene may differ from the VSE scene; use context.sequencer_scene (falls back to context.scene on older builds)
-	scene = getattr(bpy.context, 'sequencer_scene', None) or bpy.context.scene
+# Clips whose waveform couldn't be loaded or generated, per scene, with the failed signature
+_skipped_clips = {}
+
+# Scenes used through scene strips by each registered scene, so nested edits update the parent
+_scene_dependencies = {}
+
+# Scenes waiting for a deferred rebuild
+_pending_scenes = set()
+
+# Waveform pixels rendered in-process (no image file on disk) as uint8 RGBA, keyed like image paths
+_waveform_pixels = {}
+
+# Texture atlas pages packing every waveform image, so visible clips are drawn with one call per page.
+# Images are loaded and packed from a timer when overlays change, draw callbacks only upload changed pages
+ATLAS_PAGE_SIZE = 4096
+_atlas_pages = []
+# Image key → [(page index, x, y, width, height)], images wider than a page are split into several strips
+_atlas_regions = {}
+# Images regenerated under the same key, packed again on the next atlas update
+_atlas_stale = set()
+# Bumped whenever images are packed or freed, so cached batches never reuse UVs from a previous packing
+_atlas_generation = 0
+
+
+
+def display_scene(context):
+	"""Scene whose clips are drawn in a Timeline.
+	Blender 5.0: context.scene may differ from the VSE scene, fall back to context.sequencer_scene when it has no sequencer.
+	"""
+	scene = context.scene
 	if not scene.sequence_editor:
-		return []
-	return [strip for strip in scene.sequence_editor.strips_all if strip.type == 'SOUND']
+		scene = getattr(context, 'sequencer_scene', None) or scene
+	return scene
+
+
+
+def get_audio_clips(scene=None, dependencies=None, _depth=0):
+	"""Retrieve all audio clips used by a scene's sequencer, keyed by a unique strip path.
+	Sound strips inside meta strips are included and drawn on their top-level meta's
+	channel, and sound strips from scenes used by scene strips are mapped into this
+	scene's timeline. Each clip is (strip, frame offset, visible frame range, channel).
+	Referenced scene names are added to the optional dependencies set.
+	"""
+	if scene is None:
+		scene = display_scene(bpy.context)
+	clips = {}
+	if not scene.sequence_editor or _depth > 8:
+		return clips
+	
+	strips = scene.sequence_editor.strips_all
+	parents = {}
+	for strip in strips:
+		if strip.type == 'META':
+			for child in strip.strips:
+				parents[child.name] = strip
 	
-	name
-	bpy.data.scenes["Scene"].name
-	bpy.data.scenes["Scene"].name
+	for strip in strips:
+		bounds = (strip.frame_final_start, strip.frame_final_end)
+		channel = strip.channel
+		parent = parents.get(strip.name)
+		while parent:
+			bounds = (max(bounds[0], parent.frame_final_start), min(bounds[1], parent.frame_final_end))
+			channel = parent.channel
+			parent = parents.get(parent.name)
+		
+		if strip.type == 'SOUND' and strip.sound:
+			clips[strip.name] = (strip, 0, bounds, channel)
+		elif strip.type == 'SCENE' and strip.scene and strip.scene != scene:
+			if dependencies is not None:
+				dependencies.add(strip.scene.name)
+			offset = strip.frame_start - strip.scene.frame_start
+			for key, (clip, clip_offset, clip_bounds, _) in get_audio_clips(strip.scene, dependencies, _depth + 1).items():
+				clips[f"{strip.name}/{key}"] = (
+					clip,
+					clip_offset + offset,
+					(max(clip_bounds[0] + offset, bounds[0]), min(clip_bounds[1] + offset, bounds[1])),
+					channel,
+				)
+	return clips
 
 
 
-def generate_waveform_image(audio_path, width, height, image_path):
-	"""Generate a waveform image using FFmpeg with the defined parameters."""
-	prefs = bpy.context.preferences.addons[__package__].preferences
+# Loudness normalisation target and gain ceiling (avoids amplifying near-silent files into noise)
+LOUDNESS_TARGET = -16.0
+LOUDNESS_MAX_GAIN = 24.0
+
+# Integrated loudness per audio path: (mtime, size, LUFS or None)
+_loudness_cache = {}
+
+_LOUDNESS_PATTERN = re.compile(r"I:\s+(-?[\d.]+|-inf) LUFS")
+
+def analyse_loudness(audio_path, ffmpeg=None):
+	"""Return the integrated loudness of an audio file in LUFS, or None for silence or failure.
+	Results are cached in memory and as a sidecar JSON file next to the audio, keyed on
+	the file's modification time and size, so each file is only analysed once.
+	"""
+	stat = os.stat(audio_path)
+	key = (stat.st_mtime, stat.st_size)
+	cached = _loudness_cache.get(audio_path)
+	if cached and cached[:2] == key:
+		return cached[2]
+	
+	sidecar = os.path.splitext(audio_path)[0] + "_loudness.json"
+	try:
+		with open(sidecar, 'r') as file:
+			data = json.load(file)
+		if (data["mtime"], data["size"]) == key:
+			_loudness_cache[audio_path] = (*key, data["integrated"])
+			return data["integrated"]
+	except (OSError, ValueError, KeyError):
+		pass
+	
+	if audio_peaks.is_supported(audio_path):
+		# Uncompressed files are estimated in-process from a few sampled blocks
+		integrated = audio_peaks.estimate_loudness(audio_path)
+	else:
+		if ffmpeg is None:
+			ffmpeg = bpy.context.preferences.addons[__package__].preferences.ffmpeg_location
+		
+		# EBU R128 is a single pass, unlike the loudnorm filter which analyses the file twice
+		ffmpeg_cmd = [ffmpeg, "-hide_banner", "-nostats", "-i", audio_path, "-af", "ebur128", "-f", "null", "-"]
+		try:
+			result = subprocess.run(ffmpeg_cmd, check=True, capture_output=True, text=True)
+		except (subprocess.CalledProcessError, OSError):
+			print(f"Failed to analyse loudness for {audio_path}")
+			return None
+		
+		matches = _LOUDNESS_PATTERN.findall(result.stderr)
+		integrated = float(matches[-1]) if matches and matches[-1] != '-inf' else None
 	
-	ffmpeg_cmd = [
-		prefs.ffmpeg_location, "-i", audio_path,
+	_loudness_cache[audio_path] = (*key, integrated)
+	try:
+		with open(sidecar, 'w') as file:
+			json.dump({"mtime": key[0], "size": key[1], "integrated": integrated}, file)
+	except OSError as exc:
+		print(f"Failed to write loudness sidecar: {exc}")
+	return integrated
+
+
+
+def loudness_gain(integrated):
+	"""Gain in dB that brings the integrated loudness to the normalisation target."""
+	if integrated is None:
+		return 0.0
+	return min(LOUDNESS_TARGET - integrated, LOUDNESS_MAX_GAIN)
+
+
+
+# Tempo analysis per audio path: (mtime, size, analysis key, result)
+_tempo_cache = {}
+
+def read_audio_envelope(audio_path, ffmpeg=None):
+	"""Amplitude envelope of an audio file for beat detection (see audio_peaks.read_envelope).
+	Uncompressed files are read in-process, anything else is decoded once by FFmpeg to
+	low sample rate mono, which is all the onset detection needs.
+	"""
+	envelope = audio_peaks.read_envelope(audio_path)
+	if envelope is not None:
+		return envelope
+	if ffmpeg is None:
+		ffmpeg = bpy.context.preferences.addons[__package__].preferences.ffmpeg_location
+	
+	sample_rate = 8000
+	ffmpeg_cmd = [ffmpeg, "-hide_banner", "-nostats", "-i", audio_path, "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"]
+	try:
+		result = subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+	except (subprocess.CalledProcessError, OSError):
+		print(f"Failed to decode {audio_path} for beat detection")
+		return None
+	return audio_peaks.envelope_from_samples(np.frombuffer(result.stdout, dtype='<f4'), sample_rate)
+
+
+
+def analyse_tempo(audio_path, ffmpeg=None, min_bpm=60.0, max_bpm=200.0):
+	"""Detect the tempo of an audio file, returning a dictionary with "bpm", "phase" (seconds to
+	the first beat), "confidence" and "segments" ((seconds, bpm) tempo changes), or None.
+	Cached in memory and as a sidecar JSON file like analyse_loudness, so a file is only
+	analysed once per BPM range. Safe to call from a background thread when ffmpeg is given.
+	"""
+	stat = os.stat(audio_path)
+	key = (stat.st_mtime, stat.st_size)
+	analysis = [min_bpm, max_bpm]
+	cached = _tempo_cache.get(audio_path)
+	if cached and cached[:3] == (*key, analysis):
+		return cached[3]
+	
+	sidecar = os.path.splitext(audio_path)[0] + "_tempo.json"
+	try:
+		with open(sidecar, 'r') as file:
+			data = json.load(file)
+		if (data["mtime"], data["size"]) == key and data["analysis"] == analysis:
+			_tempo_cache[audio_path] = (*key, analysis, data["tempo"])
+			return data["tempo"]
+	except (OSError, ValueError, KeyError):
+		pass
+	
+	tempo = None
+	envelope = read_audio_envelope(audio_path, ffmpeg)
+	if envelope is not None:
+		onsets = audio_peaks.onset_strength(envelope)
+		estimate = audio_peaks.estimate_tempo(onsets, min_bpm=min_bpm, max_bpm=max_bpm)
+		if estimate:
+			tempo = {
+				"bpm": estimate[0],
+				"phase": estimate[1],
+				"confidence": estimate[2],
+				"segments": audio_peaks.estimate_tempo_segments(onsets, min_bpm=min_bpm, max_bpm=max_bpm),
+			}
+	
+	_tempo_cache[audio_path] = (*key, analysis, tempo)
+	try:
+		with open(sidecar, 'w') as file:
+			json.dump({"mtime": key[0], "size": key[1], "analysis": analysis, "tempo": tempo}, file)
+	except OSError as exc:
+		print(f"Failed to write tempo sidecar: {exc}")
+	return tempo
+
+
+
+_BENCH_PATTERN = re.compile(r"bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s")
+
+def generate_waveform_image(audio_path, width, height, image_path, window=None, stats=None, ffmpeg=None, gain=0.0, split_channels=False):
+	"""Generate a waveform image using FFmpeg with the defined parameters.
+	When a (start, duration) window in seconds is supplied, FFmpeg seeks the input
+	and only decodes that section of the audio file.
+	Normalisation is a fixed gain in dB (see analyse_loudness), and split_channels
+	draws each audio channel in its own lane instead of a mono down-mix.
+	If a stats dictionary is supplied it's filled with the wall time (including process
+	spawn), FFmpeg's own processing time from -benchmark, and the output file size.
+	"""
+	if ffmpeg is None:
+		ffmpeg = bpy.context.preferences.addons[__package__].preferences.ffmpeg_location
+	
+	ffmpeg_cmd = [ffmpeg, "-hide_banner", "-benchmark"]
+	if window:
+		ffmpeg_cmd += ["-ss", f"{window[0]:.3f}", "-t", f"{window[1]:.3f}"]
+	if split_channels:
+		waves = f"showwavespic=s={width}x{height}:split_channels=1:colors=white@1"
+	else:
+		waves = f"aformat=channel_layouts=mono,showwavespic=s={width}x{height}:colors=white@1"
+	ffmpeg_cmd += [
+		"-i", audio_path,
 		"-filter_complex",
-		f"aformat=channel_layouts=mono,loudnorm=I=-16:TP=-1:LRA=2,showwavespic=s={width}x{height}:colors=white@1,scale={width}:{height}",
+		f"volume={gain:.2f}dB,{waves},scale={width}:{height}",
 		"-frames:v", "1", "-pix_fmt", "rgba",
 		"-y", image_path
 	]
 	
+	start_time = time.perf_counter()
 	try:
-		subprocess.run(ffmpeg_cmd, check=True)
-#		subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
-		return image_path
-	except subprocess.CalledProcessError:
+		result = subprocess.run(ffmpeg_cmd, check=True, capture_output=True, text=True)
+	except (subprocess.CalledProcessError, OSError) as exc:
 		print(f"Failed to generate waveform for {audio_path}")
+		if getattr(exc, 'stderr', None):
+			print(exc.stderr.strip().splitlines()[-1])
 		return None
+	
+	if stats is not None:
+		bench = _BENCH_PATTERN.search(result.stderr)
+		stats["wall"] = time.perf_counter() - start_time
+		# FFmpeg's real time covers decoding, filtering and encoding, but not the process start
+		stats["process"] = float(bench.group(3)) if bench else 0.0
+		stats["size"] = os.path.getsize(image_path) if os.path.isfile(image_path) else 0
+		stats["cached"] = False
+	return image_path
+
+
+
+def _clip_source(clip):
+	"""Resolve the absolute audio file path used by a sound strip (relative to its library when linked)."""
+	return os.path.realpath(bpy.path.abspath(clip.sound.filepath, library=clip.sound.library))
+
 
 
+def _clip_window(clip):
+	"""Section of the source audio visible in a sound strip, as (start, duration) in seconds.
+	Accounts for the strip's start trim and any sound offset, using the owning scene's frame rate.
+	"""
+	scene = clip.id_data
+	fps = scene.render.fps / scene.render.fps_base
+	offset = clip.frame_offset_start + getattr(clip, 'animation_offset_start', 0)
+	start = offset / fps + getattr(clip, 'sound_offset', 0.0)
+	return (round(max(start, 0.0), 3), round(clip.frame_final_duration / fps, 3))
+
+
+
+# Waveform images live in one cache folder instead of next to the audio. The per-user cache
+# is trimmed to this size by removing the least recently used images
+WAVEFORM_CACHE_LIMIT = 512 * 1024 * 1024
 
-def generate_waveform_overlay_data():
-	"""Load or generate waveform images and prepare overlay data for drawing.
-	Existing cached waveform images on disk are loaded immediately without
-	re-running FFmpeg.  FFmpeg is only called when the image file is absent.
+def waveform_cache_folder(location=None):
+	"""Waveform image cache: the shared location from the preferences when set, otherwise
+	the extension's user folder. A location can be passed to override the preference.
 	"""
-	global waveform_overlays
-	waveform_overlays.clear()
+	if location is None:
+		location = bpy.context.preferences.addons[__package__].preferences.waveform_cache_location
+	if location:
+		folder = bpy.path.abspath(location)
+		try:
+			os.makedirs(folder, exist_ok=True)
+			return folder
+		except OSError as e:
+			print(f"Waveform cache location unavailable, using the user cache: {e}")
+	try:
+		return bpy.utils.extension_path_user(__package__, path="waveforms", create=True)
+	except (ValueError, AttributeError):
+		folder = os.path.join(tempfile.gettempdir(), "production_kit_waveforms")
+		os.makedirs(folder, exist_ok=True)
+		return folder
+
+
+
+def _clip_image_path(audio_path, window, split_channels=False, folder=None):
+	"""Cached waveform image location for a specific window of an audio file, unique per source path.
+	Machines sharing a cache folder find each other's images when they see the audio at the same path.
+	"""
+	suffix = "_split" if split_channels else ""
+	stem = os.path.splitext(os.path.basename(audio_path))[0]
+	digest = hashlib.sha1(os.path.normcase(audio_path).encode('utf-8')).hexdigest()[:8]
+	return os.path.join(folder or waveform_cache_folder(), f"{stem}_{digest}_{window[0]:.3f}-{window[1]:.3f}{suffix}.png")
+
+
+
+def prune_waveform_cache(keep=(), limit=WAVEFORM_CACHE_LIMIT):
+	"""Delete the least recently used waveform images until the user cache fits the size limit.
+	Images in keep, such as those used by the open file, are never deleted. A shared cache
+	location is left alone, images other users still need can't be known here.
+	"""
+	if bpy.context.preferences.addons[__package__].preferences.waveform_cache_location:
+		return
+	try:
+		with os.scandir(waveform_cache_folder()) as entries:
+			files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries if entry.name.endswith('.png')]
+	except OSError:
+		return
+	total = sum(size for _, size, _ in files)
+	for _, size, path in sorted(files):
+		if total <= limit:
+			break
+		if path in keep:
+			continue
+		try:
+			os.remove(path)
+			total -= size
+		except OSError:
+			pass
+
+
+
+def _clip_placement(instance):
+	"""Timeline placement values of a clip that don't require regenerating the waveform.
+	Crop is the visible fraction of the waveform image when a meta or scene strip cuts the clip off.
+	"""
+	clip, offset, bounds, channel = instance
+	start = clip.frame_final_start + offset
+	end = clip.frame_final_end + offset
+	visible_start = max(start, bounds[0])
+	visible_end = max(min(end, bounds[1]), visible_start)
+	duration = max(end - start, 1)
+	return {
+		"start": int(visible_start),
+		"end": int(visible_end),
+		"channel": channel,
+		"crop": ((visible_start - start) / duration, (visible_end - start) / duration),
+	}
+
+
+
+def _clip_signature(clip):
+	"""Values that require a new waveform image when changed: the source file and its visible window."""
+	return (clip.sound.filepath, _clip_window(clip))
+
+
+
+def _render_overlay_pixels(clip, prefs, audio_path, window, image_path, stats):
+	"""Render the waveform for uncompressed audio in-process, skipping FFmpeg and the PNG round trip.
+	Returns True if the file was supported and the pixels were stored.
+	"""
+	start_time = time.perf_counter()
+	width = int(clip.frame_final_duration * prefs.waveform_size_x)
+	peaks = audio_peaks.read_peaks(audio_path, width, window[0], window[1])
+	if peaks is None:
+		return False
+	process = time.perf_counter() - start_time
+	gain = loudness_gain(analyse_loudness(audio_path))
+	render_start = time.perf_counter()
+	pixels = audio_peaks.render_peaks(*peaks, int(prefs.waveform_size_y), prefs.waveform_split_channels, gain)
+	process += time.perf_counter() - render_start
+	_waveform_pixels[image_path] = _to_uint8(pixels)
+	stats.update({"wall": time.perf_counter() - start_time, "process": process, "size": pixels.nbytes, "cached": False})
+	return True
+
+
+
+def build_overlay(instance, prefs, stats):
+	"""Load or generate the waveform image for a single clip and return its overlay data.
+	Uncompressed WAV and AIFF files are decoded in-process. Otherwise existing cached
+	waveform images on disk are loaded immediately without re-running FFmpeg, and
+	FFmpeg is only called when the image file is absent.
+	Generation timing is written into the supplied stats dictionary.
+	"""
+	clip = instance[0]
+	audio_path = _clip_source(clip)
+	window = _clip_window(clip)
+	image_path = _clip_image_path(audio_path, window, prefs.waveform_split_channels)
+	
+	if not os.path.isfile(audio_path):
+		return None
 	
+	if image_path in _waveform_pixels or _render_overlay_pixels(clip, prefs, audio_path, window, image_path, stats):
+		# Rendered in-process, nothing to load from disk
+		pass
+	elif os.path.isfile(image_path):
+		# Cached image already exists — use it directly without re-generating.
+		# Also purge any stale Blender-internal image block so the file on disk
+		# is always the authoritative source when we load it in prepare_waveforms().
+		existing_img = bpy.data.images.get(image_path)
+		if existing_img:
+			bpy.data.images.remove(existing_img)
+		# Modification time marks the image as recently used for cache pruning
+		try:
+			os.utime(image_path)
+		except OSError:
+			pass
+		stats.update({"wall": 0.0, "process": 0.0, "size": os.path.getsize(image_path), "cached": True})
+	else:
+		# No cached image — generate it now via FFmpeg.
+		width = int(clip.frame_final_duration * prefs.waveform_size_x)
+		height = int(prefs.waveform_size_y)
+		gain = loudness_gain(analyse_loudness(audio_path))
+		image_path = generate_waveform_image(audio_path, width, height, image_path, window, stats, gain=gain, split_channels=prefs.waveform_split_channels)
+	
+	if image_path and (image_path in _waveform_pixels or os.path.exists(image_path)):
+		if stats.get("cached") is False:
+			# New pixels under a key the atlas may already hold
+			invalidate_waveform_atlas(image_path)
+		overlay = _clip_placement(instance)
+		overlay["source"] = _clip_signature(clip)
+		overlay["image"] = image_path
+		return overlay
+	return None
+
+
+
+def _prune_waveform_pixels():
+	"""Release in-process pixels no longer used by any overlay in any scene."""
+	used = {overlay["image"] for overlays in waveform_overlays.values() for overlay in overlays.values()}
+	for key in [key for key in _waveform_pixels if key not in used]:
+		del _waveform_pixels[key]
+
+
+
+def generate_waveform_overlay_data(scene=None):
+	"""Rebuild a scene's overlay data from scratch, other scenes are left untouched."""
+	if scene is None:
+		scene = display_scene(bpy.context)
 	prefs = bpy.context.preferences.addons[__package__].preferences
 	
-	for clip in get_audio_clips():
-		audio_path = bpy.path.abspath(clip.sound.filepath)
-		audio_path = os.path.realpath(audio_path)
-		image_path = os.path.splitext(audio_path)[0] + "_waveform.png"
-		
-		if not os.path.isfile(audio_path):
-			continue
-		
-		if os.path.isfile(image_path):
-			# Cached image already exists — use it directly without re-generating.
-			# Also purge any stale Blender-internal image block so the file on disk
-			# is always the authoritative source when we load it in draw_waveforms().
-			existing_img = bpy.data.images.get(image_path)
-			if existing_img:
-				bpy.data.images.remove(existing_img)
+	overlays = waveform_overlays[scene.name] = {}
+	stats = waveform_stats[scene.name] = {}
+	skipped = _skipped_clips[scene.name] = {}
+	dependencies = _scene_dependencies[scene.name] = set()
+	invalidate_waveform_atlas()
+	
+	for key, instance in get_audio_clips(scene, dependencies).items():
+		clip_stats = {}
+		overlay = build_overlay(instance, prefs, clip_stats)
+		if overlay:
+			overlays[key] = overlay
 		else:
-			# No cached image — generate it now via FFmpeg.
-			width = int(clip.frame_final_duration * prefs.waveform_size_x)
-			height = int(prefs.waveform_size_y)
-			image_path = generate_waveform_image(audio_path, width, height, image_path)
-		
-		if image_path and os.path.exists(image_path):
-			waveform_overlays.append({
-				"start": int(clip.frame_start),
-				"end": int(clip.frame_start) + int(clip.frame_final_duration),
-				"channel": clip.channel,
-				"image": image_path
-			})
+			skipped[key] = _clip_signature(instance[0])
+		if clip_stats:
+			stats[key] = clip_stats
+	_prune_waveform_pixels()
+	prune_waveform_cache({overlay["image"] for overlays in waveform_overlays.values() for overlay in overlays.values()})
 
 
 
-def draw_waveforms():
-	"""Draw waveforms as overlays in the Dopesheet/Timeline."""
-	settings = bpy.context.scene.production_kit_settings
-	
-	# If not enabled or waveforms are not loaded, return (instead of registering/unregistering)
-	if not settings.waveform_show or not waveform_overlays:
-		return
+def update_waveform_overlay_data(scene=None, rebuild=True):
+	"""Diff a scene's current clips against its overlay data and only update what changed.
+	Moved strips are updated in place without touching the filesystem, only added
+	strips or strips with a new sound source or trim window are loaded or generated.
+	Strips that previously failed are not retried until their source changes.
+	Returns True if any strip still needs rebuilding (only possible when rebuild is False).
+	"""
+	if scene is None:
+		scene = display_scene(bpy.context)
+	if scene.name not in waveform_overlays:
+		if rebuild:
+			generate_waveform_overlay_data(scene)
+			return False
+		return True
 	
+	pending = False
 	prefs = bpy.context.preferences.addons[__package__].preferences
-	shader = gpu.shader.from_builtin('IMAGE_COLOR')
+	overlays = waveform_overlays[scene.name]
+	stats = waveform_stats[scene.name]
+	skipped = _skipped_clips[scene.name]
+	dependencies = _scene_dependencies[scene.name] = set()
+	clips = get_audio_clips(scene, dependencies)
+	
+	# Remove overlays for deleted strips
+	for key in [key for key in overlays if key not in clips]:
+		del overlays[key]
+		invalidate_waveform_atlas()
+	for registry in (skipped, stats):
+		for key in [key for key in registry if key not in clips]:
+			del registry[key]
+	
+	for key, instance in clips.items():
+		overlay = overlays.get(key)
+		signature = _clip_signature(instance[0])
+		if overlay is None or overlay["source"] != signature:
+			if skipped.get(key) == signature:
+				continue
+			if not rebuild:
+				# Stretch the existing image to the new placement until the rebuild runs
+				if overlay is not None:
+					overlay.update(_clip_placement(instance))
+				pending = True
+				continue
+			clip_stats = {}
+			overlay = build_overlay(instance, prefs, clip_stats)
+			if overlay:
+				overlays[key] = overlay
+				skipped.pop(key, None)
+			else:
+				overlays.pop(key, None)
+				skipped[key] = signature
+			if clip_stats:
+				stats[key] = clip_stats
+			invalidate_waveform_atlas()
+		else:
+			overlay.update(_clip_placement(instance))
 	
-	for overlay in waveform_overlays:
+	_prune_waveform_pixels()
+	return pending
+
+
+
+def request_waveform_update(scene_name):
+	"""Queue a scene for a deferred overlay update, restarting the settle delay."""
+	_pending_scenes.add(scene_name)
+	if bpy.app.timers.is_registered(_deferred_rebuild):
+		bpy.app.timers.unregister(_deferred_rebuild)
+	bpy.app.timers.register(_deferred_rebuild, first_interval=0.5)
+
+
+
+def _deferred_rebuild():
+	"""Timer callback: regenerate waveforms for scenes changed since the last depsgraph update."""
+	names = list(_pending_scenes)
+	_pending_scenes.clear()
+	for name in names:
+		scene = bpy.data.scenes.get(name)
+		if scene is None:
+			continue
 		try:
-			# Get image data
-			img = bpy.data.images.get(overlay["image"])
-			if not img:
-				img = bpy.data.images.load(overlay["image"], check_existing=True)
-				
-			if img.size[0] == 0 or img.size[1] == 0:
-				print(f"Image size is invalid: {overlay['image']}")
+			update_waveform_overlay_data(scene)
+		except Exception as e:
+			print(f"Waveform rebuild error: {e}")
+	return None
+
+
+
+@persistent
+def _on_depsgraph_update(scene, depsgraph):
+	"""App handler: keep each scene's overlays in sync with sequencer edits while waveforms are shown.
+	Only registered scenes that changed, or that use a changed scene through a scene strip, are updated.
+	"""
+	try:
+		if not scene.production_kit_settings.waveform_show:
+			return
+		updated = {update.id.original.name for update in depsgraph.updates if isinstance(update.id, bpy.types.Scene)}
+		if not updated:
+			return
+		for name in list(waveform_overlays):
+			if name not in updated and not (_scene_dependencies.get(name, set()) & updated):
 				continue
-			
-			# Convert to GPU texture
-			texture = gpu.texture.from_image(img)
-			if not texture:
-				print(f"Failed to create GPU texture for {overlay['image']}")
+			registered = bpy.data.scenes.get(name)
+			if registered is None:
+				# Scene was removed or renamed
+				for registry in (waveform_overlays, waveform_stats, _skipped_clips, _scene_dependencies):
+					registry.pop(name, None)
+				invalidate_waveform_atlas()
+				continue
+			# Regeneration is deferred until edits settle, so dragging a trim handle doesn't run FFmpeg on every step
+			if update_waveform_overlay_data(registered, rebuild=False):
+				request_waveform_update(name)
+	except Exception as e:
+		print(f"Waveform depsgraph update error: {e}")
+
+
+
+def invalidate_waveform_atlas(image=None):
+	"""Schedule an atlas update from the current overlays, optionally packing a regenerated image again."""
+	if bpy.app.background:
+		return
+	if image:
+		_atlas_stale.add(image)
+	if not bpy.app.timers.is_registered(_update_waveform_atlas):
+		bpy.app.timers.register(_update_waveform_atlas, first_interval=0.0)
+
+
+
+def _to_uint8(pixels):
+	return (np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+
+def _load_waveform_pixels(image_path):
+	"""Read a waveform image into a (height, width, 4) uint8 array."""
+	if image_path in _waveform_pixels:
+		return _waveform_pixels[image_path]
+	try:
+		img = bpy.data.images.load(image_path, check_existing=True)
+	except RuntimeError as e:
+		print(f"Failed to load waveform image: {e}")
+		return None
+	width, height = img.size
+	if width == 0 or height == 0:
+		print(f"Image size is invalid: {image_path}")
+		bpy.data.images.remove(img)
+		return None
+	pixels = np.empty(width * height * 4, dtype=np.float32)
+	img.pixels.foreach_get(pixels)
+	# The pixels are copied into the atlas, so the image block is released right away
+	bpy.data.images.remove(img)
+	return _to_uint8(pixels.reshape(height, width, 4))
+
+
+
+class _AtlasPage:
+	"""One atlas texture, with images packed left to right in rows (shelves) of equal height.
+	Space of removed images is reused by later images of the same height.
+	"""
+	
+	def __init__(self, size):
+		self.size = size
+		# Rows are only allocated as shelves need them
+		self.pixels = np.zeros((0, size, 4), dtype=np.uint8)
+		# Shelves as [y, height, next free x, [(x, width) gaps left by removed images]]
+		self.shelves = []
+		self.count = 0
+		self.texture = None
+		self.changed = False
+	
+	def allocate(self, width, height):
+		"""Top left corner of a free width x height area, or None if the page is full."""
+		for shelf in self.shelves:
+			y, shelf_height, free_x, gaps = shelf
+			if shelf_height != height:
+				continue
+			for index, (x, gap) in enumerate(gaps):
+				if gap >= width:
+					gaps[index] = (x + width, gap - width)
+					return self._place(x, y)
+			if free_x + width <= self.size:
+				shelf[2] += width
+				return self._place(free_x, y)
+		top = self.shelves[-1][0] + self.shelves[-1][1] if self.shelves else 0
+		if top + height > self.size:
+			return None
+		self.shelves.append([top, height, width, []])
+		if top + height > len(self.pixels):
+			# Grow in doubling steps, so adding shelves one at a time doesn't copy the page every time
+			pixels = np.zeros((min(self.size, max(top + height, len(self.pixels) * 2)), self.size, 4), dtype=np.uint8)
+			pixels[:len(self.pixels)] = self.pixels
+			self.pixels = pixels
+		return self._place(0, top)
+	
+	def _place(self, x, y):
+		self.count += 1
+		self.changed = True
+		return x, y
+	
+	def release(self, x, y, width):
+		"""Free an area returned by allocate, an empty page is reset."""
+		self.count -= 1
+		if self.count == 0:
+			self.__init__(self.size)
+			self.changed = True
+			return
+		for shelf in self.shelves:
+			if shelf[0] == y:
+				if x + width == shelf[2]:
+					shelf[2] = x
+				else:
+					shelf[3].append((x, width))
+				break
+
+
+
+def _atlas_insert(pixels):
+	"""Copy an image into the first atlas pages with room, adding pages when all are full.
+	Returns its regions, one per strip of at most a page wide.
+	"""
+	pixels = pixels[:ATLAS_PAGE_SIZE]
+	height = pixels.shape[0]
+	regions = []
+	for left in range(0, pixels.shape[1], ATLAS_PAGE_SIZE):
+		strip = pixels[:, left:left + ATLAS_PAGE_SIZE]
+		width = strip.shape[1]
+		for index, page in enumerate(_atlas_pages):
+			corner = page.allocate(width, height)
+			if corner is not None:
+				break
+		else:
+			page = _AtlasPage(ATLAS_PAGE_SIZE)
+			_atlas_pages.append(page)
+			index = len(_atlas_pages) - 1
+			corner = page.allocate(width, height)
+		x, y = corner
+		page.pixels[y:y + height, x:x + width] = strip
+		regions.append((index, x, y, width, height))
+	return regions
+
+
+
+def _update_waveform_atlas():
+	"""Timer callback: pack images used by any overlay into the atlas and free images no longer used.
+	Only new and regenerated images are loaded, packed images keep their place.
+	"""
+	global _atlas_generation
+	try:
+		used = {overlay["image"] for overlays in waveform_overlays.values() for overlay in overlays.values()}
+		removed = [key for key in _atlas_regions if key not in used or key in _atlas_stale]
+		_atlas_stale.clear()
+		for key in removed:
+			for index, x, y, width, _ in _atlas_regions.pop(key):
+				_atlas_pages[index].release(x, y, width)
+		added = [key for key in sorted(used) if key not in _atlas_regions]
+		for key in added:
+			pixels = _load_waveform_pixels(key)
+			if pixels is not None:
+				_atlas_regions[key] = _atlas_insert(pixels)
+		if removed or added:
+			_atlas_generation += 1
+			for window in bpy.context.window_manager.windows:
+				for area in window.screen.areas:
+					if area.type == 'DOPESHEET_EDITOR':
+						area.tag_redraw()
+	except Exception as e:
+		print(f"Waveform atlas update error: {e}")
+	return None
+
+
+
+def _upload_atlas_pages():
+	"""Create textures for atlas pages changed since the last draw.
+	Must be called from a draw callback, GPU textures can't be created elsewhere.
+	"""
+	for page in _atlas_pages:
+		if not page.changed:
+			continue
+		page.changed = False
+		page.texture = None
+		if len(page.pixels):
+			buffer = gpu.types.Buffer('UBYTE', page.pixels.size, page.pixels.ravel())
+			page.texture = gpu.types.GPUTexture((page.size, len(page.pixels)), format='RGBA8', data=buffer)
+
+
+
+def prepare_waveforms(context, region, cache):
+	"""Timeline overlay layer: draw waveforms in the Dopesheet/Timeline.
+	Each Timeline draws the clip registry of the scene it shows. Clips outside the
+	visible frame range are culled, the remainder are drawn from the shared texture
+	atlas with one batch per page, rebuilt only when placements or the view change.
+	"""
+	# Display settings belong to the scene whose strips are shown, which may not be the active scene
+	scene = display_scene(context)
+	settings = scene.production_kit_settings
+	
+	# If not enabled, return (instead of registering/unregistering)
+	if not settings.waveform_show:
+		return None
+	
+	overlays = waveform_overlays.get(scene.name)
+	if overlays is None:
+		# Scene shown for the first time, data can't be modified while drawing so build it from a timer
+		if scene.name not in _pending_scenes:
+			request_waveform_update(scene.name)
+		return None
+	if not overlays:
+		return None
+	
+	if not _atlas_regions:
+		return None
+	_upload_atlas_pages()
+	
+	prefs = context.preferences.addons[__package__].preferences
+	view2d = region.view2d
+	
+	# Visible frame range from the region edges
+	view_start = view2d.region_to_view(0, 0)[0]
+	view_end = view2d.region_to_view(region.width, 0)[0]
+	
+	height_scaled = prefs.waveform_size_y * settings.waveform_display_scale  # Scale the waveform height
+	
+	key = (
+		_atlas_generation, view_start, view_end, region.width, height_scaled, settings.waveform_display_offset,
+		timeline_overlays.reduced_detail,
+		tuple((overlay["start"], overlay["end"], overlay["channel"], overlay["crop"], overlay["image"]) for overlay in overlays.values()),
+	)
+	if cache.get("key") != key:
+		pos = {}
+		uvs = {}
+		for overlay in overlays.values():
+			if overlay["end"] < view_start or overlay["start"] > view_end or overlay["end"] <= overlay["start"]:
+				continue
+			regions = _atlas_regions.get(overlay["image"])
+			crop0, crop1 = overlay["crop"]
+			if regions is None or crop1 <= crop0:
 				continue
 			
 			# Create mesh for display
-			start_x = overlay["start"]
-			end_x = overlay["end"]
-			screen_x_start = bpy.context.region.view2d.view_to_region(start_x, 0, clip=False)[0]
-			screen_x_end = bpy.context.region.view2d.view_to_region(end_x, 0, clip=False)[0]
-			
-			height_scaled = prefs.waveform_size_y * settings.waveform_display_scale  # Scale the waveform height
+			screen_x_start = view2d.view_to_region(overlay["start"], 0, clip=False)[0]
+			screen_x_end = view2d.view_to_region(overlay["end"], 0, clip=False)[0]
+			if timeline_overlays.reduced_detail and screen_x_end - screen_x_start < 2.0:
+				# Over the draw budget, clips narrower than a couple of pixels are skipped
+				continue
 			screen_y = settings.waveform_display_offset - height_scaled + (overlay["channel"] * height_scaled * 0.5) # Offset each channel
 			
-			# Create shader batch
-			batch = batch_for_shader(shader, 'TRI_FAN', {
-				"pos": [
-					(screen_x_start, screen_y),
-					(screen_x_end, screen_y),
-					(screen_x_end, screen_y + height_scaled),
-					(screen_x_start, screen_y + height_scaled)
-				],
-				"texCoord": [(0, 0), (1, 0), (1, 1), (0, 1)]
-			})
-			
-			# Bind texture and apply color tint with alpha
-			gpu.state.blend_set('ALPHA') # https://docs.blender.org/api/current/gpu.state.html
-			shader.bind()
-			shader.uniform_sampler("image", texture)
-			shader.uniform_float("color", settings.waveform_display_color)
-			batch.draw(shader)
-			gpu.state.blend_set('NONE')
-			
-		except Exception as e:
-			print(f"Error rendering waveform: {e}")
+			# Visible part of the image in image pixels, and its scale on screen
+			total = sum(region[3] for region in regions)
+			visible_start, visible_end = crop0 * total, crop1 * total
+			scale = (screen_x_end - screen_x_start) / (visible_end - visible_start)
+			left = 0
+			for index, x, y, width, height in regions:
+				# One quad per strip of the image that falls inside the visible part
+				start, end = max(left, visible_start), min(left + width, visible_end)
+				if start < end:
+					page_height = len(_atlas_pages[index].pixels)
+					u0 = (x + start - left) / ATLAS_PAGE_SIZE
+					u1 = (x + end - left) / ATLAS_PAGE_SIZE
+					v0 = y / page_height
+					v1 = (y + height) / page_height
+					x0 = screen_x_start + (start - visible_start) * scale
+					x1 = screen_x_start + (end - visible_start) * scale
+					bl = (x0, screen_y)
+					br = (x1, screen_y)
+					tr = (x1, screen_y + height_scaled)
+					tl = (x0, screen_y + height_scaled)
+					pos.setdefault(index, []).extend((bl, br, tr,   bl, tr, tl))
+					uvs.setdefault(index, []).extend(((u0, v0), (u1, v0), (u1, v1),   (u0, v0), (u1, v1), (u0, v1)))
+				left += width
+		
+		cache["key"] = key
+		shader = timeline_overlays.get_shader('IMAGE_COLOR')
+		cache["batches"] = [(index, batch_for_shader(shader, 'TRIS', {"pos": pos[index], "texCoord": uvs[index]})) for index in sorted(pos)]
+	
+	# Each page's texture tinted with the display color and alpha
+	color = settings.waveform_display_color
+	commands = [('IMAGE_COLOR', batch, {"image": _atlas_pages[index].texture, "color": color}) for index, batch in cache["batches"] if _atlas_pages[index].texture]
+	return commands or None
 
 
 
 class RegenerateWaveformsOperator(bpy.types.Operator):
-	"""Regenerate all waveform images from source audio files"""
+	"""Regenerate all waveform images for the current scene from source audio files"""
 	bl_idname = "timeline.regenerate_waveforms"
 	bl_label = "Regenerate Waveforms"
 	
 	def execute(self, context):
-		# Delete cached waveform images so they get regenerated fresh
-		for clip in get_audio_clips():
-			audio_path = bpy.path.abspath(clip.sound.filepath)
-			audio_path = os.path.realpath(audio_path)
-			image_path = os.path.splitext(audio_path)[0] + "_waveform.png"
-			if os.path.isfile(image_path):
-				os.remove(image_path)
+		prefs = context.preferences.addons[__package__].preferences
+		scene = display_scene(context)
+		# Delete cached waveform images so they get regenerated fresh (loudness sidecars are kept, they only depend on the source file)
+		for clip, _, _, _ in get_audio_clips(scene).values():
+			audio_path = _clip_source(clip)
+			image_path = _clip_image_path(audio_path, _clip_window(clip), prefs.waveform_split_channels)
+			_waveform_pixels.pop(image_path, None)
+			# Older versions wrote one image for the whole file next to the audio
+			legacy = os.path.splitext(audio_path)[0] + "_waveform.png"
+			for path in (image_path, legacy):
+				if os.path.isfile(path):
+					os.remove(path)
 			img = bpy.data.images.get(image_path)
 			if img:
 				bpy.data.images.remove(img)
-		generate_waveform_overlay_data()
+		generate_waveform_overlay_data(scene)
+		return {'FINISHED'}
+
+
+
+class ExportWaveformStatsOperator(bpy.types.Operator):
+	"""Export waveform generation timing for each clip as JSON"""
+	bl_idname = "timeline.export_waveform_stats"
+	bl_label = "Export Waveform Stats"
+	
+	filepath: bpy.props.StringProperty(subtype="FILE_PATH")
+	
+	@classmethod
+	def poll(cls, context):
+		return any(waveform_stats.values())
+	
+	def invoke(self, context, event):
+		if not self.filepath:
+			self.filepath = bpy.path.abspath("//waveform_stats.json") if bpy.data.filepath else "waveform_stats.json"
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def execute(self, context):
+		with open(bpy.path.abspath(self.filepath), 'w') as file:
+			json.dump(waveform_stats, file, indent=2, sort_keys=True)
+		self.report({'INFO'}, f"Saved waveform stats for {sum(len(stats) for stats in waveform_stats.values())} clips")
+		return {'FINISHED'}
+
+
+
+def _write_tone(filepath, seconds, frequency=440.0, sample_rate=48000):
+	"""Write a 16 bit mono sine tone WAV file for benchmarking."""
+	with wave.open(filepath, 'wb') as file:
+		file.setnchannels(1)
+		file.setsampwidth(2)
+		file.setframerate(sample_rate)
+		step = math.tau * frequency / sample_rate
+		# Write one second at a time to keep memory use flat for long tones, the last block
+		# is cut short so fractional lengths get their exact frame count
+		second = b"".join(struct.pack('<h', int(math.sin(i * step) * 16000)) for i in range(sample_rate))
+		frames = round(seconds * sample_rate)
+		while frames > 0:
+			count = min(frames, sample_rate)
+			file.writeframes(second[:count * 2])
+			frames -= count
+
+
+
+def _encode_audio(source, target, ffmpeg):
+	"""Encode an audio file with FFmpeg into the format of the target's extension, returns False on failure."""
+	try:
+		subprocess.run([ffmpeg, "-hide_banner", "-y", "-i", source, target], check=True, capture_output=True)
+	except (subprocess.CalledProcessError, OSError):
+		print(f"Failed to encode {target}")
+		return False
+	return True
+
+
+
+def _ffmpeg_decode_time(audio_path, window, ffmpeg):
+	"""FFmpeg's real time for only decoding a window of an audio file, or None on failure."""
+	ffmpeg_cmd = [ffmpeg, "-hide_banner", "-benchmark", "-ss", f"{window[0]:.3f}", "-t", f"{window[1]:.3f}", "-i", audio_path, "-f", "null", "-"]
+	try:
+		result = subprocess.run(ffmpeg_cmd, check=True, capture_output=True, text=True)
+	except (subprocess.CalledProcessError, OSError):
+		return None
+	bench = _BENCH_PATTERN.search(result.stderr)
+	return float(bench.group(3)) if bench else None
+
+
+
+class BenchmarkWaveformsOperator(bpy.types.Operator):
+	"""Generate synthetic tone files and time both waveform paths for each length: in-process drawing of
+	WAV files, and FFmpeg drawing of the WAV and a compressed FLAC copy.
+	Loudness analysis and decoding are timed separately. Wall times cover decoding and drawing the image
+	but not loudness, so the two paths can be compared directly.
+	Runs headless with: blender -b --python-expr "import bpy; bpy.ops.timeline.benchmark_waveforms(output='/tmp/bench.json')"
+	"""
+	bl_idname = "timeline.benchmark_waveforms"
+	bl_label = "Benchmark Waveforms"
+	
+	durations: bpy.props.StringProperty(
+		name="Durations",
+		description="Comma separated tone lengths in seconds",
+		default="10,60,300,1200")
+	fps: bpy.props.FloatProperty(
+		name="FPS",
+		description="Frame rate used to size the waveform images",
+		default=24.0)
+	output: bpy.props.StringProperty(
+		name="Output",
+		description="Optional JSON file for the results",
+		default="",
+		subtype="FILE_PATH")
+	
+	def execute(self, context):
+		prefs = context.preferences.addons[__package__].preferences
+		ffmpeg = prefs.ffmpeg_location if prefs.ffmpeg_processing and prefs.ffmpeg_exists else None
+		height = int(prefs.waveform_size_y)
+		split_channels = prefs.waveform_split_channels
+		results = []
+		with tempfile.TemporaryDirectory() as directory:
+			for seconds in [float(value) for value in self.durations.split(',') if value.strip()]:
+				width = int(seconds * self.fps * prefs.waveform_size_x)
+				window = (0.0, seconds)
+				wav_path = os.path.join(directory, f"tone_{seconds:g}.wav")
+				_write_tone(wav_path, seconds)
+				inputs = [wav_path]
+				flac_path = os.path.splitext(wav_path)[0] + ".flac"
+				if ffmpeg and _encode_audio(wav_path, flac_path, ffmpeg):
+					inputs.append(flac_path)
+				
+				for audio_path in inputs:
+					audio_format = os.path.splitext(audio_path)[1][1:]
+					start_time = time.perf_counter()
+					gain = loudness_gain(analyse_loudness(audio_path, ffmpeg))
+					loudness = time.perf_counter() - start_time
+					
+					runs = []
+					if audio_peaks.is_supported(audio_path):
+						# Same steps as _render_overlay_pixels, with decoding timed on its own
+						stats = {"pipeline": "in-process"}
+						start_time = time.perf_counter()
+						peaks = audio_peaks.read_peaks(audio_path, width, *window)
+						stats["decode"] = time.perf_counter() - start_time
+						pixels = _to_uint8(audio_peaks.render_peaks(*peaks, height, split_channels, gain))
+						stats["wall"] = time.perf_counter() - start_time
+						stats["size"] = pixels.nbytes
+						runs.append(stats)
+					if ffmpeg:
+						stats = {"pipeline": "ffmpeg", "decode": _ffmpeg_decode_time(audio_path, window, ffmpeg)}
+						image_path = os.path.join(directory, f"tone_{seconds:g}_{audio_format}.png")
+						generate_waveform_image(audio_path, width, height, image_path, window, stats, ffmpeg=ffmpeg, gain=gain, split_channels=split_channels)
+						stats.pop("cached", None)
+						runs.append(stats)
+					
+					for stats in runs:
+						stats.update({"seconds": seconds, "width": width, "format": audio_format, "loudness": loudness})
+						results.append(stats)
+						decode = f"{stats['decode']:.3f}s" if stats.get("decode") is not None else "n/a"
+						print(f"Waveform benchmark {seconds:>8.1f}s {audio_format:<4} {stats['pipeline']:<10}: loudness {loudness:.3f}s, decode {decode}, wall {stats.get('wall', 0.0):.3f}s, {stats.get('size', 0)} bytes")
+		
+		if self.output:
+			with open(bpy.path.abspath(self.output), 'w') as file:
+				json.dump(results, file, indent=2)
+		self.report({'INFO'}, f"Benchmarked {len(results)} waveform runs")
+		return {'FINISHED'}
+
+
+
+def _prewarm_jobs(scenes, prefs, folder):
+	"""Collect the cache work for every clip in the given scenes, de-duplicated by output.
+	Returns {image path in the cache folder: (audio path, width, height, window, needs image)}.
+	"""
+	jobs = {}
+	for scene in scenes:
+		for clip, _, _, _ in get_audio_clips(scene).values():
+			audio_path = _clip_source(clip)
+			if not os.path.isfile(audio_path):
+				continue
+			window = _clip_window(clip)
+			image_path = _clip_image_path(audio_path, window, prefs.waveform_split_channels, folder)
+			# Uncompressed audio is drawn in-process, only its loudness sidecar is worth caching
+			needs_image = not audio_peaks.is_supported(audio_path) and not os.path.isfile(image_path)
+			width = int(clip.frame_final_duration * prefs.waveform_size_x)
+			jobs[image_path] = (audio_path, width, int(prefs.waveform_size_y), window, needs_image)
+	return jobs
+
+
+
+def _prewarm_loudness(audio_path, ffmpeg):
+	"""Worker: analyse the loudness of one audio file, returning its gain or None on failure."""
+	try:
+		return loudness_gain(analyse_loudness(audio_path, ffmpeg))
+	except OSError as exc:
+		print(f"Waveform prewarm failed for {audio_path}: {exc}")
+		return None
+
+
+
+def _prewarm_job(image_path, job, gain, ffmpeg, split_channels):
+	"""Worker: generate the waveform image for one clip with its known gain, without touching bpy."""
+	audio_path, width, height, window, needs_image = job
+	if gain is None:
+		return False
+	if needs_image:
+		return generate_waveform_image(audio_path, width, height, image_path, window, ffmpeg=ffmpeg, gain=gain, split_channels=split_channels) is not None
+	return True
+
+
+
+class PrewarmWaveformsOperator(bpy.types.Operator):
+	"""Fill the waveform cache for every sound strip in one or more .blend files ahead of time.
+	Runs headless with: blender -b --python-expr "import bpy; bpy.ops.timeline.prewarm_waveforms(filepaths='/shots/a.blend;/shots/b.blend', cache_location='/mnt/shared/waveforms')"
+	"""
+	bl_idname = "timeline.prewarm_waveforms"
+	bl_label = "Prewarm Waveforms"
+	
+	filepaths: bpy.props.StringProperty(
+		name="Files",
+		description="Semicolon separated .blend files or folders of .blend files, leave empty for the current file",
+		default="")
+	threads: bpy.props.IntProperty(
+		name="Threads",
+		description="Parallel jobs, 0 uses the CPU count",
+		default=0,
+		min=0)
+	cache_location: bpy.props.StringProperty(
+		name="Cache Location",
+		description="Waveform cache folder to fill, leave empty to use the Waveform Cache preference. Set it to the folder workstations read when prewarming as another user",
+		default="",
+		subtype="DIR_PATH")
+	
+	def execute(self, context):
+		from concurrent.futures import ThreadPoolExecutor
+		prefs = context.preferences.addons[__package__].preferences
+		location = self.cache_location or prefs.waveform_cache_location
+		folder = waveform_cache_folder(location)
+		
+		blend_files = []
+		for path in [path.strip() for path in self.filepaths.split(';') if path.strip()]:
+			path = bpy.path.abspath(path)
+			if os.path.isdir(path):
+				blend_files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.blend'))
+			else:
+				blend_files.append(path)
+		
+		# Collect jobs, linking scenes from other files temporarily so their paths resolve against that file
+		jobs = _prewarm_jobs(bpy.data.scenes, prefs, folder) if not blend_files else {}
+		for blend_file in blend_files:
+			if os.path.realpath(blend_file) == os.path.realpath(bpy.data.filepath or ''):
+				jobs.update(_prewarm_jobs(bpy.data.scenes, prefs, folder))
+				continue
+			try:
+				with bpy.data.libraries.load(blend_file, link=True) as (data_from, data_to):
+					data_to.scenes = data_from.scenes
+				scenes = [scene for scene in data_to.scenes if scene]
+				jobs.update(_prewarm_jobs(scenes, prefs, folder))
+				library = scenes[0].library if scenes else None
+				if library:
+					bpy.data.libraries.remove(library)
+			except (OSError, RuntimeError) as exc:
+				print(f"Waveform prewarm skipped {blend_file}: {exc}")
+		
+		threads = self.threads or os.cpu_count() or 1
+		ffmpeg = prefs.ffmpeg_location
+		failed = 0
+		with ThreadPoolExecutor(max_workers=threads) as executor:
+			# Loudness runs once per audio file before any image, so trim windows of the same
+			# source never analyse it concurrently or race to write its sidecar
+			audio_paths = sorted({job[0] for job in jobs.values()})
+			gains = dict(zip(audio_paths, executor.map(lambda audio_path: _prewarm_loudness(audio_path, ffmpeg), audio_paths)))
+			futures = {executor.submit(_prewarm_job, image_path, job, gains[job[0]], ffmpeg, prefs.waveform_split_channels): image_path for image_path, job in jobs.items()}
+			for index, future in enumerate(futures, 1):
+				if not future.result():
+					failed += 1
+				print(f"Waveform prewarm {index}/{len(futures)}: {futures[future]}")
+		if not location:
+			prune_waveform_cache(set(jobs))
+		
+		self.report({'WARNING'} if failed else {'INFO'}, f"Prewarmed {len(jobs) - failed} waveforms in {folder}, {failed} failed")
 		return {'FINISHED'}
 
 
@@ -174,7 +1174,12 @@ def _on_load_post(*args):
 	# Use a depsgraph-update-queued timer so scene properties are fully available.
 	def _deferred():
 		try:
-			settings = bpy.context.scene.production_kit_settings
+			# Registries from the previous file may share scene names with this one
+			for registry in (waveform_overlays, waveform_stats, _skipped_clips, _scene_dependencies):
+				registry.clear()
+			_prune_waveform_pixels()
+			invalidate_waveform_atlas()
+			settings = display_scene(bpy.context).production_kit_settings
 			if settings.waveform_show:
 				generate_waveform_overlay_data()
 		except Exception as e:
@@ -183,16 +1188,36 @@ def _on_load_post(*args):
 
 
 
+def waveforms_available(context):
+	"""True when waveforms can be drawn: FFmpeg processing is enabled, or the displayed scene
+	has uncompressed clips that are drawn in-process. Only file names are checked, so it's cheap enough for panel polls.
+	"""
+	if context.preferences.addons[__package__].preferences.ffmpeg_processing:
+		return True
+	return any(clip.sound.filepath.lower().endswith(audio_peaks.UNCOMPRESSED_EXTENSIONS) for clip, _, _, _ in get_audio_clips(display_scene(context)).values())
+
+
+
 def _draw_waveform_ui(layout, context):
 	"""Shared UI drawing for waveform panels."""
 	prefs = context.preferences.addons[__package__].preferences
-	settings = bpy.context.scene.production_kit_settings
+	settings = display_scene(context).production_kit_settings
 	
 	row = layout.row(align=True)
 	row.prop(settings, "waveform_display_color", text="", icon="MOD_TINT") # MOD_TINT COLOR RESTRICT_COLOR_OFF RESTRICT_COLOR_ON
 	row.prop(settings, "waveform_display_scale", text="Scale", icon="VIEW_PERSPECTIVE")
 	row.prop(settings, "waveform_display_offset", text="Offset", icon="MOD_ARRAY")
 	row.operator("timeline.regenerate_waveforms", text="", icon="FILE_REFRESH")
+	
+	# Generation timing summary
+	scene_stats = waveform_stats.get(display_scene(context).name)
+	if scene_stats:
+		generated = [stats for stats in scene_stats.values() if not stats["cached"]]
+		total = sum(stats["wall"] for stats in generated)
+		process = sum(stats["process"] for stats in generated)
+		row = layout.row(align=True)
+		row.label(text=f"{len(generated)}/{len(scene_stats)} generated, {total:.2f}s ({process:.2f}s processing)")
+		row.operator("timeline.export_waveform_stats", text="", icon="EXPORT")
 
 
 
@@ -208,10 +1233,10 @@ class DOPESHEET_PT_waveform_display(bpy.types.Panel):
 	
 	@classmethod
 	def poll(cls, context):
-		return context.preferences.addons[__package__].preferences.ffmpeg_processing
+		return waveforms_available(context)
 	
 	def draw_header(self, context):
-		self.layout.prop(context.scene.production_kit_settings, "waveform_show", text="")
+		self.layout.prop(display_scene(context).production_kit_settings, "waveform_show", text="")
 		
 	def draw(self, context):
 		_draw_waveform_ui(self.layout, context)
@@ -224,6 +1249,9 @@ class DOPESHEET_PT_waveform_display(bpy.types.Panel):
 
 classes = [
 	RegenerateWaveformsOperator,
+	ExportWaveformStatsOperator,
+	BenchmarkWaveformsOperator,
+	PrewarmWaveformsOperator,
 	DOPESHEET_PT_waveform_display,
 ]
 
@@ -231,22 +1259,26 @@ classes = [
 def register():
 	for cls in classes:
 		bpy.utils.register_class(cls)
-	global draw_handler
-	if draw_handler is None:
-		draw_handler = bpy.types.SpaceDopeSheetEditor.draw_handler_add(
-			draw_waveforms, (), 'WINDOW', 'POST_PIXEL'
-		)
+	timeline_overlays.register_layer("waveforms", prepare_waveforms, order=0)
 	if _on_load_post not in bpy.app.handlers.load_post:
 		bpy.app.handlers.load_post.append(_on_load_post)
+	if _on_depsgraph_update not in bpy.app.handlers.depsgraph_update_post:
+		bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
 
 
 def unregister():
-	global draw_handler
-	if draw_handler is not None:
-		bpy.types.SpaceDopeSheetEditor.draw_handler_remove(draw_handler, 'WINDOW')
-		draw_handler = None
+	timeline_overlays.unregister_layer("waveforms")
+	_atlas_pages.clear()
+	_atlas_regions.clear()
+	_atlas_stale.clear()
+	if bpy.app.timers.is_registered(_update_waveform_atlas):
+		bpy.app.timers.unregister(_update_waveform_atlas)
 	if _on_load_post in bpy.app.handlers.load_post:
 		bpy.app.handlers.load_post.remove(_on_load_post)
+	if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+		bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+	if bpy.app.timers.is_registered(_deferred_rebuild):
+		bpy.app.timers.unregister(_deferred_rebuild)
 	for cls in reversed(classes):
 		bpy.utils.unregister_class(cls)
 
@@ -1,7 +1,15 @@
 import bpy
-import gpu
 from gpu_extras.batch import batch_for_shader
 import math
+import os
+import re
+import struct
+import threading
+import numpy as np
+
+# Local imports
+from . import audio_waveforms
+from . import timeline_overlays
 
 
 
@@ -58,82 +66,332 @@ _SHAPE_BUILDERS = {
 	"TRIDOWN": _tridown_verts,
 }
 
+# Unit size templates centred on the origin, built once so redraws only offset and scale them
+_SHAPE_TEMPLATES = {name: np.array(build(0.0, 0.0, 1.0), dtype=np.float32) for name, build in _SHAPE_BUILDERS.items()}
+
+def _marker_verts(xs, y, shape, size):
+	"""Stamp a shape template at every x position, returning a flat (n, 2) TRIS vertex array."""
+	template = _SHAPE_TEMPLATES.get(shape, _SHAPE_TEMPLATES["CIRCLE"]) * size
+	offsets = np.zeros((len(xs), 1, 2), dtype=np.float32)
+	offsets[:, 0, 0] = xs
+	offsets[:, 0, 1] = y
+	return (offsets + template[None, :, :]).reshape(-1, 2)
+
 
 
 # ---------------------------------------------------------------------------
-# Draw callback — registered once on SpaceDopeSheetEditor,
-# covers both Dope Sheet and Timeline modes.
+# Tempo map — (frame, bpm, meter) segments compiled into a cached beat grid
 # ---------------------------------------------------------------------------
 
-def draw_bpm_overlay():
-	context = bpy.context
+class TempoSegmentProperty(bpy.types.PropertyGroup):
+	frame: bpy.props.IntProperty(
+		name="Frame",
+		description="Frame where this tempo starts, with a downbeat",
+		default=1,
+		min=-100000,
+		max=100000,
+	)
+	bpm: bpy.props.FloatProperty(
+		name="BPM",
+		description="Beats per minute",
+		default=120.0,
+		min=1.0,
+		max=960.0,
+		precision=1,
+	)
+	meter: bpy.props.IntProperty(
+		name="Meter",
+		description="Number of beats per measure (time-signature numerator)",
+		default=4,
+		min=1,
+		max=64,
+	)
+
+
+
+def get_tempo_segments(scene):
+	"""Sorted (frame, bpm, meter) segments: the tempo map if enabled, otherwise the constant BPM settings."""
+	settings = scene.production_kit_settings
+	if settings.bpm_use_tempo_map and len(scene.bpm_tempo_map):
+		return tuple(sorted((segment.frame, segment.bpm, segment.meter) for segment in scene.bpm_tempo_map))
+	return ((settings.bpm_time_offset, settings.bpm_speed, settings.bpm_measure),)
+
+
+
+def compile_beat_grid(segments, fps, frame_start, frame_end):
+	"""Expand tempo segments into sorted beat frames covering the scene range.
+	Each segment starts on a downbeat and runs until the next one, the first segment
+	is extended backwards and the last one forwards by a beat so lookups at the range
+	edges always have a surrounding beat. Returns (beats, downbeat mask, origin index).
+	"""
+	beats = []
+	downbeats = []
+	origin = 0
+	for index, (frame, bpm, meter) in enumerate(segments):
+		length = 60.0 / bpm * fps
+		if index + 1 < len(segments):
+			end = segments[index + 1][0]
+		else:
+			end = max(frame_end, frame) + length
+		first = 0
+		if index == 0:
+			first = min(0, math.floor((frame_start - frame) / length) - 1)
+			origin = -first
+		counts = np.arange(first, max(math.ceil((end - frame) / length), first), dtype=np.int64)
+		frames = frame + counts * length
+		keep = frames < end
+		beats.append(frames[keep])
+		downbeats.append(counts[keep] % meter == 0)
+	return np.concatenate(beats), np.concatenate(downbeats), origin
+
+
+
+# Compiled grids per scene name: key, beats, downbeat mask, downbeat frames, origin index
+_grid_cache = {}
+
+def get_beat_grid(scene):
+	"""Return the cached beat grid for a scene, recompiling only when the tempo, fps or frame range changed."""
+	fps = scene.render.fps / scene.render.fps_base
+	key = (get_tempo_segments(scene), fps, scene.frame_start, scene.frame_end)
+	grid = _grid_cache.get(scene.name)
+	if grid is None or grid["key"] != key:
+		beats, downbeats, origin = compile_beat_grid(key[0], fps, scene.frame_start, scene.frame_end)
+		grid = _grid_cache[scene.name] = {
+			"key": key,
+			"beats": beats,
+			"downbeats": downbeats,
+			"measures": beats[downbeats],
+			"origin": origin,
+		}
+	return grid
+
+
+
+def _interval_position(frames, frame):
+	"""Fractional index of a frame within a sorted frame array, extrapolating past either end."""
+	if len(frames) < 2:
+		return 0.0
+	index = int(np.searchsorted(frames, frame, side='right')) - 1
+	index = min(max(index, 0), len(frames) - 2)
+	return index + (frame - frames[index]) / (frames[index + 1] - frames[index])
+
+
+
+def beat_at(scene, frame):
+	"""Beat count at a frame, 0 at the first tempo segment, with fractional progress through the beat."""
+	grid = get_beat_grid(scene)
+	return _interval_position(grid["beats"], frame) - grid["origin"]
+
+
+
+def beat_phase(scene, frame, measure=False):
+	"""Progress from 0 to 1 through the current beat, or the current measure."""
+	grid = get_beat_grid(scene)
+	position = _interval_position(grid["measures"] if measure else grid["beats"], frame)
+	return position - math.floor(position)
+
+
+
+# ---------------------------------------------------------------------------
+# Tempo map import — timeline markers, plain text and Standard MIDI Files
+# ---------------------------------------------------------------------------
+
+# "120", "120bpm", "92.5 bpm 3/4"
+_MARKER_TEMPO = re.compile(r"(\d+(?:\.\d+)?)\s*(?:bpm)?(?:\s+(\d+)\s*/\s*\d+)?", re.IGNORECASE)
+
+def tempo_from_markers(scene):
+	"""Segments from timeline markers whose names contain a tempo, optionally followed by a meter."""
+	segments = []
+	for marker in scene.timeline_markers:
+		match = _MARKER_TEMPO.search(marker.name)
+		if match and float(match.group(1)) > 0:
+			segments.append((marker.frame, float(match.group(1)), int(match.group(2) or scene.production_kit_settings.bpm_measure)))
+	return sorted(segments)
+
+
+
+def tempo_from_text(filepath):
+	"""Segments from a text file with one "frame bpm [meter]" entry per line.
+	Values may be separated by spaces or commas, meters may be written as 3/4, and # starts a comment.
+	Returns (segments, list of (line number, message) errors).
+	"""
+	segments = []
+	errors = []
+	with open(filepath, 'r') as file:
+		for number, line in enumerate(file, 1):
+			line = line.split('#', 1)[0].strip()
+			if not line:
+				continue
+			values = line.replace(',', ' ').split()
+			try:
+				frame = int(round(float(values[0])))
+				bpm = float(values[1])
+				meter = int(values[2].split('/')[0]) if len(values) > 2 else 4
+				if bpm <= 0 or meter < 1:
+					raise ValueError("tempo and meter must be positive")
+				segments.append((frame, bpm, meter))
+			except (IndexError, ValueError) as exc:
+				errors.append((number, str(exc) or "expected frame and bpm"))
+	return sorted(segments), errors
+
+
+
+def _read_varlen(data, position):
+	"""Read a MIDI variable length quantity, returning (value, new position)."""
+	value = 0
+	while True:
+		byte = data[position]
+		position += 1
+		value = (value << 7) | (byte & 0x7F)
+		if not byte & 0x80:
+			return value, position
+
+
+
+def tempo_from_midi(filepath, fps, frame_start):
+	"""Segments from the tempo and time signature meta events of a Standard MIDI File."""
+	with open(filepath, 'rb') as file:
+		data = file.read()
+	if data[:4] != b'MThd':
+		raise ValueError("not a Standard MIDI File")
+	header_size = struct.unpack('>I', data[4:8])[0]
+	division = struct.unpack('>h', data[12:14])[0]
+	if division <= 0:
+		raise ValueError("SMPTE time division is not supported")
 	
-	if not context.area or context.area.type != 'DOPESHEET_EDITOR':
-		return
+	# Collect (tick, kind, value) meta events from every track
+	events = []
+	position = 8 + header_size
+	while position + 8 <= len(data):
+		chunk_id = data[position:position + 4]
+		chunk_size = struct.unpack('>I', data[position + 4:position + 8])[0]
+		track = position + 8
+		position = track + chunk_size
+		if chunk_id != b'MTrk':
+			continue
+		tick = 0
+		status = 0
+		cursor = track
+		while cursor < position:
+			delta, cursor = _read_varlen(data, cursor)
+			tick += delta
+			if data[cursor] & 0x80:
+				status = data[cursor]
+				cursor += 1
+			if status == 0xFF:
+				kind = data[cursor]
+				length, cursor = _read_varlen(data, cursor + 1)
+				if kind == 0x51 and length == 3:
+					events.append((tick, 'tempo', int.from_bytes(data[cursor:cursor + 3], 'big')))
+				elif kind == 0x58 and length >= 1:
+					events.append((tick, 'meter', data[cursor]))
+				elif kind == 0x2F:
+					break
+				cursor += length
+			elif status in (0xF0, 0xF7):
+				length, cursor = _read_varlen(data, cursor)
+				cursor += length
+			elif status & 0xF0 in (0xC0, 0xD0):
+				cursor += 1
+			else:
+				cursor += 2
 	
+	# Walk events in order, integrating tempo to convert ticks to seconds
+	events.sort(key=lambda event: event[0])
+	tempo = 500000 # Microseconds per quarter note, MIDI default of 120 BPM
+	meter = 4
+	seconds = 0.0
+	last_tick = 0
+	segments = {}
+	for tick, kind, value in events:
+		seconds += (tick - last_tick) * tempo / division / 1000000.0
+		last_tick = tick
+		if kind == 'tempo':
+			tempo = value
+		else:
+			meter = value
+		frame = int(round(frame_start + seconds * fps))
+		segments[frame] = (frame, 60000000.0 / tempo, meter)
+	if not segments:
+		segments[frame_start] = (frame_start, 120.0, 4)
+	return sorted(segments.values())
+
+
+
+def set_tempo_map(scene, segments):
+	"""Replace the scene tempo map with the given segments and enable it."""
+	scene.bpm_tempo_map.clear()
+	for frame, bpm, meter in segments:
+		segment = scene.bpm_tempo_map.add()
+		segment.frame = frame
+		segment.bpm = min(max(bpm, 1.0), 960.0)
+		segment.meter = min(max(meter, 1), 64)
+	scene.production_kit_settings.bpm_use_tempo_map = True
+
+
+
+# ---------------------------------------------------------------------------
+# Timeline overlay layer — drawn by the shared compositor in both Dope Sheet
+# and Timeline modes, batches are cached per region until the view changes.
+# ---------------------------------------------------------------------------
+
+def prepare_bpm_overlay(context, region, cache):
 	settings = context.scene.production_kit_settings
 	if not settings.bpm_show:
-		return
-	
-	region = context.region
-	if not region or region.type != 'WINDOW':
-		return
+		return None
 	
 	view2d = region.view2d
 	scene = context.scene
-	fps = scene.render.fps / scene.render.fps_base
-	
-	beat_frames = (60.0 / settings.bpm_speed) * fps
-	if beat_frames <= 0:
-		return
+	grid = get_beat_grid(scene)
 	
 	frame_start = scene.frame_start
 	frame_end = scene.frame_end
-	time_offset = settings.bpm_time_offset
-	measure = settings.bpm_measure
-	
-	first_beat = math.ceil( (frame_start - time_offset) / beat_frames)
-	last_beat = math.floor((frame_end   - time_offset) / beat_frames)
 	
-	max_size = max(settings.bpm_beat_size, settings.bpm_measure_size)
 	base_y = 12.0 + settings.bpm_display_offset
 	region_w = region.width
+	view_start = view2d.region_to_view(0, 0)[0]
+	view_end = view2d.region_to_view(region_w, 0)[0]
 	
-	beat_build = _SHAPE_BUILDERS.get(settings.bpm_beat_shape,    _circle_verts)
-	measure_build = _SHAPE_BUILDERS.get(settings.bpm_measure_shape, _circle_verts)
-	
-	beat_verts = []
-	measure_verts = []
+	cache_key = (
+		grid["key"],
+		settings.bpm_beat_shape, settings.bpm_beat_size,
+		settings.bpm_measure_shape, settings.bpm_measure_size,
+		base_y, region_w, view_start, view_end,
+		timeline_overlays.reduced_detail,
+	)
 	
-	for idx in range(first_beat, last_beat + 1):
-		frame = time_offset + idx * beat_frames
-		x, _ = view2d.view_to_region(frame, 0, clip=False)
-		if x < -max_size or x > region_w + max_size:
-			continue
-		if idx % measure == 0:
-			measure_verts.extend(measure_build(x, base_y, settings.bpm_measure_size))
-		else:
-			beat_verts.extend(beat_build(x, base_y, settings.bpm_beat_size))
-			
-	if not beat_verts and not measure_verts:
-		return
-	
-	shader = gpu.shader.from_builtin('UNIFORM_COLOR')
-	gpu.state.blend_set('ALPHA')
-	
-	if beat_verts:
-		batch = batch_for_shader(shader, 'TRIS', {"pos": beat_verts})
-		shader.bind()
-		shader.uniform_float("color", settings.bpm_beat_color)
-		batch.draw(shader)
+	if cache.get("key") != cache_key:
+		shader = timeline_overlays.get_shader('UNIFORM_COLOR')
+		
+		# Screen x is an affine transform of the frame, derived from the visible range once
+		scale = region_w / (view_end - view_start) if view_end != view_start else 0.0
+		max_size = max(settings.bpm_beat_size, settings.bpm_measure_size)
+		pad = max_size / scale if scale > 0.0 else 0.0
 		
-	if measure_verts:
-		batch = batch_for_shader(shader, 'TRIS', {"pos": measure_verts})
-		shader.bind()
-		shader.uniform_float("color", settings.bpm_measure_color)
-		batch.draw(shader)
+		# Only take beats inside both the scene range and the visible window (plus marker overhang)
+		first = np.searchsorted(grid["beats"], max(frame_start, view_start - pad), side='left')
+		last = np.searchsorted(grid["beats"], min(frame_end, view_end + pad), side='right')
 		
-	gpu.state.blend_set('NONE')
+		xs = (grid["beats"][first:last] - view_start) * scale
+		is_measure = grid["downbeats"][first:last]
+		beat_xs = xs[~is_measure]
+		measure_xs = xs[is_measure]
+		
+		cache["key"] = cache_key
+		cache["beat"] = None
+		cache["measure"] = None
+		# Over the draw budget only measures are drawn
+		if len(beat_xs) and not timeline_overlays.reduced_detail:
+			cache["beat"] = batch_for_shader(shader, 'TRIS', {"pos": _marker_verts(beat_xs, base_y, settings.bpm_beat_shape, settings.bpm_beat_size)})
+		if len(measure_xs):
+			cache["measure"] = batch_for_shader(shader, 'TRIS', {"pos": _marker_verts(measure_xs, base_y, settings.bpm_measure_shape, settings.bpm_measure_size)})
+	
+	commands = []
+	if cache["beat"] is not None:
+		commands.append(('UNIFORM_COLOR', cache["beat"], {"color": settings.bpm_beat_color}))
+	if cache["measure"] is not None:
+		commands.append(('UNIFORM_COLOR', cache["measure"], {"color": settings.bpm_measure_color}))
+	return commands
 
 
 
@@ -146,12 +404,27 @@ def _draw_bpm_ui(layout, context):
 	settings = context.scene.production_kit_settings
 	
 	row = layout.row(align=True)
-	row.prop(settings, "bpm_speed")
-	row.prop(settings, "bpm_measure")
-	
-	row = layout.row(align=True)
-	row.prop(settings, "bpm_time_offset")
+	row.prop(settings, "bpm_use_tempo_map", text="Tempo Map", toggle=True)
 	row.prop(settings, "bpm_display_offset")
+	row.operator(BPM_OT_detect_tempo.bl_idname, text="", icon="SOUND").target = 'TEMPO_MAP' if settings.bpm_use_tempo_map else 'SETTINGS'
+	
+	if settings.bpm_use_tempo_map:
+		row = layout.row()
+		row.template_list("BPM_UL_tempo_map", "", context.scene, "bpm_tempo_map", settings, "bpm_tempo_map_index", rows=3)
+		col = row.column(align=True)
+		col.operator(BPM_OT_tempo_add.bl_idname, text="", icon="ADD")
+		col.operator(BPM_OT_tempo_remove.bl_idname, text="", icon="REMOVE")
+		col.separator()
+		col.operator(BPM_OT_tempo_from_markers.bl_idname, text="", icon="MARKER_HLT")
+		col.operator(BPM_OT_tempo_import.bl_idname, text="", icon="IMPORT")
+	else:
+		row = layout.row(align=True)
+		row.prop(settings, "bpm_speed")
+		row.prop(settings, "bpm_measure")
+		row.prop(settings, "bpm_time_offset")
+	
+	if getattr(context, 'selected_editable_fcurves', None) is not None:
+		layout.operator("graph.beat_keyframes", icon="KEYFRAME_HLT")
 	
 	row = layout.row(align=True)
 	row.label(text="Beat")
@@ -167,6 +440,241 @@ def _draw_bpm_ui(layout, context):
 
 
 
+# ---------------------------------------------------------------------------
+# Tempo map list and operators
+# ---------------------------------------------------------------------------
+
+class BPM_UL_tempo_map(bpy.types.UIList):
+	def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+		row = layout.row(align=True)
+		row.prop(item, "frame", text="", emboss=False)
+		row.prop(item, "bpm", text="", emboss=False)
+		row.prop(item, "meter", text="", emboss=False)
+
+
+
+class BPM_OT_tempo_add(bpy.types.Operator):
+	"""Add a tempo segment at the current frame, continuing the tempo already playing there"""
+	bl_idname = "timeline.bpm_tempo_add"
+	bl_label = "Add Tempo Segment"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	def execute(self, context):
+		scene = context.scene
+		frame, bpm, meter = get_tempo_segments(scene)[0]
+		for segment in get_tempo_segments(scene):
+			if segment[0] <= scene.frame_current:
+				frame, bpm, meter = segment
+		segment = scene.bpm_tempo_map.add()
+		segment.frame = scene.frame_current
+		segment.bpm = bpm
+		segment.meter = meter
+		scene.production_kit_settings.bpm_tempo_map_index = len(scene.bpm_tempo_map) - 1
+		return {'FINISHED'}
+
+
+
+class BPM_OT_tempo_remove(bpy.types.Operator):
+	"""Remove the selected tempo segment"""
+	bl_idname = "timeline.bpm_tempo_remove"
+	bl_label = "Remove Tempo Segment"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	@classmethod
+	def poll(cls, context):
+		return len(context.scene.bpm_tempo_map) > 0
+	
+	def execute(self, context):
+		settings = context.scene.production_kit_settings
+		context.scene.bpm_tempo_map.remove(settings.bpm_tempo_map_index)
+		settings.bpm_tempo_map_index = max(0, min(settings.bpm_tempo_map_index, len(context.scene.bpm_tempo_map) - 1))
+		return {'FINISHED'}
+
+
+
+class BPM_OT_tempo_from_markers(bpy.types.Operator):
+	"""Replace the tempo map with segments from timeline markers named with a tempo, such as 120 or 92.5 bpm 3/4"""
+	bl_idname = "timeline.bpm_tempo_from_markers"
+	bl_label = "Tempo Map from Markers"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	def execute(self, context):
+		segments = tempo_from_markers(context.scene)
+		if not segments:
+			self.report({'WARNING'}, "No markers with a tempo in their name")
+			return {'CANCELLED'}
+		set_tempo_map(context.scene, segments)
+		self.report({'INFO'}, f"Imported {len(segments)} tempo segments")
+		return {'FINISHED'}
+
+
+
+class BPM_OT_tempo_import(bpy.types.Operator):
+	"""Replace the tempo map with segments from a text file (frame bpm meter per line) or a MIDI file"""
+	bl_idname = "timeline.bpm_tempo_import"
+	bl_label = "Import Tempo Map"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	filepath: bpy.props.StringProperty(subtype="FILE_PATH")
+	filter_glob: bpy.props.StringProperty(default="*.txt;*.csv;*.mid;*.midi", options={'HIDDEN'})
+	
+	def invoke(self, context, event):
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def execute(self, context):
+		scene = context.scene
+		filepath = bpy.path.abspath(self.filepath)
+		try:
+			if filepath.lower().endswith(('.mid', '.midi')):
+				segments = tempo_from_midi(filepath, scene.render.fps / scene.render.fps_base, scene.frame_start)
+				errors = []
+			else:
+				segments, errors = tempo_from_text(filepath)
+		except (OSError, ValueError, IndexError, struct.error) as exc:
+			self.report({'ERROR'}, f"Could not read tempo map: {exc}")
+			return {'CANCELLED'}
+		for number, message in errors:
+			print(f"Tempo map line {number}: {message}")
+		if not segments:
+			self.report({'WARNING'}, "No tempo segments found")
+			return {'CANCELLED'}
+		set_tempo_map(scene, segments)
+		self.report({'WARNING'} if errors else {'INFO'}, f"Imported {len(segments)} tempo segments" + (f", skipped {len(errors)} invalid lines" if errors else ""))
+		return {'FINISHED'}
+
+
+
+# ---------------------------------------------------------------------------
+# Beat detection — analyses sequencer audio in a background thread
+# ---------------------------------------------------------------------------
+
+class BPM_OT_detect_tempo(bpy.types.Operator):
+	"""Detect tempo and beat offset from the selected sound strips (or all of them), filling in the BPM settings or the tempo map.
+	Results are cached per audio file, so files are only analysed once"""
+	bl_idname = "timeline.bpm_detect_tempo"
+	bl_label = "Detect Tempo"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	target: bpy.props.EnumProperty(
+		name="Target",
+		items=[
+			('SETTINGS', 'BPM Settings', 'Set a constant BPM and beat offset'),
+			('TEMPO_MAP', 'Tempo Map', 'Replace the tempo map with the detected tempo changes'),
+			],
+		default='SETTINGS')
+	min_bpm: bpy.props.FloatProperty(name="Min BPM", default=60.0, min=20.0, max=480.0)
+	max_bpm: bpy.props.FloatProperty(name="Max BPM", default=200.0, min=30.0, max=960.0)
+	
+	_timer = None
+	_thread = None
+	
+	@classmethod
+	def poll(cls, context):
+		return bool(audio_waveforms.get_audio_clips(audio_waveforms.display_scene(context)))
+	
+	def execute(self, context):
+		# Tempo is written to the scene whose strips are analysed, so frames line up with its timeline
+		scene = audio_waveforms.display_scene(context)
+		clips = audio_waveforms.get_audio_clips(scene)
+		selected = {key: instance for key, instance in clips.items() if instance[0].select}
+		self._scene_name = scene.name
+		# Strips may be deleted or moved while the thread runs, so only their keys and files are kept
+		# and the strips are looked up again when the results are applied
+		self._sources = {key: audio_waveforms._clip_source(instance[0]) for key, instance in (selected or clips).items()}
+		
+		# Each file is analysed once even when several strips use it
+		paths = []
+		for path in self._sources.values():
+			if path not in paths and os.path.isfile(path):
+				paths.append(path)
+		if not paths:
+			self.report({'WARNING'}, "No audio files found")
+			return {'CANCELLED'}
+		
+		self._results = {}
+		self._progress = [0, len(paths)]
+		self._cancel = threading.Event()
+		ffmpeg = context.preferences.addons[__package__].preferences.ffmpeg_location
+		self._thread = threading.Thread(target=self._analyse, args=(paths, ffmpeg, self.min_bpm, self.max_bpm), daemon=True)
+		self._thread.start()
+		
+		context.window_manager.progress_begin(0, len(paths))
+		self._timer = context.window_manager.event_timer_add(0.1, window=context.window)
+		context.window_manager.modal_handler_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def _analyse(self, paths, ffmpeg, min_bpm, max_bpm):
+		# Runs in the background thread, so it only touches plain Python values
+		for path in paths:
+			if self._cancel.is_set():
+				return
+			try:
+				self._results[path] = audio_waveforms.analyse_tempo(path, ffmpeg, min_bpm, max_bpm)
+			except (OSError, ValueError) as exc:
+				print(f"Failed to detect tempo for {path}: {exc}")
+			self._progress[0] += 1
+	
+	def modal(self, context, event):
+		if event.type == 'ESC':
+			self._cancel.set()
+			self._finish(context)
+			self.report({'INFO'}, "Tempo detection cancelled")
+			return {'CANCELLED'}
+		if event.type != 'TIMER':
+			return {'PASS_THROUGH'}
+		
+		context.window_manager.progress_update(self._progress[0])
+		context.workspace.status_text_set(f"Detecting tempo: {self._progress[0]} / {self._progress[1]} files (Esc to cancel)")
+		if self._thread.is_alive():
+			return {'RUNNING_MODAL'}
+		
+		self._finish(context)
+		return self._apply(context)
+	
+	def _finish(self, context):
+		context.window_manager.event_timer_remove(self._timer)
+		context.window_manager.progress_end()
+		context.workspace.status_text_set(None)
+	
+	def _apply(self, context):
+		scene = bpy.data.scenes.get(self._scene_name)
+		if scene is None:
+			self.report({'WARNING'}, "Scene was removed during tempo detection")
+			return {'CANCELLED'}
+		fps = scene.render.fps / scene.render.fps_base
+		clips = audio_waveforms.get_audio_clips(scene)
+		
+		# Use the most confident result, mapping file time to timeline frames through its strip
+		best = None
+		for key, path in self._sources.items():
+			instance = clips.get(key)
+			# Skip strips removed or given another sound during the analysis
+			if instance is None or audio_waveforms._clip_source(instance[0]) != path:
+				continue
+			clip, offset = instance[0], instance[1]
+			tempo = self._results.get(path)
+			if tempo and (best is None or tempo["confidence"] > best[0]["confidence"]):
+				origin = clip.frame_final_start + offset - audio_waveforms._clip_window(clip)[0] * fps
+				best = (tempo, origin)
+		if best is None:
+			self.report({'WARNING'}, "No steady beat detected")
+			return {'CANCELLED'}
+		
+		tempo, origin = best
+		settings = scene.production_kit_settings
+		if self.target == 'TEMPO_MAP' and tempo["segments"]:
+			set_tempo_map(scene, [(int(round(origin + start * fps)), bpm, settings.bpm_measure) for start, bpm in tempo["segments"]])
+			self.report({'INFO'}, f"Detected {len(tempo['segments'])} tempo segments")
+		else:
+			settings.bpm_speed = round(tempo["bpm"], 1)
+			settings.bpm_time_offset = int(round(origin + tempo["phase"] * fps))
+			settings.bpm_use_tempo_map = False
+			self.report({'INFO'}, f"Detected {tempo['bpm']:.1f} BPM ({tempo['confidence']:.0%} confidence)")
+		return {'FINISHED'}
+
+
+
 # ---------------------------------------------------------------------------
 # UI Panel for the Dopesheet view
 # ---------------------------------------------------------------------------
@@ -193,26 +701,28 @@ class BPM_PT_panel(bpy.types.Panel):
 # ---------------------------------------------------------------------------
 
 _CLASSES = [
+	TempoSegmentProperty,
+	BPM_UL_tempo_map,
+	BPM_OT_tempo_add,
+	BPM_OT_tempo_remove,
+	BPM_OT_tempo_from_markers,
+	BPM_OT_tempo_import,
+	BPM_OT_detect_tempo,
 	BPM_PT_panel,
 ]
 
-_draw_handle = None
-
 def register():
-	global _draw_handle
 	for cls in _CLASSES:
 		bpy.utils.register_class(cls)
+	bpy.types.Scene.bpm_tempo_map = bpy.props.CollectionProperty(type=TempoSegmentProperty)
 	
-	_draw_handle = bpy.types.SpaceDopeSheetEditor.draw_handler_add(
-		draw_bpm_overlay, (), 'WINDOW', 'POST_PIXEL'
-	)
+	timeline_overlays.register_layer("bpm", prepare_bpm_overlay, order=10)
 
 def unregister():
-	global _draw_handle
-	if _draw_handle is not None:
-		bpy.types.SpaceDopeSheetEditor.draw_handler_remove(_draw_handle, 'WINDOW')
-		_draw_handle = None
+	timeline_overlays.unregister_layer("bpm")
+	_grid_cache.clear()
 	
+	del bpy.types.Scene.bpm_tempo_map
 	for cls in reversed(_CLASSES):
 		bpy.utils.unregister_class(cls)
 
@@ -1,5 +1,9 @@
 import bpy
 import os
+import hashlib
+import tempfile
+
+from . import palette_files
 
 #prefs = bpy.context.preferences.addons[__package__].preferences
 #settings = bpy.context.scene.render_kit_settings
@@ -76,7 +80,8 @@ class EditPaletteOperator(bpy.types.Operator):
 	bl_label = "Edit"
 	
 	def execute(self, context):
-		load_palette_from_file(context.preferences.addons[__package__].preferences.palette_file_location)
+		errors = load_palette_from_file(palette_file_path(context))
+		report_palette_errors(self, errors)
 		bpy.context.scene.production_kit_settings.palette_edit = True
 		return {'FINISHED'}
 
@@ -86,7 +91,10 @@ class SavePaletteOperator(bpy.types.Operator):
 	bl_label = "Save"
 	
 	def execute(self, context):
-		save_palette_to_file(context.preferences.addons[__package__].preferences.palette_file_location)
+		error = save_palette_to_file(palette_file_path(context))
+		if error:
+			self.report({'ERROR'}, f"Palette not saved: {error}")
+			return {'CANCELLED'}
 		bpy.context.scene.production_kit_settings.palette_edit = False
 		return {'FINISHED'}
 
@@ -96,42 +104,234 @@ class LoadPaletteOperator(bpy.types.Operator):
 	bl_label = "Load Palette"
 	
 	def execute(self, context):
-		load_palette_from_file(context.preferences.addons[__package__].preferences.palette_file_location)
+		errors = load_palette_from_file(palette_file_path(context))
+		report_palette_errors(self, errors)
 		bpy.context.scene.production_kit_settings.palette_edit = False
 		return {'FINISHED'}
 
+###########################################################################
+# Palette library operators
+
+class SelectLibraryPaletteOperator(bpy.types.Operator):
+	bl_idname = "ed.palette_library_select"
+	bl_label = "Select Palette"
+	bl_description = "Show a palette from the shared library, or the project palette when no file is given"
+	
+	palette_file: bpy.props.StringProperty()
+	
+	def execute(self, context):
+		settings = context.scene.production_kit_settings
+		if settings.palette_edit:
+			# Switching would replace the swatches being edited
+			self.report({'WARNING'}, "Save or cancel the palette edits before switching palettes")
+			return {'CANCELLED'}
+		if self.palette_file:
+			# Swatches come from the library index, the file isn't read again
+			record = get_library(context).get(self.palette_file)
+			if record is None:
+				self.report({'ERROR'}, f"{self.palette_file} is no longer in the palette library")
+				return {'CANCELLED'}
+			apply_palette_entries(context.scene.palette_local, record["entries"])
+			_loaded_signatures[palette_file_path(context, self.palette_file)] = (record["mtime"], record["size"])
+		settings.palette_library_active = self.palette_file
+		if not self.palette_file:
+			filepath = palette_file_path(context)
+			if os.path.isfile(filepath):
+				report_palette_errors(self, load_palette_from_file(filepath))
+			else:
+				context.scene.palette_local.clear()
+		return {'FINISHED'}
+
+class RefreshLibraryOperator(bpy.types.Operator):
+	bl_idname = "ed.palette_library_refresh"
+	bl_label = "Rebuild Library Index"
+	bl_description = "Read every palette file in the library folder again"
+	
+	def execute(self, context):
+		palette_files._palette_cache.clear()
+		folder = library_folder(context)
+		if not folder or not os.path.isdir(folder):
+			self.report({'ERROR'}, "Palette library folder not found")
+			return {'CANCELLED'}
+		open_library(folder, use_saved=False)
+		self.report({'INFO'}, f"Indexed {len(_library['manifest'])} palettes")
+		return {'FINISHED'}
+
 ###########################################################################
 # Palette open/save functions
 
+def palette_file_path(context=None, library_file=None):
+	"""File of the palette shown in the scene, from the library if one is selected, otherwise the project palette."""
+	context = context or bpy.context
+	prefs = context.preferences.addons[__package__].preferences
+	if library_file is None:
+		library_file = context.scene.production_kit_settings.palette_library_active
+	folder = library_folder(context)
+	if library_file and folder:
+		return os.path.join(folder, library_file)
+	return bpy.path.abspath(os.path.join(prefs.palette_file_location, prefs.palette_file_name))
+
+def apply_palette_entries(collection, entries):
+	"""Update a palette collection in place to match (name, color) entries.
+	Only swatches that differ are written, extra swatches are added or removed at the end.
+	"""
+	for index, (name, color) in enumerate(entries):
+		if index < len(collection):
+			item = collection[index]
+		else:
+			item = collection.add()
+		if item.name != name:
+			item.name = name
+		if any(abs(a - b) > 1e-6 for a, b in zip(item.color, color)):
+			item.color = color
+	for index in range(len(collection) - 1, len(entries) - 1, -1):
+		collection.remove(index)
+
 def save_palette_to_file(filepath):
+	"""Save the scene palette, returns an error message or None."""
 	try:
-		filepath = os.path.join(filepath, bpy.context.preferences.addons[__package__].preferences.palette_file_name)
-		filepath = bpy.path.abspath(filepath)
-			
-		with open(filepath, 'w') as file:
-			for palette in bpy.context.scene.palette_local:
-				color = ",".join([str(value) for value in palette.color])
-				file.write(f"{palette.name}={color}\n")
+		entries = [(palette.name, tuple(palette.color)) for palette in bpy.context.scene.palette_local]
+		palette_files.write_palette(filepath, entries)
+		_loaded_signatures[filepath] = palette_files.file_signature(filepath)
 	except Exception as exc:
 		print(str(exc) + " | Error in Production Kit save palette file function")
+		return str(exc)
+	return None
 
 def load_palette_from_file(filepath):
+	"""Load the palette file into the scene, returns a list of (line number, message) errors."""
+	try:
+		signature = palette_files.file_signature(filepath)
+		palette = palette_files.read_palette(filepath)
+		apply_palette_entries(bpy.context.scene.palette_local, palette.entries)
+		_loaded_signatures[filepath] = signature
+	except Exception as exc:
+		print(str(exc) + " | Error in Production Kit load palette file function")
+		return [(0, str(exc))]
+	for number, message in palette.errors:
+		print(f"{filepath} line {number}: {message} | Production Kit palette file")
+	return palette.errors
+
+def report_palette_errors(operator, errors):
+	"""Show the first palette file problems in the status bar, the full list is printed to the console."""
+	if not errors:
+		return
+	lines = [f"line {number}: {message}" if number else message for number, message in errors[:3]]
+	if len(errors) > 3:
+		lines.append(f"{len(errors) - 3} more in the console")
+	operator.report({'WARNING'}, "Palette file " + ", ".join(lines))
+
+
+
+###########################################################################
+# Palette library index and file watching
+
+LIBRARY_POLL_INTERVAL = 2.0
+LIBRARY_RESULTS_LIMIT = 24
+
+# Library folder index, kept in memory and saved between sessions
+_library = {"folder": None, "manifest": {}, "search": None}
+
+# Signature of each palette file when it was last loaded into the scene: path → (mtime, size)
+_loaded_signatures = {}
+
+def library_folder(context=None):
+	prefs = (context or bpy.context).preferences.addons[__package__].preferences
+	return bpy.path.abspath(prefs.palette_library_location) if prefs.palette_library_location else ""
+
+def _manifest_cache_path(folder):
+	"""Saved manifest location for a library folder, in the extension's user folder when available."""
 	try:
-		filepath = os.path.join(filepath, bpy.context.preferences.addons[__package__].preferences.palette_file_name)
-		filepath = bpy.path.abspath(filepath)
+		cache_folder = bpy.utils.extension_path_user(__package__, path="palette_library", create=True)
+	except (ValueError, AttributeError):
+		cache_folder = os.path.join(tempfile.gettempdir(), "production_kit_palette_library")
+		os.makedirs(cache_folder, exist_ok=True)
+	return os.path.join(cache_folder, hashlib.sha1(os.path.normcase(folder).encode('utf-8')).hexdigest()[:16] + ".json")
+
+def get_library(context=None):
+	"""Library manifest for the preference folder, empty until the file watcher or the refresh operator has indexed it.
+	Never touches the disk, so it's safe to call from panel drawing.
+	"""
+	folder = library_folder(context)
+	if not folder or _library["folder"] != folder:
+		return {}
+	return _library["manifest"]
+
+def library_ready(context=None):
+	folder = library_folder(context)
+	return bool(folder) and _library["folder"] == folder
+
+def open_library(folder, use_saved=True):
+	"""Switch the index to a library folder, starting from its saved manifest and indexing files that changed since."""
+	_library["folder"] = folder
+	_library["manifest"] = palette_files.load_manifest(_manifest_cache_path(folder), folder) if use_saved else {}
+	_library["search"] = None
+	refresh_library()
+
+def refresh_library():
+	"""Index palette files that changed in the library folder, returns their file names."""
+	folder = _library["folder"]
+	if not folder:
+		return set()
+	changed = palette_files.index_library(folder, _library["manifest"])
+	if changed:
+		_library["search"] = None
+		try:
+			palette_files.save_manifest(_manifest_cache_path(folder), folder, _library["manifest"])
+		except OSError as exc:
+			print(str(exc) + " | Error in Production Kit palette library index")
+	return changed
+
+def search_library(context, query):
+	"""Matching library file names, cached until the query or the library changes."""
+	manifest = get_library(context)
+	if _library["search"] is None or _library["search"][0] != query:
+		_library["search"] = (query, palette_files.search_library(manifest, query))
+	return _library["search"][1]
+
+def _poll_palettes():
+	"""Timer checking palette files for changes made outside this session, such as by other artists.
+	Only file modification times are read, changed files are parsed and shown unless the palette is being edited.
+	"""
+	try:
+		context = bpy.context
+		changed = set()
+		folder = library_folder(context)
+		if not folder:
+			if _library["folder"]:
+				_library.update(folder=None, manifest={}, search=None)
+				changed = {None}
+		elif _library["folder"] != folder:
+			# Library folder set or changed, the first index is built here rather than while drawing
+			open_library(folder)
+			changed = set(_library["manifest"]) | {None}
+		else:
+			changed = refresh_library()
 		
-		bpy.context.scene.palette_local.clear()
+		updated = False
+		scene = context.scene
+		if scene and len(scene.palette_local) and not scene.production_kit_settings.palette_edit:
+			active = scene.production_kit_settings.palette_library_active
+			filepath = palette_file_path(context)
+			if active and active in changed and active in _library["manifest"]:
+				record = _library["manifest"][active]
+				apply_palette_entries(scene.palette_local, record["entries"])
+				_loaded_signatures[filepath] = (record["mtime"], record["size"])
+				updated = True
+			elif not active and filepath in _loaded_signatures:
+				signature = palette_files.file_signature(filepath)
+				if signature and signature != _loaded_signatures[filepath]:
+					load_palette_from_file(filepath)
+					updated = True
 		
-		with open(filepath, 'r') as file:
-			lines = file.readlines()
-			for line in lines:
-				name, color_str = line.strip().split('=')
-				color_values = [float(value) for value in color_str.split(',')]
-				palette = bpy.context.scene.palette_local.add()
-				palette.name = name
-				palette.color = color_values
+		if changed or updated:
+			for window in context.window_manager.windows:
+				for area in window.screen.areas:
+					if area.type == 'VIEW_3D':
+						area.tag_redraw()
 	except Exception as exc:
-		print(str(exc) + " | Error in Production Kit load palette file function")
+		print(str(exc) + " | Error in Production Kit palette file watcher")
+	return LIBRARY_POLL_INTERVAL
 
 
 
@@ -162,8 +362,31 @@ class PRODUCTIONKIT_PT_colorPalette(bpy.types.Panel):
 			layout = self.layout
 			layout.use_property_decorate = False # No animation
 			
+			settings = context.scene.production_kit_settings
+			
+			# Shared palette library
+			if library_folder(context):
+				manifest = get_library(context)
+				box = layout.box()
+				if not library_ready(context):
+					box.label(text="Indexing palette library...", icon='TIME')
+				row = box.row(align=True)
+				row.prop(settings, "palette_library_search", text='', icon='VIEWZOOM')
+				row.operator("ed.palette_library_refresh", text='', icon='FILE_REFRESH')
+				col = box.column(align=True)
+				# Switching palettes would discard unsaved edits
+				col.enabled = not settings.palette_edit
+				col.operator("ed.palette_library_select", text="Project Palette", icon='FILE_BLEND', depress=not settings.palette_library_active).palette_file = ''
+				results = search_library(context, settings.palette_library_search)
+				for file_name in results[:LIBRARY_RESULTS_LIMIT]:
+					record = manifest[file_name]
+					label = f"{os.path.splitext(file_name)[0]} ({len(record['entries'])})"
+					col.operator("ed.palette_library_select", text=label, icon='ERROR' if record["errors"] else 'COLOR', depress=file_name == settings.palette_library_active).palette_file = file_name
+				if len(results) > LIBRARY_RESULTS_LIMIT:
+					box.label(text=f"{len(results) - LIBRARY_RESULTS_LIMIT} more, refine the search")
+			
 			# If project file isn't saved yet
-			if not bpy.data.filepath:
+			if not bpy.data.filepath and not settings.palette_library_active:
 				box = layout.box()
 				col = box.column(align=True)
 				col.label(text='Project must be saved first')
@@ -172,15 +395,13 @@ class PRODUCTIONKIT_PT_colorPalette(bpy.types.Panel):
 				# If no local palette entries exist yet
 				if len(context.scene.palette_local) < 1:
 					# Check for local file
-					filepath = os.path.join(context.preferences.addons[__package__].preferences.palette_file_location, context.preferences.addons[__package__].preferences.palette_file_name)
-					filepath = bpy.path.abspath(filepath)
-					if os.path.isfile(filepath):
+					if os.path.isfile(palette_file_path(context)):
 						layout.operator("ed.palette_load", text="Load Palette", icon='FILE') # FILE FILE_BLANK FILE_CACHE FILE_REFRESH
 					else:
 						layout.operator("ed.palette_add_color", text='Create Palette', icon='ADD')
 				else:
 					# If in edit mode
-					if bpy.context.scene.production_kit_settings.palette_edit:
+					if settings.palette_edit:
 						edit_grid = layout.grid_flow(row_major=False, columns=0, even_columns=True, even_rows=True, align=False)
 						for index, color in enumerate(context.scene.palette_local):
 							row = edit_grid.row(align=False)
@@ -226,6 +447,8 @@ classes = [
 	EditPaletteOperator,
 	SavePaletteOperator,
 	LoadPaletteOperator,
+	SelectLibraryPaletteOperator,
+	RefreshLibraryOperator,
 	PRODUCTIONKIT_PT_colorPalette,
 ]
 
@@ -233,9 +456,15 @@ def register():
 	for cls in classes:
 		bpy.utils.register_class(cls)
 	bpy.types.Scene.palette_local = bpy.props.CollectionProperty(type=ColorPaletteProperty)
+	if not bpy.app.timers.is_registered(_poll_palettes):
+		bpy.app.timers.register(_poll_palettes, first_interval=LIBRARY_POLL_INTERVAL, persistent=True)
 
 
 def unregister():
+	if bpy.app.timers.is_registered(_poll_palettes):
+		bpy.app.timers.unregister(_poll_palettes)
+	_library.update(folder=None, manifest={}, search=None)
+	_loaded_signatures.clear()
 	del bpy.types.Scene.palette_local
 	for cls in reversed(classes):
 		bpy.utils.unregister_class(cls)
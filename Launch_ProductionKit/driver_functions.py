@@ -3,6 +3,10 @@ import math
 from bpy.app.handlers import persistent
 from colorsys import hsv_to_rgb
 from mathutils import noise
+import numpy as np
+
+# Local imports
+from . import bpm_overlay
 
 ########## Easing Functions (adapted from the work of Robert Penner and https://easings.net/)
 
@@ -307,6 +311,22 @@ def get_ease(time, ease_type, direction):
 
 ########## Driver Functions
 
+#	beatAt(frame)
+#	beatAt(frame-10)
+#	Returns the beat count at the frame from the BPM overlay tempo (or tempo map), fractional between beats
+def beat_at(frame):
+	return bpm_overlay.beat_at(bpy.context.scene, frame)
+
+
+
+#	beatPhase(frame, optional: measure)
+#	beatPhase(frame, True)
+#	Returns 0-1 progress through the current beat, or through the current measure
+def beat_phase(frame, measure=False):
+	return bpm_overlay.beat_phase(bpy.context.scene, frame, measure)
+
+
+
 #	curveAtTime(item name, animation curve index, sample time in frames)
 #	curveAtTime("Cube", 0, frame-5)
 #	returns the "Cube" object's first animation curve value 5 frames in the past
@@ -529,6 +549,99 @@ class CopyDriverToClipboard(bpy.types.Operator):
 
 
 
+class GRAPH_OT_beat_keyframes(bpy.types.Operator):
+	"""Bake a pulse on every beat or measure of the BPM overlay into the selected F-curves, eased with the Driver Functions easing settings.
+	Static keyframes replace per-frame driver evaluation"""
+	bl_idname = "graph.beat_keyframes"
+	bl_label = "Beat Keyframes"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	pattern: bpy.props.EnumProperty(
+		name="Pattern",
+		items=[
+			('BEAT', 'Every Beat', 'Pulse on every beat'),
+			('MEASURE', 'Every Measure', 'Pulse on the first beat of every measure'),
+			],
+		default='BEAT')
+	rest: bpy.props.FloatProperty(name="Rest", description="Value between pulses", default=0.0)
+	peak: bpy.props.FloatProperty(name="Peak", description="Value on the beat", default=1.0)
+	attack: bpy.props.FloatProperty(name="Attack", description="Frames to rise from rest to peak before each beat", default=1.0, min=0.0, max=100.0)
+	decay: bpy.props.FloatProperty(name="Decay", description="Fraction of the interval to ease from peak back to rest", default=0.5, min=0.01, max=0.9, subtype='FACTOR')
+	samples: bpy.props.IntProperty(name="Samples", description="Keyframes per decay, more follow the easing curve more closely", default=4, min=1, max=32)
+	replace: bpy.props.BoolProperty(name="Replace", description="Remove existing keyframes from the F-curves first", default=True)
+	
+	@classmethod
+	def poll(cls, context):
+		return bool(getattr(context, 'selected_editable_fcurves', None))
+	
+	def execute(self, context):
+		scene = context.scene
+		settings = scene.production_kit_settings
+		grid = bpm_overlay.get_beat_grid(scene)
+		pulses = grid["measures"] if self.pattern == 'MEASURE' else grid["beats"]
+		if len(pulses) < 2:
+			self.report({'WARNING'}, "Not enough beats in the scene range")
+			return {'CANCELLED'}
+		
+		# Every pulse shares the same eased profile, scaled to the interval that follows it
+		intervals = np.diff(pulses)
+		intervals = np.append(intervals, intervals[-1])
+		keep = (pulses >= scene.frame_start) & (pulses <= scene.frame_end)
+		pulses = pulses[keep]
+		intervals = intervals[keep]
+		if len(pulses) == 0:
+			self.report({'WARNING'}, "No beats in the scene range")
+			return {'CANCELLED'}
+		times = np.linspace(0.0, 1.0, self.samples + 1)
+		profile = np.array([get_ease(t, settings.driver_ease_type, settings.driver_ease_direction) for t in times])
+		
+		# Per pulse: rest before the attack, then the peak eased back down to rest
+		attack = np.minimum(self.attack, intervals * (1.0 - self.decay) * 0.5)
+		frames = np.column_stack((pulses - attack, pulses[:, None] + times[None, :] * (intervals * self.decay)[:, None]))
+		values = np.tile(np.concatenate(([self.rest], self.peak + (self.rest - self.peak) * profile)), (len(pulses), 1))
+		if self.attack <= 0.0:
+			frames = frames[:, 1:]
+			values = values[:, 1:]
+		coordinates = np.column_stack((frames.ravel(), values.ravel())).astype(np.float32).ravel()
+		count = len(coordinates) // 2
+		# Frames compared in thousandths, so float rounding doesn't keep a key next to its replacement
+		new_frames = np.round(coordinates[0::2], 3)
+		
+		linear = bpy.types.Keyframe.bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+		replaced = 0
+		for fcurve in context.selected_editable_fcurves:
+			points = fcurve.keyframe_points
+			if self.replace:
+				points.clear()
+			elif len(points):
+				# Existing keys on a frame that gets a new key are replaced instead of stacked under it
+				existing = np.empty(len(points) * 2, dtype=np.float32)
+				points.foreach_get('co', existing)
+				overlap = np.flatnonzero(np.isin(np.round(existing[0::2], 3), new_frames))
+				for index in overlap[::-1]:
+					points.remove(points[int(index)], fast=True)
+				replaced += len(overlap)
+			start = len(points)
+			points.add(count)
+			if start:
+				# Keep the existing keys by writing the new ones after them
+				existing = np.empty(start * 2, dtype=np.float32)
+				points.foreach_get('co', existing)
+				points.foreach_set('co', np.concatenate((existing, coordinates)))
+				interpolation = np.empty(start + count, dtype=np.int32)
+				points.foreach_get('interpolation', interpolation)
+				interpolation[start:] = linear
+				points.foreach_set('interpolation', interpolation)
+			else:
+				points.foreach_set('co', coordinates)
+				points.foreach_set('interpolation', np.full(count, linear, dtype=np.int32))
+			fcurve.update()
+		
+		self.report({'INFO'}, f"Added {count} keyframes to {len(context.selected_editable_fcurves)} F-curves" + (f", replacing {replaced} on the same frames" if replaced else ""))
+		return {'FINISHED'}
+
+
+
 class WM_OT_find_replace_marker_expression(bpy.types.Operator):
 	"""Find and replace string in all marker names and driver expressions"""
 	bl_idname = "wm.find_replace_marker_expression"
@@ -646,6 +759,17 @@ class PRODUCTIONKIT_PT_driverFunctions(bpy.types.Panel):
 			# Error tracker
 			error = ''
 			
+			# Beat
+			if settings.driver_select == 'BEAT':
+				col.prop(settings, 'driver_beat_output', text='')
+				
+				if settings.driver_beat_output == 'COUNT':
+					driver = "beatAt(frame)"
+				elif settings.driver_beat_output == 'MEASURE':
+					driver = "beatPhase(frame, True)"
+				else:
+					driver = "beatPhase(frame)"
+			
 			# Curve At Time
 			if settings.driver_select == 'CURVE':
 				if context.active_object:
@@ -915,6 +1039,8 @@ class PRODUCTIONKIT_PT_driverFunctions_find_replace(bpy.types.Panel):
 # Register custom functions in Blender's driver namespace
 def production_kit_driver_functions():
 	dns = bpy.app.driver_namespace
+	dns["beatAt"] = beat_at
+	dns["beatPhase"] = beat_phase
 	dns["curveAtTime"] = curve_at_time
 	dns["ease"] = ease
 	dns["hash"] = hash
@@ -935,6 +1061,7 @@ def load_handler(dummy):
 
 classes = (
 	CopyDriverToClipboard,
+	GRAPH_OT_beat_keyframes,
 	WM_OT_find_replace_marker_expression,
 	PRODUCTIONKIT_PT_driverFunctions,
 	PRODUCTIONKIT_PT_driverFunctions_find_replace)
@@ -0,0 +1,166 @@
+import struct
+
+###########################################################################
+# Image header parsing
+# Reads resolution, channel count and pixel type from the first few bytes of common
+# image formats, so image files can be measured without Blender loading their pixels.
+# Doesn't import bpy and is safe to call from worker threads.
+
+def _png(file, data):
+	if data[:8] != b'\x89PNG\r\n\x1a\n' or data[12:16] != b'IHDR':
+		return None
+	width, height, depth, color = struct.unpack('>IIBB', data[16:26])
+	channels = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}.get(color, 4)
+	# Blender keeps 16 bit PNGs as float buffers
+	return width, height, channels, depth == 16
+
+
+
+def _jpeg(file, data):
+	if data[:2] != b'\xff\xd8':
+		return None
+	file.seek(2)
+	while True:
+		marker = file.read(2)
+		if len(marker) < 2 or marker[0] != 0xFF:
+			return None
+		kind = marker[1]
+		if kind in (0x01, 0xD8) or 0xD0 <= kind <= 0xD7:
+			continue
+		length = struct.unpack('>H', file.read(2))[0]
+		# Start of frame markers, except DHT, JPG and DAC which share the range
+		if 0xC0 <= kind <= 0xCF and kind not in (0xC4, 0xC8, 0xCC):
+			_, height, width, channels = struct.unpack('>BHHB', file.read(6))
+			return width, height, channels, False
+		file.seek(length - 2, 1)
+
+
+
+def _exr(file, data):
+	if data[:4] != b'\x76\x2f\x31\x01':
+		return None
+	file.seek(8)
+	width = height = channels = None
+	while True:
+		name = _read_cstring(file)
+		if not name:
+			break
+		kind = _read_cstring(file)
+		size = struct.unpack('<i', file.read(4))[0]
+		value = file.read(size)
+		if name == b'dataWindow' and kind == b'box2i':
+			x0, y0, x1, y1 = struct.unpack('<iiii', value[:16])
+			width, height = x1 - x0 + 1, y1 - y0 + 1
+		elif name == b'channels' and kind == b'chlist':
+			channels = _exr_channels(value)
+	if width is None:
+		return None
+	return width, height, channels or 4, True
+
+
+
+def _exr_channels(value):
+	"""Number of channels in an EXR channel list: null terminated names each followed by 16 bytes."""
+	count = 0
+	position = 0
+	while position < len(value) and value[position] != 0:
+		position = value.index(b'\x00', position) + 17
+		count += 1
+	return count
+
+
+
+def _read_cstring(file):
+	chars = bytearray()
+	while True:
+		char = file.read(1)
+		if not char or char == b'\x00':
+			return bytes(chars)
+		chars += char
+
+
+
+# TIFF field types read by the header parser: type → (struct code, size in bytes)
+_TIFF_TYPES = {1: ('B', 1), 3: ('H', 2), 4: ('I', 4)}
+
+def _tiff_values(file, order, kind, count, field):
+	"""Values of a TIFF tag, stored inline in the 4 byte field when they fit, otherwise at the offset it holds."""
+	code, size = _TIFF_TYPES[kind]
+	if count * size > 4:
+		file.seek(struct.unpack(order + 'I', field)[0])
+		field = file.read(count * size)
+	return struct.unpack(f"{order}{count}{code}", field[:count * size])
+
+
+
+def _tiff(file, data):
+	if data[:4] not in (b'II*\x00', b'MM\x00*'):
+		return None
+	order = '<' if data[:2] == b'II' else '>'
+	file.seek(struct.unpack(order + 'I', data[4:8])[0])
+	count = struct.unpack(order + 'H', file.read(2))[0]
+	fields = {}
+	for _ in range(count):
+		tag, kind, values, field = struct.unpack(order + 'HHI4s', file.read(12))
+		if tag in (256, 257, 258, 277, 339) and kind in _TIFF_TYPES and values:
+			fields[tag] = (kind, values, field)
+	tags = {}
+	for tag, (kind, values, field) in fields.items():
+		tags[tag] = _tiff_values(file, order, kind, values, field)
+	if 256 not in tags or 257 not in tags:
+		return None
+	channels = tags.get(277, (1,))[0]
+	bits = max(tags.get(258, (8,)))
+	# Blender keeps 16 bit and float TIFFs as float buffers
+	return tags[256][0], tags[257][0], channels, tags.get(339, (1,))[0] == 3 or bits > 8
+
+
+
+def _bmp(file, data):
+	if data[:2] != b'BM':
+		return None
+	width, height = struct.unpack('<ii', data[18:26])
+	bits = struct.unpack('<H', data[28:30])[0]
+	return width, abs(height), 4 if bits == 32 else 3, False
+
+
+
+def _hdr(file, data):
+	if not data.startswith((b'#?RADIANCE', b'#?RGBE')):
+		return None
+	file.seek(0)
+	# The resolution line ends the text header, which is only a few lines long
+	for _, line in zip(range(64), file):
+		parts = line.split()
+		if len(parts) == 4 and parts[0] in (b'-Y', b'+Y') and parts[2] in (b'+X', b'-X'):
+			return int(parts[3]), int(parts[1]), 3, True
+	return None
+
+
+
+def _tga(file, data):
+	# TGA has no magic number, check the image type and pixel depth look sensible
+	if len(data) < 18 or data[2] not in (1, 2, 3, 9, 10, 11) or data[16] not in (8, 16, 24, 32):
+		return None
+	width, height = struct.unpack('<HH', data[12:16])
+	return width, height, data[16] // 8 if data[16] != 16 else 3, False
+
+
+
+_READERS = (_png, _jpeg, _exr, _tiff, _bmp, _hdr)
+
+def read_image_header(path):
+	"""Return (width, height, channels, is float) for an image file, or None if it can't be read."""
+	try:
+		with open(path, 'rb') as file:
+			data = file.read(64)
+			for reader in _READERS:
+				file.seek(0)
+				result = reader(file, data)
+				if result:
+					return result
+			if path.lower().endswith(('.tga', '.tpic')):
+				return _tga(file, data)
+	except (OSError, struct.error, ValueError, IndexError):
+		pass
+	return None
@@ -0,0 +1,65 @@
+import os
+import sys
+import hashlib
+
+###########################################################################
+# Downscaled image proxies
+# This module doesn't import bpy, it's run as a separate Python process for each
+# resize so proxies are generated in parallel without blocking Blender, using the
+# OpenImageIO module bundled with Blender on the CPU
+
+# Proxy scale factors (1/2 and 1/4 resolution)
+PROXY_FACTORS = (2, 4)
+
+
+
+def proxy_path(source, cache_folder, factor):
+	"""Proxy file location for a source image, unique per source path so equal names don't collide."""
+	stem, extension = os.path.splitext(os.path.basename(source))
+	digest = hashlib.sha1(os.path.normcase(os.path.abspath(source)).encode('utf-8')).hexdigest()[:8]
+	return os.path.join(cache_folder, f"{stem}_{digest}_{factor}x{extension}")
+
+
+
+def is_current(source, proxy):
+	"""True if the proxy exists and is newer than its source."""
+	try:
+		return os.stat(proxy).st_mtime >= os.stat(source).st_mtime
+	except OSError:
+		return False
+
+
+
+def resize_image(source, target, factor):
+	"""Write a copy of the source image at 1/factor resolution, keeping its pixel format.
+	The file is written next to the target first and then moved into place, so an interrupted
+	resize never leaves a partial proxy behind.
+	"""
+	import OpenImageIO as oiio
+	
+	image = oiio.ImageBuf(source)
+	if image.has_error:
+		raise RuntimeError(image.geterror())
+	spec = image.spec()
+	roi = oiio.ROI(0, max(1, spec.width // factor), 0, max(1, spec.height // factor), 0, 1, 0, spec.nchannels)
+	resized = oiio.ImageBufAlgo.resize(image, roi=roi)
+	if resized.has_error:
+		raise RuntimeError(resized.geterror())
+	resized.set_write_format(spec.format)
+	
+	os.makedirs(os.path.dirname(target), exist_ok=True)
+	stem, extension = os.path.splitext(target)
+	temporary = f"{stem}.partial{extension}"
+	if not resized.write(temporary):
+		raise RuntimeError(resized.geterror())
+	os.replace(temporary, target)
+
+
+
+if __name__ == "__main__":
+	# Usage: python image_proxies.py source target factor
+	try:
+		resize_image(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+	except Exception as exc:
+		print(f"Failed to resize {sys.argv[1]}: {exc}", file=sys.stderr)
+		sys.exit(1)
@@ -0,0 +1,272 @@
+import os
+import json
+
+###########################################################################
+# Palette file format
+# Plain text, one swatch per line as "name=r,g,b,a" with an optional version header.
+# The name is everything before the last "=", so names may contain "=" themselves,
+# blank lines and "#" comments are ignored, and a malformed line is reported and
+# skipped without losing the lines after it. A name starting with "#" or "\" is
+# written with a "\" in front so it isn't read back as a comment.
+# Doesn't import bpy and is safe to call from worker threads.
+
+PALETTE_HEADER = "# ProductionKit Palette"
+PALETTE_VERSION = 2
+
+
+
+class PaletteFile:
+	"""Parsed palette file.
+	entries: [(name, (r, g, b, a))] in file order
+	errors: [(line number, message)] for lines that couldn't be read
+	lines: [(raw line, entry index or None)] to rewrite the file without losing comments or hand edits
+	"""
+	
+	def __init__(self):
+		self.entries = []
+		self.errors = []
+		self.lines = []
+		self.version = 1
+
+
+
+def parse_palette_line(line):
+	"""(name, color) for a swatch line, None for blank and comment lines, raises ValueError if malformed."""
+	text = line.strip()
+	if not text or text.startswith('#'):
+		return None
+	if text.startswith('\\'):
+		text = text[1:]
+	name, separator, values = text.rpartition('=')
+	if not separator:
+		raise ValueError("expected name=r,g,b,a")
+	try:
+		color = [float(value) for value in values.split(',')]
+	except ValueError:
+		raise ValueError(f"invalid colour values \"{values.strip()}\"")
+	if len(color) == 3:
+		color.append(1.0)
+	if len(color) != 4:
+		raise ValueError(f"expected 3 or 4 colour values, found {len(color)}")
+	return name.strip(), tuple(color)
+
+
+
+def parse_palette(lines):
+	"""Parse palette lines one at a time into a PaletteFile, collecting per line errors."""
+	palette = PaletteFile()
+	for number, line in enumerate(lines, start=1):
+		line = line.rstrip('\r\n')
+		if number == 1 and line.startswith(PALETTE_HEADER):
+			try:
+				palette.version = int(line[len(PALETTE_HEADER):].strip().lstrip('v'))
+			except ValueError:
+				palette.errors.append((number, "unreadable version header"))
+			if palette.version > PALETTE_VERSION:
+				palette.errors.append((number, f"written by a newer version ({palette.version}), some swatches may not load"))
+			palette.lines.append((line, None))
+			continue
+		try:
+			entry = parse_palette_line(line)
+		except ValueError as exc:
+			palette.errors.append((number, str(exc)))
+			entry = None
+		if entry is None:
+			palette.lines.append((line, None))
+		else:
+			palette.lines.append((line, len(palette.entries)))
+			palette.entries.append(entry)
+	return palette
+
+
+
+# Parsed files by path: path → (mtime, size, PaletteFile)
+_palette_cache = {}
+
+def file_signature(path):
+	"""(mtime, size) of a file, or None if it doesn't exist."""
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+	return stat.st_mtime_ns, stat.st_size
+
+
+
+def read_palette(path):
+	"""PaletteFile for a path, only parsed again when the file's modification time or size changes.
+	Raises OSError if the file can't be read.
+	"""
+	signature = file_signature(path)
+	cached = _palette_cache.get(path)
+	if cached and signature and cached[:2] == signature:
+		return cached[2]
+	# utf-8-sig drops the byte order mark some editors add to the first line
+	with open(path, 'r', encoding='utf-8-sig', errors='replace') as file:
+		palette = parse_palette(file)
+	# Signature taken before reading, a write during parsing is picked up next time
+	if signature:
+		_palette_cache[path] = (*signature, palette)
+	return palette
+
+
+
+def format_palette_line(name, color):
+	if name.startswith(('#', '\\')):
+		name = '\\' + name
+	return name + "=" + ",".join(f"{value:.6g}" for value in color)
+
+
+
+def _same_entry(entry, name, color):
+	return entry[0] == name and all(abs(a - b) < 1e-6 for a, b in zip(entry[1], color))
+
+
+
+def _match_previous(entries, previous):
+	"""Index of the previous entry with the same name for each entry, or None for new swatches.
+	Repeated names are matched in order.
+	"""
+	by_name = {}
+	for index, (name, _) in enumerate(previous.entries):
+		by_name.setdefault(name, []).append(index)
+	return [by_name[name].pop(0) if by_name.get(name) else None for name, _ in entries]
+
+
+
+def format_palette(entries, previous=None):
+	"""Palette file lines for a list of (name, color) entries, in that order.
+	With the previously read PaletteFile, swatches are matched by name: comments, blank lines,
+	malformed lines and unchanged swatches keep their original text and position, changed swatches
+	are rewritten in place, removed ones are dropped and new ones are written before the next
+	swatch that follows them, or at the end.
+	"""
+	lines = [f"{PALETTE_HEADER} v{PALETTE_VERSION}"]
+	matches = _match_previous(entries, previous) if previous else [None] * len(entries)
+	# Previous entry index → new entry index
+	position = {match: index for index, match in enumerate(matches) if match is not None}
+	# Previous entry index → its line in the previous file
+	previous_line = {index: number for number, (_, index) in enumerate(previous.lines) if index is not None} if previous else {}
+	written = 0
+	
+	def emit(index):
+		match = matches[index]
+		if match is not None and _same_entry(previous.entries[match], *entries[index]):
+			lines.append(previous.lines[previous_line[match]][0])
+		else:
+			lines.append(format_palette_line(*entries[index]))
+	
+	if previous:
+		for raw, index in previous.lines:
+			if index is None:
+				if not raw.startswith(PALETTE_HEADER):
+					lines.append(raw)
+				continue
+			target = position.get(index)
+			# Removed swatches, and swatches already written earlier because they were moved up, are skipped
+			if target is None or target < written:
+				continue
+			for pending in range(written, target + 1):
+				emit(pending)
+			written = target + 1
+	for pending in range(written, len(entries)):
+		emit(pending)
+	return lines
+
+
+
+def write_palette(path, entries):
+	"""Save entries to a palette file, returns False if the file already had this content.
+	The file is written next to the target and moved into place, so a reader never sees a partial palette.
+	"""
+	previous = None
+	if os.path.isfile(path):
+		try:
+			previous = read_palette(path)
+		except OSError:
+			previous = None
+	text = "\n".join(format_palette(entries, previous)) + "\n"
+	if previous and text == "".join(raw + "\n" for raw, _ in previous.lines):
+		return False
+	
+	temporary = path + ".partial"
+	with open(temporary, 'w', encoding='utf-8') as file:
+		file.write(text)
+	os.replace(temporary, path)
+	return True
+
+
+
+###########################################################################
+# Palette library
+# A folder of palette files indexed into a manifest of their swatches, so palettes can
+# be searched and switched without reading files again. The manifest records each file's
+# modification time and size, and only files that changed are parsed when it's updated.
+
+PALETTE_EXTENSIONS = ('.txt', '.palette')
+MANIFEST_VERSION = 1
+
+def index_library(folder, manifest):
+	"""Update a manifest {file name: {mtime, size, entries, errors}} from the palette files in a folder.
+	Returns the set of file names that were added, changed or removed.
+	"""
+	changed = set()
+	found = set()
+	try:
+		with os.scandir(folder) as entries:
+			files = [entry for entry in entries if entry.name.lower().endswith(PALETTE_EXTENSIONS) and entry.is_file()]
+	except OSError:
+		files = []
+	for entry in files:
+		found.add(entry.name)
+		try:
+			stat = entry.stat()
+			record = manifest.get(entry.name)
+			if record and record["mtime"] == stat.st_mtime_ns and record["size"] == stat.st_size:
+				continue
+			palette = read_palette(entry.path)
+		except OSError:
+			continue
+		manifest[entry.name] = {
+			"mtime": stat.st_mtime_ns,
+			"size": stat.st_size,
+			"entries": [[name, list(color)] for name, color in palette.entries],
+			"errors": len(palette.errors),
+		}
+		changed.add(entry.name)
+	for name in set(manifest) - found:
+		del manifest[name]
+		changed.add(name)
+	return changed
+
+
+
+def search_library(manifest, query):
+	"""Library file names whose palette name or any swatch name contains the query, ignoring case."""
+	query = query.strip().lower()
+	results = []
+	for file_name, record in manifest.items():
+		if not query or query in os.path.splitext(file_name)[0].lower() or any(query in name.lower() for name, _ in record["entries"]):
+			results.append(file_name)
+	return sorted(results, key=str.lower)
+
+
+
+def load_manifest(path, folder):
+	"""Saved manifest for a library folder, or an empty one if it's missing or for another folder."""
+	try:
+		with open(path, 'r', encoding='utf-8') as file:
+			data = json.load(file)
+		if data.get("version") == MANIFEST_VERSION and data.get("folder") == folder:
+			return data["palettes"]
+	except (OSError, ValueError, KeyError, AttributeError):
+		pass
+	return {}
+
+
+
+def save_manifest(path, folder, manifest):
+	temporary = path + ".partial"
+	with open(temporary, 'w', encoding='utf-8') as file:
+		json.dump({"version": MANIFEST_VERSION, "folder": folder, "palettes": manifest}, file)
+	os.replace(temporary, path)
@@ -0,0 +1,217 @@
+import bpy
+import blf
+import gpu
+import time
+from collections import deque
+
+
+
+# ---------------------------------------------------------------------------
+# Timeline overlay compositor — a single SpaceDopeSheetEditor POST_PIXEL handler
+# Feature modules register layers, each layer prepares draw commands from its own
+# per-region cache, and the compositor draws all of them in one pass with shared
+# shaders and a single blend state change.
+#
+# A layer is a callable prepare(context, region, cache) returning a list of
+# (shader name, batch, uniforms) commands, where uniforms maps uniform names to
+# values (GPUTexture values are bound as samplers). The cache dictionary belongs
+# to that layer in that region and persists between redraws.
+# ---------------------------------------------------------------------------
+
+# Registered layers sorted by draw order: [(order, name, prepare)]
+_layers = []
+
+# Builtin shaders by name, looked up once
+_shaders = {}
+
+# Per-region layer caches: region pointer → {layer name: cache dictionary}
+_region_cache = {}
+_REGION_CACHE_LIMIT = 16
+
+_draw_handle = None
+
+# Recent draw times in milliseconds per layer, plus "total" for the whole pass
+_TIMING_SAMPLES = 120
+_timings = {}
+
+# Set while the average draw time is over the preference budget, layers read it
+# to skip optional detail; cleared again below 75% of the budget
+reduced_detail = False
+
+
+
+def get_shader(name):
+	"""Builtin shader by name, created on first use and shared by all layers."""
+	shader = _shaders.get(name)
+	if shader is None:
+		shader = _shaders[name] = gpu.shader.from_builtin(name)
+	return shader
+
+
+
+def register_layer(name, prepare, order=0):
+	"""Add a layer to the compositor, layers with a lower order are drawn first."""
+	unregister_layer(name)
+	_layers.append((order, name, prepare))
+	_layers.sort(key=lambda layer: layer[:2])
+
+
+
+def unregister_layer(name):
+	"""Remove a layer and its cached data from every region."""
+	_layers[:] = [layer for layer in _layers if layer[1] != name]
+	for caches in _region_cache.values():
+		caches.pop(name, None)
+
+
+
+def invalidate(name=None):
+	"""Discard cached layer data in every region, for one layer or all of them."""
+	for caches in _region_cache.values():
+		if name is None:
+			caches.clear()
+		else:
+			caches.pop(name, None)
+
+
+
+def _record_timing(name, milliseconds):
+	samples = _timings.get(name)
+	if samples is None:
+		samples = _timings[name] = deque(maxlen=_TIMING_SAMPLES)
+	samples.append(milliseconds)
+
+
+
+def timing_summary(name):
+	"""Rolling (average, 95th percentile) draw time in milliseconds, or None without samples."""
+	samples = _timings.get(name)
+	if not samples:
+		return None
+	ordered = sorted(samples)
+	return sum(ordered) / len(ordered), ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+
+
+def _update_detail(budget):
+	"""Switch reduced detail on and off from the rolling average, with hysteresis to avoid flicker."""
+	global reduced_detail
+	summary = timing_summary("total")
+	if budget <= 0.0 or summary is None:
+		reduced_detail = False
+	elif summary[0] > budget:
+		reduced_detail = True
+	elif summary[0] < budget * 0.75:
+		reduced_detail = False
+
+
+
+def _reset_timing():
+	"""Forget recorded draw times and leave reduced detail, used when timing is switched off."""
+	global reduced_detail
+	_timings.clear()
+	reduced_detail = False
+
+
+
+def _draw_hud(region, names):
+	"""Debug text in the top right corner of the region, one line per layer."""
+	lines = []
+	for name in names + ["total"]:
+		summary = timing_summary(name)
+		if summary:
+			lines.append(f"{name}: {summary[0]:.2f} ms avg, {summary[1]:.2f} ms p95")
+	if reduced_detail:
+		lines.append("reduced detail")
+	font = 0
+	blf.size(font, 11)
+	blf.color(font, 1.0, 1.0, 1.0, 0.8)
+	for index, line in enumerate(lines):
+		width = blf.dimensions(font, line)[0]
+		blf.position(font, region.width - width - 12, region.height - 36 - index * 14, 0)
+		blf.draw(font, line)
+
+
+
+def draw_timeline_overlays():
+	"""Draw callback: collect commands from every layer, then draw them in one pass.
+	Each layer's prepare and draw time is only recorded while the timing HUD or a draw budget is enabled.
+	"""
+	context = bpy.context
+	region = context.region
+	if not _layers or not region or region.type != 'WINDOW':
+		return
+	if not context.area or context.area.type != 'DOPESHEET_EDITOR':
+		return
+	
+	caches = _region_cache.get(region.as_pointer())
+	if caches is None:
+		if len(_region_cache) >= _REGION_CACHE_LIMIT:
+			_region_cache.clear()
+		caches = _region_cache[region.as_pointer()] = {}
+	
+	prefs = context.preferences.addons[__package__].preferences
+	timed = prefs.overlay_debug_hud or prefs.overlay_time_budget > 0.0
+	if not timed and (_timings or reduced_detail):
+		_reset_timing()
+	
+	pass_start = time.perf_counter() if timed else 0.0
+	commands = []
+	elapsed = {}
+	for _, name, prepare in _layers:
+		start = time.perf_counter() if timed else 0.0
+		try:
+			for command in prepare(context, region, caches.setdefault(name, {})) or ():
+				commands.append((name, *command))
+		except Exception as e:
+			print(f"Error preparing {name} overlay: {e}")
+		if timed:
+			elapsed[name] = time.perf_counter() - start
+	
+	if commands:
+		# Consecutive commands using the same shader only bind it once
+		gpu.state.blend_set('ALPHA')
+		bound = None
+		for name, shader_name, batch, uniforms in commands:
+			start = time.perf_counter() if timed else 0.0
+			shader = get_shader(shader_name)
+			if shader_name != bound:
+				shader.bind()
+				bound = shader_name
+			for uniform, value in uniforms.items():
+				if isinstance(value, gpu.types.GPUTexture):
+					shader.uniform_sampler(uniform, value)
+				else:
+					shader.uniform_float(uniform, value)
+			batch.draw(shader)
+			if timed:
+				elapsed[name] += time.perf_counter() - start
+		gpu.state.blend_set('NONE')
+	
+	if not timed:
+		return
+	for name, seconds in elapsed.items():
+		_record_timing(name, seconds * 1000.0)
+	_record_timing("total", (time.perf_counter() - pass_start) * 1000.0)
+	_update_detail(prefs.overlay_time_budget)
+	
+	if prefs.overlay_debug_hud:
+		_draw_hud(region, list(elapsed))
+
+
+
+def register():
+	global _draw_handle
+	if _draw_handle is None:
+		_draw_handle = bpy.types.SpaceDopeSheetEditor.draw_handler_add(
+			draw_timeline_overlays, (), 'WINDOW', 'POST_PIXEL'
+		)
+
+def unregister():
+	global _draw_handle
+	if _draw_handle is not None:
+		bpy.types.SpaceDopeSheetEditor.draw_handler_remove(_draw_handle, 'WINDOW')
+		_draw_handle = None
+	_region_cache.clear()
+	_shaders.clear()
+	_timings.clear()
@@ -1,4 +1,476 @@
 import bpy
+import os
+import re
+import sys
+import json
+import threading
+import csv
+import hashlib
+import tempfile
+import subprocess
+from bpy.app.handlers import persistent
+from concurrent.futures import ThreadPoolExecutor
+
+# Local imports
+from . import image_headers
+from . import image_proxies
+
+###########################################################################
+# Change-aware reload
+# Image files are stat'ed in parallel (network shares are latency bound, not bandwidth bound)
+# and compared against the modification time and size recorded when each image was last loaded
+
+# Absolute file path: (mtime, size) of the file as last loaded into Blender
+_reload_manifest = {}
+
+_STAT_THREADS = 32
+
+
+
+def image_file_path(image):
+	"""Absolute file path of an image backed by a file on disk, or None for packed and generated images."""
+	if image.source not in {'FILE', 'SEQUENCE', 'TILED'} or image.packed_file or not image.filepath:
+		return None
+	return os.path.normpath(bpy.path.abspath(image.filepath, library=image.library))
+
+
+
+def _stat_file(path):
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+	return (stat.st_mtime, stat.st_size)
+
+
+
+def stat_files(paths):
+	"""(mtime, size) or None for each path, stat'ed on a thread pool."""
+	paths = list(paths)
+	if not paths:
+		return {}
+	with ThreadPoolExecutor(max_workers=min(_STAT_THREADS, len(paths))) as executor:
+		return dict(zip(paths, executor.map(_stat_file, paths)))
+
+
+
+def reload_changed_images(images):
+	"""Reload images whose files changed since the manifest was recorded.
+	Images without a manifest entry are reloaded once to establish it, images that
+	haven't been loaded yet are skipped since they will read the current file anyway.
+	Returns (reloaded, unchanged, missing) counts.
+	"""
+	paths = [image_file_path(image) for image in images]
+	states = stat_files({path for path in paths if path})
+	
+	reloaded = unchanged = missing = 0
+	for image, path in zip(images, paths):
+		state = states.get(path)
+		if path is None:
+			# Generated and packed images have no file to compare, reload as before
+			image.reload()
+			reloaded += 1
+		elif state is None and '<UDIM>' not in path and image.source != 'SEQUENCE':
+			missing += 1
+		elif not image.has_data:
+			_reload_manifest[path] = state
+			unchanged += 1
+		elif state is not None and _reload_manifest.get(path) == state:
+			unchanged += 1
+		else:
+			image.reload()
+			_reload_manifest[path] = state
+			reloaded += 1
+	return reloaded, unchanged, missing
+
+
+
+@persistent
+def _record_manifest(*args):
+	"""App handler: record the state of image files when a project is opened, they were just read from disk."""
+	_reload_manifest.clear()
+	paths = [path for path in map(image_file_path, bpy.data.images) if path]
+	if paths:
+		# Entries recorded by a reload in the meantime are newer, keep those
+		def _record():
+			for path, state in stat_files(paths).items():
+				_reload_manifest.setdefault(path, state)
+		threading.Thread(target=_record, daemon=True).start()
+
+
+
+###########################################################################
+# Formatting rules
+# Rules match a contains, glob or regex pattern against the image name, file path or
+# extension, and are compiled into one combined regular expression so each image is
+# classified in a single search with the first matching rule winning
+
+COLORSPACE_ITEMS = [
+	('Filmic Log', 'Filmic Log', 'Filmic Log color space'),
+	('Linear', 'Linear', 'Linear color space'),
+	('Linear ACES', 'Linear ACES', 'Linear ACES color space'),
+	('Linear ACEScg', 'Linear ACEScg', 'Linear ACEScg color space'),
+	('Non-Color', 'Non-Color', 'Non-Color color space'),
+	('Raw', 'Raw', 'Raw color space'),
+	('sRGB', 'sRGB', 'sRGB color space'),
+	('XYZ', 'XYZ', 'XYZ color space')
+	]
+
+ALPHAMODE_ITEMS = [
+	('STRAIGHT', 'Straight', 'RGB channels are stored without association, but the alpha still operates as a mask'),
+	('PREMUL', 'Premultiplied', 'RGB channels have been multiplied by the alpha'),
+	('CHANNEL_PACKED', 'Channel Packed', 'Treat alpha as a fourth color channel without masking'),
+	('NONE', 'None', 'Ignore alpha channel')
+	]
+
+# Image fields in the order they're joined into the text each image is matched against
+RULE_FIELDS = ('NAME', 'FILEPATH', 'EXTENSION')
+
+PRESET_VERSION = 1
+
+
+
+class ImageFormatRule(bpy.types.PropertyGroup):
+	enabled: bpy.props.BoolProperty(
+		name="Enabled",
+		description="Use this rule when formatting images",
+		default=True)
+	pattern: bpy.props.StringProperty(
+		name="Pattern",
+		description="Text, glob or regular expression to match (case insensitive)",
+		default="",
+		maxlen=4096)
+	syntax: bpy.props.EnumProperty(
+		name='Syntax',
+		description='How the pattern is matched',
+		items=[
+			('CONTAINS', 'Contains', 'Match the text anywhere'),
+			('GLOB', 'Glob', 'Match the whole value with * ? and [ ] wildcards'),
+			('REGEX', 'Regex', 'Search with a regular expression'),
+			],
+		default='CONTAINS')
+	field: bpy.props.EnumProperty(
+		name='Match',
+		description='Image value the pattern is matched against',
+		items=[
+			('NAME', 'Name', 'Image datablock name'),
+			('FILEPATH', 'File Path', 'Absolute image file path'),
+			('EXTENSION', 'Extension', 'File extension including the dot, such as .png'),
+			],
+		default='NAME')
+	colorspace: bpy.props.EnumProperty(
+		name='Color Space',
+		description='Set matching files to this color space',
+		items=COLORSPACE_ITEMS,
+		default='sRGB')
+	alphamode: bpy.props.EnumProperty(
+		name='Alpha Mode',
+		description='Set matching files to this alpha mode',
+		items=ALPHAMODE_ITEMS,
+		default='STRAIGHT')
+
+
+
+def _glob_to_regex(pattern):
+	"""Translate a glob into a regular expression that matches a whole line."""
+	parts = []
+	index = 0
+	while index < len(pattern):
+		char = pattern[index]
+		if char == '*':
+			parts.append(r'[^\n]*')
+		elif char == '?':
+			parts.append(r'[^\n]')
+		elif char == '[' and ']' in pattern[index + 2:]:
+			# The first character of a set may be a literal ]
+			end = pattern.index(']', index + 2)
+			body = pattern[index + 1:end].replace('\\', '\\\\')
+			if body.startswith('!'):
+				body = '^' + body[1:]
+			parts.append(f'[{body}]')
+			index = end
+		else:
+			parts.append(re.escape(char))
+		index += 1
+	return '^' + ''.join(parts) + '$'
+
+
+
+def rule_expression(pattern, syntax, field):
+	"""Lookahead expression matching the rule on its own line of the image text."""
+	if syntax == 'GLOB':
+		expression = _glob_to_regex(pattern)
+	elif syntax == 'REGEX':
+		expression = pattern
+	else:
+		expression = re.escape(pattern)
+	skip = RULE_FIELDS.index(field)
+	return rf"(?=^(?:[^\n]*\n){{{skip}}}[^\n]*?(?:{expression}))" if skip else rf"(?=[^\n]*?(?:{expression}))"
+
+
+
+# Compiled matcher for the current rules: (rule key, pattern, rule targets, invalid rule indices)
+_matcher_cache = None
+
+def compile_rules(rules):
+	"""Compile enabled rules into one regex with a named group per rule.
+	Alternatives are tried in order, so the first matching rule wins like the old filters.
+	Groups in a regex rule would be renumbered inside the combined pattern, so backreferences
+	would point at another rule's group. When any rule has groups the rules are kept as a tuple
+	of patterns and searched one at a time instead.
+	Returns (combined pattern or tuple of rule patterns or None, [(colorspace, alphamode)] per rule, [invalid rule indices]).
+	"""
+	global _matcher_cache
+	key = tuple((rule.enabled, rule.pattern, rule.syntax, rule.field, rule.colorspace, rule.alphamode) for rule in rules)
+	if _matcher_cache and _matcher_cache[0] == key:
+		return _matcher_cache[1:]
+	
+	branches = []
+	patterns = []
+	targets = []
+	invalid = []
+	grouped = False
+	for index, rule in enumerate(rules):
+		if not rule.enabled or not rule.pattern:
+			continue
+		expression = rule_expression(rule.pattern, rule.syntax, rule.field)
+		try:
+			patterns.append(re.compile(r'\A' + expression, re.IGNORECASE | re.MULTILINE))
+		except re.error:
+			invalid.append(index)
+			continue
+		# Only regex rules can have groups, the other syntaxes are escaped
+		grouped = grouped or patterns[-1].groups > 0
+		branches.append(f"(?P<_rule{len(targets)}>{expression})")
+		targets.append((rule.colorspace, rule.alphamode))
+	
+	pattern = None
+	if grouped:
+		pattern = tuple(patterns)
+	elif branches:
+		try:
+			pattern = re.compile(r'\A(?:' + '|'.join(branches) + ')', re.IGNORECASE | re.MULTILINE)
+		except re.error:
+			pattern = tuple(patterns)
+	_matcher_cache = (key, pattern, targets, invalid)
+	return pattern, targets, invalid
+
+
+
+def image_rule_text(image):
+	"""Name, absolute file path and extension of an image, one per line as the rules expect."""
+	filepath = bpy.path.abspath(image.filepath, library=image.library) if image.filepath else ""
+	return "\n".join((image.name, filepath, os.path.splitext(filepath)[1])).replace("\r", "")
+
+
+
+def classify_image(image, pattern, targets):
+	"""(colorspace, alphamode) of the first rule matching the image, or None.
+	The pattern is either the combined rule regex or a tuple of per rule patterns from compile_rules.
+	"""
+	if pattern is None:
+		return None
+	if isinstance(pattern, tuple):
+		text = image_rule_text(image)
+		for index, rule_pattern in enumerate(pattern):
+			if rule_pattern.search(text):
+				return targets[index]
+		return None
+	match = pattern.search(image_rule_text(image))
+	if match is None:
+		return None
+	return targets[int(match.lastgroup[5:])]
+
+
+
+def format_image(image, colorspace, alphamode):
+	"""Apply a color space and alpha mode, only writing values that differ.
+	Every write invalidates the image's GPU texture and the shaders using it, even when
+	the value is unchanged. Returns True if anything changed.
+	"""
+	changed = False
+	if image.colorspace_settings.name != colorspace:
+		image.colorspace_settings.name = colorspace
+		changed = True
+	if image.alpha_mode != alphamode:
+		image.alpha_mode = alphamode
+		changed = True
+	return changed
+
+
+
+# Defaults of the five pre-rule filter preferences: (name, colorspace, alphamode)
+LEGACY_FILTER_DEFAULTS = (
+	("-color", 'sRGB', 'STRAIGHT'),
+	("-orm", 'Non-Color', 'CHANNEL_PACKED'),
+	("-normal", 'Non-Color', 'CHANNEL_PACKED'),
+	("", 'sRGB', 'STRAIGHT'),
+	("", 'sRGB', 'STRAIGHT'),
+)
+
+def _legacy_enum(prefs, key, items, default):
+	"""Identifier of a stored pre-rule enum preference, which is saved as an item index."""
+	value = prefs.get(key)
+	if isinstance(value, int) and 0 <= value < len(items):
+		return items[value][0]
+	return default
+
+def ensure_format_rules(prefs):
+	"""Create the rule list once from the pre-rule filter preferences.
+	Preferences only store values that were changed, so every filter falls back to its
+	original default for anything never set; on a new install this gives the -color, -orm
+	and -normal rules of LEGACY_FILTER_DEFAULTS.
+	"""
+	if prefs.format_rules_migrated:
+		return
+	# Rule lists created before the migrated flag existed are kept as they are
+	if not len(prefs.format_rules):
+		rules = []
+		for number, (name, colorspace, alphamode) in enumerate(LEGACY_FILTER_DEFAULTS, start=1):
+			name = prefs.get(f"filter{number}_name", name)
+			if name:
+				rules.append({
+					"pattern": name,
+					"colorspace": _legacy_enum(prefs, f"filter{number}_colorspace", COLORSPACE_ITEMS, colorspace),
+					"alphamode": _legacy_enum(prefs, f"filter{number}_alphamode", ALPHAMODE_ITEMS, alphamode),
+				})
+		set_format_rules(prefs, rules)
+	prefs.format_rules_migrated = True
+
+
+
+def set_format_rules(prefs, rules):
+	"""Replace the rule list with rule dictionaries, missing or invalid values use the property defaults."""
+	prefs.format_rules.clear()
+	for data in rules:
+		rule = prefs.format_rules.add()
+		for name in ("enabled", "pattern", "syntax", "field", "colorspace", "alphamode"):
+			if name in data:
+				try:
+					setattr(rule, name, data[name])
+				except (TypeError, ValueError):
+					print(f"Ignoring invalid {name} value in format rule: {data[name]}")
+	prefs.format_rules_index = 0
+
+
+
+class PRODUCTIONKIT_UL_format_rules(bpy.types.UIList):
+	def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+		row = layout.row(align=True)
+		row.prop(item, "enabled", text="")
+		sub = row.row(align=True)
+		sub.active = item.enabled
+		sub.prop(item, "field", text="")
+		sub.prop(item, "syntax", text="")
+		sub.prop(item, "pattern", text="")
+		sub.prop(item, "colorspace", text="")
+		sub.prop(item, "alphamode", text="")
+
+
+
+class Production_Kit_Format_Rule_Add(bpy.types.Operator):
+	bl_idname = "productionkit.format_rule_add"
+	bl_label = "Add Format Rule"
+	bl_description = "Add an image formatting rule"
+	
+	def execute(self, context):
+		prefs = context.preferences.addons[__package__].preferences
+		prefs.format_rules.add()
+		prefs.format_rules_index = len(prefs.format_rules) - 1
+		return {'FINISHED'}
+
+
+
+class Production_Kit_Format_Rule_Remove(bpy.types.Operator):
+	bl_idname = "productionkit.format_rule_remove"
+	bl_label = "Remove Format Rule"
+	bl_description = "Remove the selected image formatting rule"
+	
+	@classmethod
+	def poll(cls, context):
+		return len(context.preferences.addons[__package__].preferences.format_rules) > 0
+	
+	def execute(self, context):
+		prefs = context.preferences.addons[__package__].preferences
+		prefs.format_rules.remove(prefs.format_rules_index)
+		prefs.format_rules_index = max(0, min(prefs.format_rules_index, len(prefs.format_rules) - 1))
+		return {'FINISHED'}
+
+
+
+class Production_Kit_Format_Rule_Move(bpy.types.Operator):
+	bl_idname = "productionkit.format_rule_move"
+	bl_label = "Move Format Rule"
+	bl_description = "Move the selected rule up or down, earlier rules take priority"
+	
+	direction: bpy.props.EnumProperty(items=[('UP', 'Up', ''), ('DOWN', 'Down', '')])
+	
+	def execute(self, context):
+		prefs = context.preferences.addons[__package__].preferences
+		index = prefs.format_rules_index
+		target = index - 1 if self.direction == 'UP' else index + 1
+		if 0 <= target < len(prefs.format_rules):
+			prefs.format_rules.move(index, target)
+			prefs.format_rules_index = target
+		return {'FINISHED'}
+
+
+
+class Production_Kit_Format_Rules_Export(bpy.types.Operator):
+	bl_idname = "productionkit.format_rules_export"
+	bl_label = "Export Format Rules"
+	bl_description = "Save the image formatting rules as a studio preset file"
+	
+	filepath: bpy.props.StringProperty(subtype="FILE_PATH", default="image_format_rules.json")
+	filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+	
+	def invoke(self, context, event):
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def execute(self, context):
+		prefs = context.preferences.addons[__package__].preferences
+		rules = [{name: getattr(rule, name) for name in ("enabled", "pattern", "syntax", "field", "colorspace", "alphamode")} for rule in prefs.format_rules]
+		try:
+			with open(bpy.path.abspath(self.filepath), 'w') as file:
+				json.dump({"version": PRESET_VERSION, "rules": rules}, file, indent=1)
+		except OSError as exc:
+			self.report({'ERROR'}, f"Could not save format rules: {exc}")
+			return {'CANCELLED'}
+		self.report({'INFO'}, f"Exported {len(rules)} format rules")
+		return {'FINISHED'}
+
+
+
+class Production_Kit_Format_Rules_Import(bpy.types.Operator):
+	bl_idname = "productionkit.format_rules_import"
+	bl_label = "Import Format Rules"
+	bl_description = "Replace the image formatting rules with a studio preset file"
+	
+	filepath: bpy.props.StringProperty(subtype="FILE_PATH")
+	filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+	
+	def invoke(self, context, event):
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def execute(self, context):
+		prefs = context.preferences.addons[__package__].preferences
+		try:
+			with open(bpy.path.abspath(self.filepath), 'r') as file:
+				data = json.load(file)
+			rules = data["rules"]
+			if data.get("version", PRESET_VERSION) > PRESET_VERSION or not isinstance(rules, list):
+				raise ValueError("unsupported preset version")
+		except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+			self.report({'ERROR'}, f"Could not load format rules: {exc}")
+			return {'CANCELLED'}
+		set_format_rules(prefs, [rule for rule in rules if isinstance(rule, dict)])
+		invalid = compile_rules(prefs.format_rules)[2]
+		self.report({'WARNING'} if invalid else {'INFO'}, f"Imported {len(prefs.format_rules)} format rules" + (f", {len(invalid)} with invalid patterns" if invalid else ""))
+		return {'FINISHED'}
+
+
 
 ###########################################################################
 # Update images
@@ -11,42 +483,96 @@ class Production_Kit_Update_Images(bpy.types.Operator):
 	bl_options = {'REGISTER', 'UNDO'}
 	
 	reload: bpy.props.BoolProperty()
+	reload_changed: bpy.props.BoolProperty()
 	format: bpy.props.BoolProperty()
 	
 	def execute(self, context):
 		prefs = context.preferences.addons[__package__].preferences
+		# Only the last report of an operator is shown, so results are collected into one message
+		messages = []
+		warning = False
+		
+		# Reload only changed image files
+		if self.reload and self.reload_changed:
+			# Prevent reloading of files that have unsaved changes in Blender
+			reloaded, unchanged, missing = reload_changed_images([image for image in bpy.data.images if not image.is_dirty])
+			messages.append(f"Reloaded {reloaded} images, {unchanged} unchanged" + (f", {missing} missing" if missing else ""))
+			warning |= bool(missing)
 		
+		# Rules are compiled once for the whole scan
+		if self.format:
+			pattern, targets, invalid = compile_rules(prefs.format_rules)
+			if invalid:
+				messages.append(f"Skipped {len(invalid)} format rules with invalid patterns")
+				warning = True
+		
+		formatted = []
 		for image in bpy.data.images:
 			# Reload all image files
-			if self.reload:
+			if self.reload and not self.reload_changed:
 				# Prevent reloading of files that have unsaved changes in Blender
 				if not image.is_dirty:
 					image.reload()
 			
 			# Format all image files
 			if self.format:
-				# Update file settings based on file name matches
-				imageName = image.name.lower()
-				if prefs.filter1_name.lower() in imageName:
-					image.colorspace_settings.name = prefs.filter1_colorspace
-					image.alpha_mode = prefs.filter1_alphamode
-				elif prefs.filter2_name.lower() in imageName:
-					image.colorspace_settings.name = prefs.filter2_colorspace
-					image.alpha_mode = prefs.filter2_alphamode
-				elif prefs.filter3_name.lower() in imageName:
-					image.colorspace_settings.name = prefs.filter3_colorspace
-					image.alpha_mode = prefs.filter3_alphamode
-				elif prefs.filter4_name.lower() in imageName:
-					image.colorspace_settings.name = prefs.filter4_colorspace
-					image.alpha_mode = prefs.filter4_alphamode
-				elif prefs.filter5_name.lower() in imageName:
-					image.colorspace_settings.name = prefs.filter5_colorspace
-					image.alpha_mode = prefs.filter5_alphamode
+				# Update file settings based on the first matching rule
+				target = classify_image(image, pattern, targets)
+				if target and format_image(image, *target):
+					formatted.append(image.name)
+		
+		if self.format:
+			# Full list in the console, the status bar only has room for a few names
+			for name in formatted:
+				print(f"Formatted image: {name}")
+			names = ", ".join(formatted[:3]) + (f" and {len(formatted) - 3} more" if len(formatted) > 3 else "")
+			messages.append(f"Formatted {len(formatted)} images" + (f": {names}" if formatted else ", all already matched their rules"))
+		if messages:
+			self.report({'WARNING'} if warning else {'INFO'}, "; ".join(messages))
 		return {'FINISHED'}
 
 ###########################################################################
 # Replace images (file extension swap)
 
+# Folder: (folder mtime, {lowercase file name: file name})
+_listing_cache = {}
+
+
+
+def _normalise_extension(extension):
+	extension = extension.strip()
+	if extension and not extension.startswith('.'):
+		extension = '.' + extension
+	return extension
+
+
+
+def _list_directory(folder):
+	try:
+		mtime = os.stat(folder).st_mtime
+	except OSError:
+		return folder, None
+	cached = _listing_cache.get(folder)
+	if cached and cached[0] == mtime:
+		return folder, cached[1]
+	try:
+		names = {name.lower(): name for name in os.listdir(folder)}
+	except OSError:
+		return folder, None
+	_listing_cache[folder] = (mtime, names)
+	return folder, names
+
+
+
+def list_directories(folders):
+	"""File names per folder, listed on a thread pool and cached until the folder is modified."""
+	folders = list(folders)
+	if not folders:
+		return {}
+	with ThreadPoolExecutor(max_workers=min(_STAT_THREADS, len(folders))) as executor:
+		return dict(executor.map(_list_directory, folders))
+
+
 class Production_Kit_Switch_Extension_Inputs(bpy.types.Operator):
 	bl_idname = "productionkit.switchextension"
 	bl_label = "Switch File Extension Settings"
@@ -67,23 +593,754 @@ class Production_Kit_Replace_Extensions(bpy.types.Operator):
 	bl_idname = "productionkit.replaceextension"
 	bl_label = "Replace All Image Extensions"
 	bl_icon = "FILE_REFRESH"
-	bl_description = "Replace all images that match the source file extension (left) with files using the target file extension (right), assumes that files already exist in the file system"
+	bl_description = "Replace all images that match the source file extension (left) with files using the target file extension (right), skipping images whose target file doesn't exist"
 	bl_options = {'REGISTER', 'UNDO'}
 	
 	def execute(self, context):
 		settings = context.scene.production_kit_settings
 		
-		source = settings.file_extension_source
-		target = settings.file_extension_target
+		source = _normalise_extension(settings.file_extension_source)
+		target = _normalise_extension(settings.file_extension_target)
+		if not source or not target or source.lower() == target.lower():
+			self.report({'WARNING'}, "Source and target extensions must be different")
+			return {'CANCELLED'}
 		
+		# Only the real extension of each file is replaced, never text elsewhere in the path
+		swaps = []
 		for image in bpy.data.images:
 			# Prevent replacing files that have unsaved changes in Blender
-			if not image.is_dirty:
-				image.filepath = image.filepath.replace(source, target)
-				image.name = image.name.replace(source, target)
-#				image.reload()
-		settings.file_extension_source = target
-		settings.file_extension_target = source
+			path = image_file_path(image)
+			if image.is_dirty or not path or os.path.splitext(path)[1].lower() != source.lower():
+				continue
+			swaps.append((image, path[:-len(source)] + target))
+		
+		# Target files are looked up in one listing per folder instead of one check per image
+		listings = list_directories({os.path.dirname(new_path) for _, new_path in swaps})
+		replaced = []
+		missing = []
+		for image, new_path in swaps:
+			folder, name = os.path.split(new_path)
+			names = listings.get(folder)
+			# Case-insensitive file systems may store the name in a different case
+			found = names.get(name.lower()) if names else None
+			if found is None and names and '<UDIM>' in name:
+				tile = re.compile(re.escape(name.lower()).replace('<udim>', r'\d{4}'))
+				found = name if any(tile.fullmatch(key) for key in names) else None
+			if found is None:
+				missing.append(new_path)
+				continue
+			filename = os.path.basename(image.filepath)
+			image.filepath = image.filepath[:len(image.filepath) - len(filename)] + found
+			if image.name.lower().endswith(source.lower()):
+				image.name = image.name[:-len(source)] + os.path.splitext(found)[1]
+			replaced.append(image)
+		
+		# Assigning a file path already reloads the image, only record the new files for change-aware reloads
+		states = stat_files({image_file_path(image) for image in replaced})
+		for image in replaced:
+			_reload_manifest[image_file_path(image)] = states.get(image_file_path(image))
+		
+		for path in missing:
+			print(f"Missing replacement image: {path}")
+		if replaced:
+			settings.file_extension_source = target
+			settings.file_extension_target = source
+		self.report({'WARNING'} if missing else {'INFO'}, f"Replaced {len(replaced)} images" + (f", skipped {len(missing)} with missing {target} files" if missing else ""))
+		return {'FINISHED'}
+
+
+
+###########################################################################
+# Proxy images (1/2 and 1/4 resolution copies in a cache folder)
+
+# Image custom property holding the original file path while a proxy is used
+PROXY_SOURCE = "production_kit_proxy_source"
+
+# Proxy level in use before a render switched to full resolution, or None
+_render_proxy_level = None
+
+# Set by the render handlers, which can run on the render thread, and read by a main thread timer
+_render_finished = False
+
+# Proxy state taken out of the project while it's saved: image name → (proxy path, original path), scene name → level
+_saved_proxy_paths = {}
+_saved_proxy_levels = {}
+
+
+
+def proxy_cache_folder(context):
+	"""Absolute proxy folder, or None when it's relative to a project that hasn't been saved yet."""
+	prefs = context.preferences.addons[__package__].preferences
+	if prefs.proxy_cache_location.startswith('//') and not bpy.data.filepath:
+		return None
+	return os.path.normpath(bpy.path.abspath(prefs.proxy_cache_location))
+
+
+
+def switch_image_proxies(level, cache_folder):
+	"""Point every local image at its proxy for a level ('2' or '4'), or back to its original file ('FULL').
+	Images without a generated proxy keep their current file. Returns (switched, without proxy) counts.
+	"""
+	switched = missing = 0
+	for image in bpy.data.images:
+		# Linked images can't be edited, unsaved changes would be lost
+		if image.library or image.is_dirty:
+			continue
+		original = image.get(PROXY_SOURCE)
+		if level == 'FULL':
+			if original is not None:
+				image.filepath = original
+				del image[PROXY_SOURCE]
+				switched += 1
+			continue
+		
+		source = original or image.filepath
+		if image.source != 'FILE' or image.packed_file or not source:
+			continue
+		proxy = image_proxies.proxy_path(bpy.path.abspath(source), cache_folder, int(level))
+		if not os.path.isfile(proxy):
+			missing += 1
+			continue
+		image[PROXY_SOURCE] = source
+		image.filepath = bpy.path.relpath(proxy) if bpy.data.filepath else proxy
+		switched += 1
+	return switched, missing
+
+
+
+class Production_Kit_Generate_Proxies(bpy.types.Operator):
+	bl_idname = "productionkit.generate_proxies"
+	bl_label = "Generate Proxies"
+	bl_icon = "IMAGE_REFERENCE"
+	bl_description = "Create 1/2 and 1/4 resolution copies of every image file in the proxy folder, resized on the CPU in parallel background processes. Up to date proxies are kept"
+	
+	_timer = None
+	_thread = None
+	_cancel = None
+	_processes = None
+	
+	def execute(self, context):
+		cache_folder = proxy_cache_folder(context)
+		if cache_folder is None:
+			self.report({'ERROR'}, "Save the project first, the proxy folder is relative to it")
+			return {'CANCELLED'}
+		
+		# Original files are used even while proxies are active
+		jobs = []
+		sources = {bpy.path.abspath(image.get(PROXY_SOURCE) or image.filepath, library=image.library) for image in bpy.data.images if image.source == 'FILE' and not image.packed_file and image.filepath}
+		for source in sorted(sources):
+			if not os.path.isfile(source):
+				continue
+			for factor in image_proxies.PROXY_FACTORS:
+				proxy = image_proxies.proxy_path(source, cache_folder, factor)
+				if not image_proxies.is_current(source, proxy):
+					jobs.append((source, proxy, factor))
+		if not jobs:
+			self.report({'INFO'}, "All proxies are up to date")
+			return {'FINISHED'}
+		
+		self._progress = [0, len(jobs), 0]
+		self._cancel = threading.Event()
+		self._processes = set()
+		self._thread = threading.Thread(target=self._generate, args=(jobs,), daemon=True)
+		self._thread.start()
+		context.window_manager.progress_begin(0, len(jobs))
+		self._timer = context.window_manager.event_timer_add(0.25, window=context.window)
+		context.window_manager.modal_handler_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def _generate(self, jobs):
+		# Each resize is its own Python process, the threads only wait on them
+		def run(job):
+			if self._cancel.is_set():
+				return
+			source, proxy, factor = job
+			process = subprocess.Popen([sys.executable, image_proxies.__file__, source, proxy, str(factor)], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+			self._processes.add(process)
+			_, error = process.communicate()
+			self._processes.discard(process)
+			if process.returncode != 0 and not self._cancel.is_set():
+				print(error.strip() or f"Failed to create proxy for {source}")
+				self._progress[2] += 1
+			self._progress[0] += 1
+		with ThreadPoolExecutor(max_workers=max(1, os.cpu_count() or 1)) as executor:
+			list(executor.map(run, jobs))
+	
+	def modal(self, context, event):
+		if event.type == 'ESC' and not self._cancel.is_set():
+			# Running resizes are stopped too, proxies are moved into place only once complete
+			self._cancel.set()
+			for process in list(self._processes):
+				process.terminate()
+			context.workspace.status_text_set("Cancelling proxy generation")
+			return {'RUNNING_MODAL'}
+		if event.type != 'TIMER':
+			return {'PASS_THROUGH'}
+		done, total, failed = self._progress
+		context.window_manager.progress_update(done)
+		context.workspace.status_text_set(f"Generating proxies: {done} / {total}")
+		if self._thread.is_alive():
+			return {'RUNNING_MODAL'}
+		
+		context.window_manager.event_timer_remove(self._timer)
+		context.window_manager.progress_end()
+		context.workspace.status_text_set(None)
+		if self._cancel.is_set():
+			self.report({'WARNING'}, f"Proxy generation cancelled after {done} of {total}")
+			return {'CANCELLED'}
+		self.report({'WARNING'} if failed else {'INFO'}, f"Generated {total - failed} proxies" + (f", {failed} failed" if failed else ""))
+		return {'FINISHED'}
+
+
+
+class Production_Kit_Switch_Proxies(bpy.types.Operator):
+	bl_idname = "productionkit.switch_proxies"
+	bl_label = "Switch Image Resolution"
+	bl_icon = "IMAGE_REFERENCE"
+	bl_description = "Switch all images between their original files and generated proxies"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	level: bpy.props.EnumProperty(
+		items=[
+			('FULL', 'Full', 'Original image files'),
+			('2', '1/2', 'Half resolution proxies'),
+			('4', '1/4', 'Quarter resolution proxies'),
+			],
+		default='FULL')
+	
+	def execute(self, context):
+		cache_folder = proxy_cache_folder(context)
+		if cache_folder is None and self.level != 'FULL':
+			self.report({'ERROR'}, "Save the project first, the proxy folder is relative to it")
+			return {'CANCELLED'}
+		switched, missing = switch_image_proxies(self.level, cache_folder)
+		context.scene.production_kit_settings.image_proxy_level = self.level
+		self.report({'WARNING'} if missing else {'INFO'}, f"Switched {switched} images" + (f", {missing} have no proxy (generate proxies first)" if missing else ""))
+		return {'FINISHED'}
+
+
+
+def _restore_render_proxies():
+	"""Switch back to the proxies that were active before a full resolution render."""
+	global _render_proxy_level, _render_finished
+	_render_finished = False
+	if _render_proxy_level is not None:
+		switch_image_proxies(_render_proxy_level, proxy_cache_folder(bpy.context))
+		_render_proxy_level = None
+
+
+
+def _wait_for_render():
+	"""Timer: restore proxies on the main thread once the render handlers flag the render as finished."""
+	if not _render_finished:
+		return 0.5
+	_restore_render_proxies()
+	return None
+
+
+
+class Production_Kit_Render_Full_Resolution(bpy.types.Operator):
+	bl_idname = "productionkit.render_full_resolution"
+	bl_label = "Render with Full Resolution Images"
+	bl_icon = "RENDER_STILL"
+	bl_description = "Switch proxy images back to their original files, render, and switch back to the proxies when the render finishes or is cancelled"
+	
+	animation: bpy.props.BoolProperty(
+		name="Animation",
+		description="Render the frame range instead of the current frame",
+		default=False)
+	
+	def execute(self, context):
+		global _render_proxy_level, _render_finished
+		prefs = context.preferences.addons[__package__].preferences
+		level = context.scene.production_kit_settings.image_proxy_level
+		# Paths are switched here on the main thread, render handlers may run on the render thread
+		if prefs.proxy_full_render and level != 'FULL' and _render_proxy_level is None:
+			_render_proxy_level = level
+			_render_finished = False
+			switch_image_proxies('FULL', proxy_cache_folder(context))
+		
+		result = bpy.ops.render.render('INVOKE_DEFAULT', animation=self.animation)
+		if _render_proxy_level is not None:
+			if 'RUNNING_MODAL' in result and not bpy.app.background:
+				if not bpy.app.timers.is_registered(_wait_for_render):
+					bpy.app.timers.register(_wait_for_render, first_interval=0.5)
+			else:
+				# Render didn't start, or already finished in the foreground
+				_restore_render_proxies()
+		return {'FINISHED'}
+
+
+
+@persistent
+def _render_done(scene, *args):
+	"""App handler: flag the render as finished, the proxy switch happens in a main thread timer."""
+	global _render_finished
+	if _render_proxy_level is not None:
+		_render_finished = True
+
+
+
+@persistent
+def _save_original_paths(*args):
+	"""App handler: save original image paths and full resolution in the project, proxies only last a session.
+	filepath_raw changes the path without reloading the image, the proxy pixels stay loaded.
+	"""
+	_saved_proxy_paths.clear()
+	_saved_proxy_levels.clear()
+	for image in bpy.data.images:
+		original = image.get(PROXY_SOURCE)
+		if original is not None and not image.library:
+			_saved_proxy_paths[image.name] = (image.filepath_raw, original)
+			image.filepath_raw = original
+			del image[PROXY_SOURCE]
+	for scene in bpy.data.scenes:
+		if scene.production_kit_settings.image_proxy_level != 'FULL':
+			_saved_proxy_levels[scene.name] = scene.production_kit_settings.image_proxy_level
+			scene.production_kit_settings.image_proxy_level = 'FULL'
+
+
+
+@persistent
+def _restore_proxy_paths(*args):
+	"""App handler: put the proxy paths back after saving."""
+	for name, (proxy, original) in _saved_proxy_paths.items():
+		image = bpy.data.images.get(name)
+		if image:
+			image[PROXY_SOURCE] = original
+			image.filepath_raw = proxy
+	for name, level in _saved_proxy_levels.items():
+		scene = bpy.data.scenes.get(name)
+		if scene:
+			scene.production_kit_settings.image_proxy_level = level
+	_saved_proxy_paths.clear()
+	_saved_proxy_levels.clear()
+
+
+
+###########################################################################
+# Image usage and memory report
+
+class ImageReportItem(bpy.types.PropertyGroup):
+	# name holds the image name
+	width: bpy.props.IntProperty()
+	height: bpy.props.IntProperty()
+	channels: bpy.props.IntProperty()
+	is_float: bpy.props.BoolProperty()
+	memory: bpy.props.FloatProperty(description="Estimated pixel memory in MB")
+	file_size: bpy.props.FloatProperty(description="File size on disk in MB")
+	users: bpy.props.IntProperty()
+	packed: bpy.props.BoolProperty()
+	loaded: bpy.props.BoolProperty(description="Pixels are currently loaded in Blender")
+	measured: bpy.props.BoolProperty(description="Resolution is known, from Blender or the file header")
+
+
+
+def estimate_image_memory(width, height, is_float):
+	"""Approximate bytes of an image buffer, Blender stores 4 channels of 8 bit or 32 bit float per pixel."""
+	return width * height * 4 * (4 if is_float else 1)
+
+
+
+def scan_images(images):
+	"""Resolution, pixel type and memory for images, reading file headers for images that aren't loaded.
+	Returns a list of dictionaries in the same order as the images.
+	"""
+	paths = [image_file_path(image) for image in images]
+	unloaded = {path for image, path in zip(images, paths) if path and not image.has_data}
+	states = stat_files({path for path in paths if path})
+	with ThreadPoolExecutor(max_workers=min(_STAT_THREADS, max(1, len(unloaded)))) as executor:
+		headers = dict(zip(unloaded, executor.map(image_headers.read_image_header, unloaded)))
+	
+	report = []
+	for image, path in zip(images, paths):
+		entry = {
+			"name": image.name,
+			"width": 0, "height": 0, "channels": 0, "is_float": False,
+			"users": image.users,
+			"packed": bool(image.packed_file),
+			"loaded": image.has_data,
+			"file_size": 0,
+		}
+		if image.has_data:
+			entry.update(width=image.size[0], height=image.size[1], channels=image.channels, is_float=image.is_float)
+		elif headers.get(path):
+			entry.update(zip(("width", "height", "channels", "is_float"), headers[path]))
+		if image.packed_file:
+			entry["file_size"] = image.packed_file.size
+		elif states.get(path):
+			entry["file_size"] = states[path][1]
+		entry["memory"] = estimate_image_memory(entry["width"], entry["height"], entry["is_float"])
+		report.append(entry)
+	return report
+
+
+
+class PRODUCTIONKIT_UL_image_report(bpy.types.UIList):
+	sort_by: bpy.props.EnumProperty(
+		name="Sort By",
+		items=[
+			('memory', 'Memory', 'Sort by estimated memory'),
+			('file_size', 'File Size', 'Sort by file size'),
+			('pixels', 'Resolution', 'Sort by pixel count'),
+			('users', 'Users', 'Sort by user count'),
+			('name', 'Name', 'Sort by name'),
+			],
+		default='memory')
+	
+	def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+		row = layout.row(align=True)
+		row.label(text=item.name, icon='PACKAGE' if item.packed else 'IMAGE_DATA')
+		if item.measured:
+			row.label(text=f"{item.width}×{item.height} {item.channels}ch {'float' if item.is_float else 'byte'}")
+			row.label(text=f"{item.memory:.1f} MB" + ("" if item.loaded else " *"))
+		else:
+			row.label(text="unknown")
+			row.label(text="")
+		row.label(text=f"{item.users} users")
+	
+	def draw_filter(self, context, layout):
+		row = layout.row(align=True)
+		row.prop(self, "filter_name", text="")
+		row.prop(self, "sort_by", text="")
+		row.prop(self, "use_filter_sort_reverse", text="", icon='SORT_DESC' if self.use_filter_sort_reverse else 'SORT_ASC')
+	
+	def filter_items(self, context, data, propname):
+		items = getattr(data, propname)
+		helper = bpy.types.UI_UL_list
+		flags = helper.filter_items_by_name(self.filter_name, self.bitflag_filter_item, items, "name") if self.filter_name else []
+		if self.sort_by == 'name':
+			order = helper.sort_items_by_name(items, "name")
+		else:
+			key = (lambda item: item.width * item.height) if self.sort_by == 'pixels' else (lambda item: getattr(item, self.sort_by))
+			# Largest first, the reverse toggle shows the smallest first
+			ranked = sorted(range(len(items)), key=lambda index: key(items[index]), reverse=True)
+			order = [0] * len(items)
+			for position, index in enumerate(ranked):
+				order[index] = position
+		return flags, order
+
+
+
+class Production_Kit_Scan_Images(bpy.types.Operator):
+	bl_idname = "productionkit.scan_images"
+	bl_label = "Scan Images"
+	bl_icon = "VIEWZOOM"
+	bl_description = "List every image with its resolution, pixel type, estimated memory, users, packed status and file size. Images that aren't loaded are measured from their file headers without loading pixels"
+	
+	def execute(self, context):
+		report = scan_images(list(bpy.data.images))
+		items = context.window_manager.production_kit_image_report
+		items.clear()
+		for entry in report:
+			item = items.add()
+			item.name = entry["name"]
+			item.width = entry["width"]
+			item.height = entry["height"]
+			item.channels = entry["channels"]
+			item.is_float = entry["is_float"]
+			item.memory = entry["memory"] / 1048576.0
+			item.file_size = entry["file_size"] / 1048576.0
+			item.users = entry["users"]
+			item.packed = entry["packed"]
+			item.loaded = entry["loaded"]
+			item.measured = entry["width"] > 0
+		total = sum(entry["memory"] for entry in report) / 1048576.0
+		self.report({'INFO'}, f"Scanned {len(report)} images, {total:.1f} MB estimated")
+		return {'FINISHED'}
+
+
+
+class Production_Kit_Export_Image_Report(bpy.types.Operator):
+	bl_idname = "productionkit.export_image_report"
+	bl_label = "Export Image Report"
+	bl_icon = "EXPORT"
+	bl_description = "Save the image report as a CSV file"
+	
+	filepath: bpy.props.StringProperty(subtype="FILE_PATH", default="image_report.csv")
+	filter_glob: bpy.props.StringProperty(default="*.csv", options={'HIDDEN'})
+	
+	@classmethod
+	def poll(cls, context):
+		return len(context.window_manager.production_kit_image_report) > 0
+	
+	def invoke(self, context, event):
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def execute(self, context):
+		items = sorted(context.window_manager.production_kit_image_report, key=lambda item: item.memory, reverse=True)
+		try:
+			with open(bpy.path.abspath(self.filepath), 'w', newline='') as file:
+				writer = csv.writer(file)
+				writer.writerow(["name", "width", "height", "channels", "float", "memory_mb", "file_size_mb", "users", "packed", "loaded"])
+				for item in items:
+					writer.writerow([item.name, item.width, item.height, item.channels, item.is_float, f"{item.memory:.2f}", f"{item.file_size:.2f}", item.users, item.packed, item.loaded])
+		except OSError as exc:
+			self.report({'ERROR'}, f"Could not save image report: {exc}")
+			return {'CANCELLED'}
+		self.report({'INFO'}, f"Exported {len(items)} images")
+		return {'FINISHED'}
+
+
+
+###########################################################################
+# Missing image resolver
+# A file name index of a folder tree is built with parallel scandir calls and cached to disk
+# with each folder's mtime, so later searches only list folders that changed since
+
+def _index_cache_path(root):
+	"""Disk cache location for a folder index, in the extension's user folder when available."""
+	try:
+		folder = bpy.utils.extension_path_user(__package__, path="file_index", create=True)
+	except (ValueError, AttributeError):
+		folder = os.path.join(tempfile.gettempdir(), "production_kit_file_index")
+		os.makedirs(folder, exist_ok=True)
+	return os.path.join(folder, hashlib.sha1(os.path.normcase(root).encode('utf-8')).hexdigest()[:16] + ".json")
+
+
+
+def _scan_folder(folder, cached):
+	"""(folder, [mtime, file names, sub-folder names]), reusing the cached entry if the folder is unchanged."""
+	try:
+		mtime = os.stat(folder).st_mtime
+		if cached and cached[0] == mtime:
+			return folder, cached
+		files = []
+		folders = []
+		with os.scandir(folder) as entries:
+			for entry in entries:
+				# Hidden folders such as .git are skipped
+				if entry.is_dir(follow_symlinks=False):
+					if not entry.name.startswith('.'):
+						folders.append(entry.name)
+				else:
+					files.append(entry.name)
+		return folder, [mtime, files, folders]
+	except OSError:
+		return folder, None
+
+
+
+def build_file_index(root, use_cache=True):
+	"""Map lowercase file names to full paths for every file below a root folder."""
+	root = os.path.normpath(root)
+	cache_path = _index_cache_path(root)
+	cached = {}
+	if use_cache:
+		try:
+			with open(cache_path, 'r') as file:
+				cached = json.load(file)["folders"]
+		except (OSError, ValueError, KeyError):
+			cached = {}
+	
+	# Breadth first, each level of the tree is listed in parallel
+	folders = {}
+	pending = [root]
+	with ThreadPoolExecutor(max_workers=_STAT_THREADS) as executor:
+		while pending:
+			results = list(executor.map(lambda folder: _scan_folder(folder, cached.get(folder)), pending))
+			pending = []
+			for folder, entry in results:
+				if entry:
+					folders[folder] = entry
+					pending.extend(os.path.join(folder, name) for name in entry[2])
+	
+	try:
+		with open(cache_path, 'w') as file:
+			json.dump({"root": root, "folders": folders}, file)
+	except OSError as exc:
+		print(f"Failed to write file index cache: {exc}")
+	
+	index = {}
+	for folder, (_, files, _) in folders.items():
+		for name in files:
+			index.setdefault(name.lower(), []).append(os.path.join(folder, name))
+	return index
+
+
+
+def _best_candidate(candidates, old_path):
+	"""Candidate sharing the most trailing folder names with the old path, such as textures/wood/."""
+	old_parts = os.path.normcase(old_path).replace('\\', '/').split('/')
+	def shared(path):
+		parts = os.path.normcase(path).replace('\\', '/').split('/')
+		count = 0
+		while count < min(len(parts), len(old_parts)) and parts[-1 - count] == old_parts[-1 - count]:
+			count += 1
+		return count
+	return max(candidates, key=shared)
+
+
+
+def resolve_missing_images(images, index):
+	"""Relink images whose files are missing to files found in the index.
+	Files are matched by name, falling back to the same name with another image extension.
+	Returns (relinked, relinked with a different extension, still missing) counts.
+	"""
+	paths = [image_file_path(image) for image in images]
+	# UDIM images count as present when their first tile exists
+	tile_paths = [path.replace('<UDIM>', '1001') if path else path for path in paths]
+	states = stat_files({path for path in tile_paths if path})
+	
+	# Extension swap fallback: file stem → paths of image files
+	stems = {}
+	for name, candidates in index.items():
+		stem, extension = os.path.splitext(name)
+		if extension in bpy.path.extensions_image:
+			stems.setdefault(stem, []).extend(candidates)
+	
+	relinked = swapped = missing = 0
+	for image, path, tile_path in zip(images, paths, tile_paths):
+		if image.library or not path or states.get(tile_path) is not None:
+			continue
+		name = os.path.basename(path)
+		# UDIM images are looked up by their first tile
+		lookup = name.replace('<UDIM>', '1001').lower()
+		candidates = index.get(lookup)
+		extension_swapped = False
+		if not candidates:
+			candidates = stems.get(os.path.splitext(lookup)[0])
+			extension_swapped = True
+		if not candidates:
+			missing += 1
+			continue
+		
+		found = _best_candidate(candidates, path)
+		if '<UDIM>' in name:
+			# The tile number sits after the same prefix in the found name, only that token is replaced
+			prefix = name.index('<UDIM>')
+			found_name = os.path.basename(found)
+			found = os.path.join(os.path.dirname(found), found_name[:prefix] + '<UDIM>' + found_name[prefix + 4:])
+		image.filepath = bpy.path.relpath(found) if image.filepath.startswith('//') and bpy.data.filepath else found
+		relinked += 1
+		swapped += extension_swapped
+	return relinked, swapped, missing
+
+
+
+class Production_Kit_Relink_Images(bpy.types.Operator):
+	bl_idname = "productionkit.relink_images"
+	bl_label = "Find Missing Images"
+	bl_icon = "VIEWZOOM"
+	bl_description = "Relink all images with missing files by searching a folder tree by file name, falling back to other image extensions. The folder index is cached, later searches only list changed folders"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	directory: bpy.props.StringProperty(subtype="DIR_PATH")
+	use_cache: bpy.props.BoolProperty(
+		name="Use Cached Index",
+		description="Reuse the cached listing of folders that haven't been modified since the last search",
+		default=True)
+	
+	def invoke(self, context, event):
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+	
+	def execute(self, context):
+		root = bpy.path.abspath(self.directory)
+		if not os.path.isdir(root):
+			self.report({'ERROR'}, f"Folder not found: {root}")
+			return {'CANCELLED'}
+		index = build_file_index(root, self.use_cache)
+		relinked, swapped, missing = resolve_missing_images(list(bpy.data.images), index)
+		self.report({'WARNING'} if missing else {'INFO'}, f"Relinked {relinked} images" + (f" ({swapped} with a different extension)" if swapped else "") + (f", {missing} still missing" if missing else ""))
+		return {'FINISHED'}
+
+
+
+###########################################################################
+# Duplicate images
+# Files are grouped by size first, only files sharing a size are hashed, with streaming
+# reads on a thread pool so large textures never have to fit in memory at once
+
+_HASH_CHUNK = 1 << 20
+
+
+
+def _hash_file(path):
+	try:
+		digest = hashlib.blake2b(digest_size=20)
+		with open(path, 'rb') as file:
+			for chunk in iter(lambda: file.read(_HASH_CHUNK), b''):
+				digest.update(chunk)
+		return digest.hexdigest()
+	except OSError:
+		return None
+
+
+
+def find_duplicate_images(images):
+	"""Groups of images with identical file or packed content and identical color settings.
+	Returns a list of image lists, each with the image to keep first.
+	"""
+	paths = [image_file_path(image) if not image.packed_file else None for image in images]
+	states = stat_files({path for path in paths if path})
+	
+	# Only sizes shared by several images can be duplicates
+	sizes = {}
+	for image, path in zip(images, paths):
+		if image.packed_file:
+			sizes.setdefault(image.packed_file.size, []).append(image)
+		elif path and states.get(path) and image.source == 'FILE':
+			sizes.setdefault(states[path][1], []).append(image)
+	candidates = [image for group in sizes.values() if len(group) > 1 for image in group]
+	
+	files = {image_file_path(image) for image in candidates if not image.packed_file}
+	with ThreadPoolExecutor(max_workers=min(_STAT_THREADS, max(1, len(files)))) as executor:
+		hashes = dict(zip(files, executor.map(_hash_file, files)))
+	
+	groups = {}
+	for image in candidates:
+		if image.packed_file:
+			content = hashlib.blake2b(image.packed_file.data, digest_size=20).hexdigest()
+		else:
+			content = hashes.get(image_file_path(image))
+		if content:
+			# Images only look the same with the same color space and alpha settings
+			key = (content, image.colorspace_settings.name, image.alpha_mode)
+			groups.setdefault(key, []).append(image)
+	
+	duplicates = []
+	for group in groups.values():
+		if len(group) > 1:
+			# Keep the most used image, preferring local images without unsaved changes
+			group.sort(key=lambda image: (image.library is None, not image.is_dirty, image.users), reverse=True)
+			duplicates.append(group)
+	return duplicates
+
+
+
+class Production_Kit_Dedupe_Images(bpy.types.Operator):
+	bl_idname = "productionkit.dedupe_images"
+	bl_label = "Merge Duplicate Images"
+	bl_icon = "DUPLICATE"
+	bl_description = "Find images with identical file contents and color settings, and remap all of their users onto a single image"
+	bl_options = {'REGISTER', 'UNDO'}
+	
+	remove: bpy.props.BoolProperty(
+		name="Remove Duplicates",
+		description="Delete duplicate images once nothing uses them",
+		default=True)
+	
+	def execute(self, context):
+		groups = find_duplicate_images(list(bpy.data.images))
+		
+		# Linked images and images with unsaved changes are never replaced
+		replaced = [(group[0], image) for group in groups for image in group[1:] if image.library is None and not image.is_dirty]
+		if not replaced:
+			self.report({'INFO'}, "No duplicate images found")
+			return {'FINISHED'}
+		saved = sum(entry["memory"] for entry in scan_images([image for _, image in replaced]))
+		
+		removed = 0
+		for keep, image in replaced:
+			print(f"Merged duplicate image {image.name} into {keep.name}")
+			image.user_remap(keep)
+			if self.remove and image.users == 0:
+				bpy.data.images.remove(image)
+				removed += 1
+		
+		self.report({'INFO'}, f"Merged {len(replaced)} duplicate images, removed {removed}, about {saved / 1048576.0:.1f} MB saved")
 		return {'FINISHED'}
 
 
@@ -95,7 +1352,7 @@ class PRODUCTIONKIT_PT_update_images_ui(bpy.types.Panel):
 	bl_label = "Update Images"
 	bl_space_type = 'NODE_EDITOR'
 	bl_region_type = 'UI'
-	bl_category = "Node"
+	bl_category = "Node"
 	bl_order = 20
 	bl_options = {'DEFAULT_CLOSED'}
 	
@@ -117,8 +1374,17 @@ class PRODUCTIONKIT_PT_update_images_ui(bpy.types.Panel):
 		if prefs.enable_file_reload or prefs.enable_file_format:
 			ops = layout.operator(Production_Kit_Update_Images.bl_idname, text=update_text, icon='RENDERLAYERS')
 			ops.reload = prefs.enable_file_reload
+			ops.reload_changed = prefs.enable_file_reload_changed
 			ops.format = prefs.enable_file_format
 		
+		# Generate and switch proxies
+		row = layout.row(align=True)
+		row.operator(Production_Kit_Generate_Proxies.bl_idname, text='Proxies', icon='IMAGE_REFERENCE')
+		for level, label in (('FULL', 'Full'), ('2', '1/2'), ('4', '1/4')):
+			row.operator(Production_Kit_Switch_Proxies.bl_idname, text=label, depress=settings.image_proxy_level == level).level = level
+		if settings.image_proxy_level != 'FULL':
+			row.operator(Production_Kit_Render_Full_Resolution.bl_idname, text='', icon='RENDER_STILL')
+		
 		# Display source and target file extensions
 		row = layout.row(align=True)
 #		grid = row.grid_flow(columns=3, align=True)
@@ -126,6 +1392,21 @@ class PRODUCTIONKIT_PT_update_images_ui(bpy.types.Panel):
 		row.operator(Production_Kit_Switch_Extension_Inputs.bl_idname, text='', icon='FILE_REFRESH')
 		row.prop(settings, 'file_extension_target', text='')
 		row.operator(Production_Kit_Replace_Extensions.bl_idname, text='Replace')
+		
+		# Missing and duplicate images
+		row = layout.row(align=True)
+		row.operator(Production_Kit_Relink_Images.bl_idname, icon='VIEWZOOM')
+		row.operator(Production_Kit_Dedupe_Images.bl_idname, icon='DUPLICATE')
+		
+		# Image usage and memory report
+		wm = context.window_manager
+		row = layout.row(align=True)
+		row.operator(Production_Kit_Scan_Images.bl_idname, icon='VIEWZOOM')
+		row.operator(Production_Kit_Export_Image_Report.bl_idname, text='', icon='EXPORT')
+		if len(wm.production_kit_image_report):
+			layout.template_list("PRODUCTIONKIT_UL_image_report", "", wm, "production_kit_image_report", wm, "production_kit_image_report_index", rows=5)
+			total = sum(item.memory for item in wm.production_kit_image_report)
+			layout.label(text=f"{len(wm.production_kit_image_report)} images, {total:.1f} MB estimated (* not loaded)")
 
 ###########################################################################
 # Display in Image menu
@@ -134,6 +1415,13 @@ def production_kit_update_images_menu_item(self, context):
 	self.layout.separator()
 	self.layout.operator(Production_Kit_Update_Images.bl_idname)
 
+def production_kit_render_menu_items(self, context):
+	if context.scene.production_kit_settings.image_proxy_level == 'FULL':
+		return
+	self.layout.separator()
+	self.layout.operator(Production_Kit_Render_Full_Resolution.bl_idname, text="Render Image (Full Resolution Images)", icon='RENDER_STILL').animation = False
+	self.layout.operator(Production_Kit_Render_Full_Resolution.bl_idname, text="Render Animation (Full Resolution Images)", icon='RENDER_ANIMATION').animation = True
+
 
 
 # ---------------------------------------------------------------------------
@@ -141,9 +1429,24 @@ def production_kit_update_images_menu_item(self, context):
 # ---------------------------------------------------------------------------
 
 classes = [
+	PRODUCTIONKIT_UL_format_rules,
+	Production_Kit_Format_Rule_Add,
+	Production_Kit_Format_Rule_Remove,
+	Production_Kit_Format_Rule_Move,
+	Production_Kit_Format_Rules_Export,
+	Production_Kit_Format_Rules_Import,
 	Production_Kit_Update_Images,
 	Production_Kit_Switch_Extension_Inputs,
 	Production_Kit_Replace_Extensions,
+	Production_Kit_Generate_Proxies,
+	Production_Kit_Switch_Proxies,
+	Production_Kit_Render_Full_Resolution,
+	Production_Kit_Relink_Images,
+	Production_Kit_Dedupe_Images,
+	ImageReportItem,
+	PRODUCTIONKIT_UL_image_report,
+	Production_Kit_Scan_Images,
+	Production_Kit_Export_Image_Report,
 	PRODUCTIONKIT_PT_update_images_ui,
 ]
 
@@ -151,11 +1454,38 @@ classes = [
 def register():
 	for cls in classes:
 		bpy.utils.register_class(cls)
+	bpy.types.WindowManager.production_kit_image_report = bpy.props.CollectionProperty(type=ImageReportItem)
+	bpy.types.WindowManager.production_kit_image_report_index = bpy.props.IntProperty(default=0)
 	bpy.types.IMAGE_MT_image.append(production_kit_update_images_menu_item)
+	ensure_format_rules(bpy.context.preferences.addons[__package__].preferences)
+	if _record_manifest not in bpy.app.handlers.load_post:
+		bpy.app.handlers.load_post.append(_record_manifest)
+	bpy.types.TOPBAR_MT_render.append(production_kit_render_menu_items)
+	for handlers in (bpy.app.handlers.render_complete, bpy.app.handlers.render_cancel):
+		if _render_done not in handlers:
+			handlers.append(_render_done)
+	if _save_original_paths not in bpy.app.handlers.save_pre:
+		bpy.app.handlers.save_pre.append(_save_original_paths)
+	if _restore_proxy_paths not in bpy.app.handlers.save_post:
+		bpy.app.handlers.save_post.append(_restore_proxy_paths)
 
 
 def unregister():
 	bpy.types.IMAGE_MT_image.remove(production_kit_update_images_menu_item)
+	del bpy.types.WindowManager.production_kit_image_report
+	del bpy.types.WindowManager.production_kit_image_report_index
+	if _record_manifest in bpy.app.handlers.load_post:
+		bpy.app.handlers.load_post.remove(_record_manifest)
+	bpy.types.TOPBAR_MT_render.remove(production_kit_render_menu_items)
+	for handlers in (bpy.app.handlers.render_complete, bpy.app.handlers.render_cancel):
+		if _render_done in handlers:
+			handlers.remove(_render_done)
+	if _save_original_paths in bpy.app.handlers.save_pre:
+		bpy.app.handlers.save_pre.remove(_save_original_paths)
+	if _restore_proxy_paths in bpy.app.handlers.save_post:
+		bpy.app.handlers.save_post.remove(_restore_proxy_paths)
+	if bpy.app.timers.is_registered(_wait_for_render):
+		bpy.app.timers.unregister(_wait_for_render)
 	for cls in reversed(classes):
 		bpy.utils.unregister_class(cls)
 